@@ -0,0 +1,68 @@
+"""Benchmark the available AES backends"""
+
+import argparse
+import os
+import time
+
+from zcu import aes
+
+MODES = [
+    ("ECB-128", aes.MODE_ECB, 16),
+    ("CBC-256", aes.MODE_CBC, 32),
+]
+
+
+def timed(fn, minimum=0.5):
+    """returns the average duration of fn() calls over at least minimum seconds"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= minimum:
+            return elapsed / calls
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Report throughput and key setup cost of the AES backends",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=1024 * 1024,
+        help="Bytes to decrypt per throughput run (default 1048576)",
+    )
+    parser.add_argument(
+        "--python-size",
+        type=int,
+        default=64 * 1024,
+        help="Bytes to decrypt per throughput run with the pure Python backend (default 65536)",
+    )
+    args = parser.parse_args()
+
+    print(f"Default backend: {aes.backend}")
+    print(f"{'backend':<14}{'mode':<10}{'MB/s':>10}{'key setup (us)':>18}")
+    for name, new in aes.BACKENDS.items():
+        size = args.python_size if name == "python" else args.size
+        size -= size % aes.BLOCK_SIZE
+        data = os.urandom(size)
+        iv = os.urandom(16)
+        block = data[:16]
+        for label, mode, key_length in MODES:
+            key = os.urandom(key_length)
+
+            duration = timed(lambda: new(key, mode, iv).decrypt(data))
+            throughput = size / duration / 1e6
+
+            # a key search trial, i.e. a new cipher to decrypt the first block
+            setup = timed(lambda: new(key, mode, iv).decrypt(block)) * 1e6
+
+            print(f"{name:<14}{label:<10}{throughput:>10.1f}{setup:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
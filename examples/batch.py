@@ -0,0 +1,227 @@
+"""Decode a directory tree of config.bin files into config.xml files"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import shutil
+import time
+
+import zcu
+
+from zcu.fleet import DEVICE_FIELDS, decode, find_configs
+
+RESULT_FIELDS = [
+    "file",
+    "status",
+    "payload_type",
+    "signature",
+    "key",
+    "iv",
+    "source",
+    "cached",
+    "seconds",
+    "error",
+]
+
+
+def read_devices(path):
+    """returns {file: device} from a CSV manifest with a header row, file is
+    matched against the path relative to the input directory or the filename"""
+    devices = {}
+    if path is None:
+        return devices
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            device = {
+                field: (row.get(field) or "").strip() or None for field in DEVICE_FIELDS
+            }
+            devices[device["file"]] = device
+    return devices
+
+
+def read_results(path):
+    """returns {file: result} of the last result recorded for each file"""
+    results = {}
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                results[row["file"]] = row
+    return results
+
+
+def decode_config(job):
+    """decodes one config, returns a dict of RESULT_FIELDS"""
+    relpath, path, out_path, device = job
+    started = time.perf_counter()
+    result = dict.fromkeys(RESULT_FIELDS, "")
+    result["file"] = relpath
+    try:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        # only complete outputs ever appear under their final name
+        with open(path, "rb") as infile, open(out_path + ".tmp", "wb") as outfile:
+            result.update(decode(infile, outfile, device))
+        os.replace(out_path + ".tmp", out_path)
+        result["status"] = "ok"
+    except LookupError as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    except Exception as e:  # pylint: disable=broad-except
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if os.path.exists(out_path + ".tmp"):
+            os.remove(out_path + ".tmp")
+        result["seconds"] = f"{time.perf_counter() - started:.3f}"
+    return result
+
+
+def copy_cached(cache, job, digest):
+    """copies the config from the cache, returns a dict of RESULT_FIELDS or
+    None if it is not cached"""
+    relpath, _, out_path, _ = job
+    started = time.perf_counter()
+    found = cache.get(digest)
+    if found is None:
+        return None
+    cached_path, entry = found
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    shutil.copyfile(cached_path, out_path + ".tmp")
+    os.replace(out_path + ".tmp", out_path)
+    result = dict.fromkeys(RESULT_FIELDS, "")
+    result["file"] = relpath
+    result["status"] = "ok"
+    result["cached"] = "yes"
+    for field in ("payload_type", "signature", "key", "iv", "source"):
+        result[field] = "" if entry.get(field) is None else entry[field]
+    result["seconds"] = f"{time.perf_counter() - started:.3f}"
+    return result
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Decode every config.bin in a directory tree",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("input_dir", help="Directory of configuration files")
+    parser.add_argument("output_dir", help="Directory to write decoded files to")
+    parser.add_argument(
+        "--devices",
+        type=str,
+        help="CSV manifest with a header row of: " + ", ".join(DEVICE_FIELDS),
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        help="CSV manifest of results (default OUTPUT_DIR/results.csv), files "
+        "which decoded successfully are skipped when rerun",
+    )
+    parser.add_argument(
+        "--pattern",
+        type=str,
+        default="*.bin",
+        help="Filename pattern of configuration files (default '*.bin')",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes (default CPU count)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="Directory to cache decoded configs in, configs identical to one "
+        "decoded before with the same device details are copied from the cache",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=zcu.cache.DEFAULT_MAX_SIZE,
+        help="Size in bytes beyond which the least recently used cache entries "
+        "are removed (default 1073741824)",
+    )
+    args = parser.parse_args()
+
+    results_path = args.results or os.path.join(args.output_dir, "results.csv")
+    devices = read_devices(args.devices)
+    done = {
+        relpath
+        for relpath, result in read_results(results_path).items()
+        if result["status"] == "ok"
+    }
+    empty_device = dict.fromkeys(DEVICE_FIELDS)
+
+    jobs = []
+    skipped = 0
+    for relpath in find_configs(args.input_dir, args.pattern):
+        out_path = os.path.join(args.output_dir, os.path.splitext(relpath)[0] + ".xml")
+        if relpath in done and os.path.exists(out_path):
+            skipped += 1
+            continue
+        device = devices.get(relpath) or devices.get(os.path.basename(relpath))
+        path = os.path.join(args.input_dir, relpath)
+        jobs.append((relpath, path, out_path, device or empty_device))
+
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    new_manifest = not os.path.exists(results_path)
+    counts = {"ok": 0, "failed": 0, "error": 0}
+    started = time.perf_counter()
+    # only this process uses the cache, so there is a single writer of its index
+    cache = zcu.cache.DecodeCache(args.cache, args.cache_size) if args.cache else None
+    digests = {}
+    out_paths = {relpath: out_path for relpath, _, out_path, _ in jobs}
+    with open(results_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        if new_manifest:
+            writer.writeheader()
+
+        def record(result):
+            # written as they complete so an interrupted run can resume
+            writer.writerow(result)
+            f.flush()
+            counts[result["status"]] += 1
+            print(f"{result['status']:<6} {result['file']} {result['error']}")
+
+        try:
+            uncached = []
+            for job in jobs:
+                if cache is not None:
+                    relpath, path, _, device = job
+                    with open(path, "rb") as infile:
+                        digests[relpath] = zcu.cache.digest(infile, device)
+                    result = copy_cached(cache, job, digests[relpath])
+                    if result is not None:
+                        record(result)
+                        continue
+                uncached.append(job)
+
+            with multiprocessing.Pool(args.workers) as pool:
+                for result in pool.imap_unordered(decode_config, uncached):
+                    record(result)
+                    if cache is not None and result["status"] == "ok":
+                        with open(out_paths[result["file"]], "rb") as decoded:
+                            cache.put(
+                                digests[result["file"]],
+                                decoded,
+                                result["payload_type"],
+                                result["key"] or None,
+                                result["iv"] or None,
+                                result["source"] or None,
+                                result["signature"] or None,
+                            )
+        finally:
+            if cache is not None:
+                cache.save()
+
+    print(
+        f"Decoded {counts['ok']}, failed {counts['failed']}, errors {counts['error']}, "
+        f"skipped {skipped} in {time.perf_counter() - started:.1f}s"
+    )
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
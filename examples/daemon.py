@@ -0,0 +1,380 @@
+"""Serve decode, encode and info requests over HTTP on localhost"""
+
+import argparse
+import concurrent.futures
+import functools
+import json
+import signal
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlsplit
+
+import zcu
+
+from zcu.fleet import DEVICE_FIELDS, NoKeyFound, decode
+from zcu.known_keys import run_any_keygen
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+PERCENTILES = [50, 90, 99]
+
+# raised for a config (or options) which cannot be decoded or encoded,
+# anything else is a fault of the server
+BAD_REQUEST_ERRORS = (ValueError, AssertionError, struct.error, zlib.error)
+
+
+def _init_worker():
+    # leave Ctrl-C to the server, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # build the signature index once per process rather than per request
+    zcu.known_keys.lookup("")
+
+
+def decode_request(data, params):
+    """returns (config.xml, dict of the key used)"""
+    device = dict.fromkeys(DEVICE_FIELDS)
+    device.update((k, v) for k, v in params.items() if k in device)
+    outfile = BytesIO()
+    info = decode(BytesIO(data), outfile, device)
+    return (outfile.getvalue(), info)
+
+
+@functools.lru_cache(maxsize=256)
+def get_encryptor(payload_type, key, iv, chunk_size, include_unencrypted_length=False):
+    """the encryptor for a key, kept so its derived key is reused"""
+    if payload_type == 0:
+        return None
+    if payload_type == 2:
+        return Xcryptor(
+            key,
+            chunk_size=chunk_size,
+            include_unencrypted_length=include_unencrypted_length,
+        )
+    encryptor = CBCXcryptor(
+        chunk_size=chunk_size,
+        include_unencrypted_length=include_unencrypted_length,
+        payload_type=payload_type,
+    )
+    encryptor.set_key(aes_key=key, aes_iv=iv)
+    return encryptor
+
+
+def encode_request(data, params):
+    """returns config.bin, params are named as the options of encode.py"""
+    key = params.get("key", "")
+    iv = params.get("iv", "")
+    signature = params.get("signature", "")
+
+    # the same choice of payload type and key as encode.py
+    payload_type = 0
+    if params.get("model"):
+        payload_type = 3
+        key = params["model"]
+        iv = None
+    elif params.get("serial"):
+        payload_type = 4
+        keygen_params = SimpleNamespace(signature=signature, serial=params["serial"])
+        key, iv = run_any_keygen(keygen_params, "serial")[:2]
+    elif params.get("use_signature_encryption"):
+        payload_type = 4
+        keygen_params = SimpleNamespace(signature=signature)
+        key, iv = run_any_keygen(keygen_params, "signature")[:2]
+    elif iv:
+        payload_type = 4
+    elif key:
+        payload_type = 2
+
+    if not key and signature and not params.get("force_no_key"):
+        possible_key = zcu.known_keys.find_key(signature)
+        if possible_key is not None:
+            key = possible_key
+            payload_type = 2
+
+    if params.get("payload_type"):
+        payload_type = int(params["payload_type"])
+
+    chunk_size = int(params.get("chunk_size", 65536))
+    little_endian = bool(params.get("little_endian_header"))
+    version = int(params.get("version", 2))
+    version = (version >> 16) if little_endian else (version << 16)
+
+    outfile = BytesIO()
+    zcu.pipeline.encode_stream(
+        BytesIO(data),
+        outfile,
+        chunk_size,
+        encryptor=get_encryptor(
+            payload_type,
+            key,
+            iv,
+            chunk_size,
+            bool(params.get("include_unencrypted_length")),
+        ),
+        signature=signature.encode("utf8"),
+        version=version,
+        include_header=bool(params.get("include_header")),
+        little_endian=little_endian,
+        incorrect_compressed_size=bool(params.get("incorrect_compressed_size")),
+    )
+    return outfile.getvalue()
+
+
+def info_request(data, params):
+    """returns a dict of the header fields"""
+    container = zcu.container.parse(zcu.base64io.open_config(BytesIO(data)))
+    payload_header = container.payload_header
+    info = {
+        "signature": container.signature_bytes.decode("utf-8", "replace"),
+        "header_length": container.header_length,
+        "payload_offset": container.payload_offset,
+    }
+    for field in (
+        "payload_type",
+        "decompressed_length",
+        "compressed_size",
+        "chunk_size",
+        "crc",
+        "header_crc",
+    ):
+        info[field] = getattr(payload_header, field)
+    return info
+
+
+HANDLERS = {
+    "decode": decode_request,
+    "encode": encode_request,
+    "info": info_request,
+}
+
+
+class Busy(Exception):
+    """the request queue is full"""
+
+
+class LatencyStats:
+    """request counts and latency percentiles over the last window requests
+    of each kind"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.counts = {}
+
+    def record(self, name, seconds, outcome):
+        with self.lock:
+            if name not in self.latencies:
+                self.latencies[name] = deque(maxlen=self.window)
+                self.counts[name] = {}
+            if outcome == "ok":
+                self.latencies[name].append(seconds)
+            counts = self.counts[name]
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def summary(self):
+        with self.lock:
+            result = {}
+            for name, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                entry = dict(self.counts[name])
+                for p in PERCENTILES:
+                    entry[f"p{p}_ms"] = (
+                        round(ordered[(len(ordered) - 1) * p // 100] * 1000, 3)
+                        if ordered
+                        else None
+                    )
+                result[name] = entry
+            return result
+
+
+class Service:
+    """runs requests on a warm process pool, with at most workers requests
+    running and queue_size waiting, anything more is rejected with Busy"""
+
+    def __init__(self, workers, queue_size, timeout):
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.timeout = timeout
+        self.stats = LatencyStats()
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        # start the workers now so the first request does not pay for it
+        warm = [self.executor.submit(zcu.known_keys.lookup, "") for _ in range(workers)]
+        for future in warm:
+            future.result()
+
+    def run(self, name, data, params):
+        if not self.slots.acquire(blocking=False):
+            self.stats.record(name, 0, "rejected")
+            raise Busy()
+        started = time.perf_counter()
+        try:
+            future = self.executor.submit(HANDLERS[name], data, params)
+        except Exception:
+            self.slots.release()
+            raise
+        # the slot is only free once the worker is, even if we stop waiting
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.pending_lock:
+            self.pending += 1
+        try:
+            result = future.result(self.timeout)
+        except Exception:
+            self.stats.record(name, time.perf_counter() - started, "error")
+            raise
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+        self.stats.record(name, time.perf_counter() - started, "ok")
+        return result
+
+    def summary(self):
+        return {"pending": self.pending, "requests": self.stats.summary()}
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /decode, /encode or /info with the config as the body and the
+    options as query parameters, GET /stats for the latency percentiles"""
+
+    service = None
+    max_size = None
+    verbose = False
+
+    def send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, obj, headers=()):
+        body = (json.dumps(obj) + "\n").encode()
+        self.send(status, body, "application/json", headers)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/stats":
+            self.send_json(404, {"error": "not found"})
+            return
+        self.send_json(200, self.service.summary())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        name = url.path.strip("/")
+        if name not in HANDLERS:
+            self.send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > self.max_size:
+            self.send_json(413, {"error": f"larger than {self.max_size} bytes"})
+            self.close_connection = True
+            return
+        data = self.rfile.read(length)
+        params = dict(parse_qsl(url.query))
+
+        try:
+            result = self.service.run(name, data, params)
+        except Busy:
+            self.send_json(503, {"error": "busy"}, [("Retry-After", "1")])
+            return
+        except concurrent.futures.TimeoutError:
+            self.send_json(504, {"error": f"no result within {self.service.timeout}s"})
+            return
+        except NoKeyFound as e:
+            self.send_json(422, {"error": str(e)})
+            return
+        except BAD_REQUEST_ERRORS as e:
+            self.send_json(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            self.log_error("%s failed: %r", name, e)
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        if name == "decode":
+            xml, info = result
+            headers = [
+                (f"X-ZCU-{k.replace('_', '-')}", str(v)) for k, v in info.items()
+            ]
+            self.send(200, xml, "application/xml", headers)
+        elif name == "encode":
+            self.send(200, result, "application/octet-stream")
+        else:
+            self.send_json(200, result)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # a deeper listen backlog than the default of 5, bursts of clients are
+    # turned away by the request queue rather than left waiting to connect
+    request_queue_size = 128
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Serve config.bin decode/encode requests on localhost",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--port", type=int, default=8089, help="Port to listen on (default 8089)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of worker processes (default 4)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Number of requests which may wait for a worker before further "
+        "requests are rejected with 503 (default 64)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for a request to complete (default 60)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=64 * 1024 * 1024,
+        help="Largest request body accepted in bytes (default 67108864)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    service = Service(args.workers, args.queue_size, args.timeout)
+    RequestHandler.service = service
+    RequestHandler.max_size = args.max_size
+    RequestHandler.verbose = args.verbose
+    server = Server(("127.0.0.1", args.port), RequestHandler)
+    print(f"Listening on http://127.0.0.1:{args.port}/ with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
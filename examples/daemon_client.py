@@ -0,0 +1,112 @@
+"""Send decode, encode and info requests to examples/daemon.py"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+
+def call(url, name, data=None, params=None):
+    """returns (status, headers, body) of the request"""
+    query = f"?{urlencode(params)}" if params else ""
+    request = Request(f"{url}/{name}{query}", data=data)
+    try:
+        with urlopen(request) as response:
+            return (response.status, response.headers, response.read())
+    except HTTPError as e:
+        return (e.code, e.headers, e.read())
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Client for examples/daemon.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=["decode", "encode", "info", "stats"])
+    parser.add_argument(
+        "infile",
+        nargs="?",
+        type=argparse.FileType("rb"),
+        help="Input file, e.g. config.bin to decode",
+    )
+    parser.add_argument(
+        "outfile",
+        nargs="?",
+        type=argparse.FileType("wb"),
+        help="Output file, e.g. config.xml",
+    )
+    parser.add_argument(
+        "--url",
+        type=str,
+        default="http://127.0.0.1:8089",
+        help="URL of the daemon (default http://127.0.0.1:8089)",
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Request option, e.g. serial=ZTEEFC123 or model=H298Q, can be repeated",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Send the request this many times and report the latencies",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of requests in flight when repeating (default 1)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(json.loads(call(args.url, "stats")[2]), indent=2))
+        return
+    if args.infile is None:
+        parser.error(f"{args.command} requires an infile")
+
+    data = args.infile.read()
+    params = dict(param.split("=", 1) for param in args.param)
+
+    def timed_call(_):
+        started = time.perf_counter()
+        result = call(args.url, args.command, data, params)
+        return (time.perf_counter() - started, result)
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(timed_call, range(args.repeat)))
+
+    if args.repeat > 1:
+        latencies = sorted(seconds for seconds, _ in results)
+        statuses = {}
+        for _, (status, _, _) in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        print(f"Statuses: {statuses}")
+        for p in (50, 90, 99):
+            print(f"p{p}: {latencies[(len(latencies) - 1) * p // 100] * 1000:.2f} ms")
+
+    # the output of the first successful request, if any
+    ok = [result for _, result in results if result[0] == 200]
+    status, headers, body = ok[0] if ok else results[0][1]
+    if status != 200:
+        print(f"Error {status}: {body.decode()}", file=sys.stderr, end="")
+        sys.exit(1)
+    for name, value in headers.items():
+        if name.startswith("X-ZCU-"):
+            print(f"{name[6:].lower()}: {value}")
+    if args.outfile is not None:
+        args.outfile.write(body)
+    elif args.command == "info":
+        print(body.decode(), end="")
+
+
+if __name__ == "__main__":
+    main()
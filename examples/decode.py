@@ -1,6 +1,9 @@
 """Decode config.bin into config.xml"""
 
 import argparse
+import csv
+import io
+import os
 import sys
 
 from types import SimpleNamespace
@@ -15,11 +18,46 @@ def error(msg):
     print(msg, file=sys.stderr)
 
 
+def write_records(outfile, records):
+    """writes the records as CSV, returns the number written"""
+    text = io.TextIOWrapper(outfile, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(["table", "row", "name", "value"])
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    text.flush()
+    # leave outfile open
+    text.detach()
+    return count
+
+
+def try_decode_key_store(infile, keystore, params):
+    entry = keystore.lookup(
+        getattr(params, "serial", None),
+        getattr(params, "mac", None),
+        params.signature,
+    )
+    if entry is None:
+        return None
+
+    xcryptor_cls, keypair, _ = keystore.candidate(entry)
+    decryptor = xcryptor_cls()
+    # the payload is decrypted while it is decompressed
+    if decryptor.try_keys(infile, [keypair]) is not None:
+        print("Using key from key store")
+        return (decryptor, keypair)
+
+    print("Key from key store did not work, trying others...")
+    return None
+
+
 def try_decode_payload_type_0(infile, args, params):
     print("Trying to decode Type 0 payload...")
 
     # no decryption required
-    return (infile, None)
+    return (None, None)
 
 
 def try_decode_payload_type_2(infile, args, params):
@@ -46,17 +84,16 @@ def try_decode_payload_type_2(infile, args, params):
 
     decryptor = Xcryptor()
 
-    start_pos = infile.tell()
-    for key in keys:
-        infile.seek(start_pos)
+    def keypairs():
+        for key in keys:
+            if len(keys) > 1:
+                print(f"Trying key: '{key}'")
+            yield (key, None)
 
-        if len(keys) > 1:
-            print(f"Trying key: '{key}'")
-
-        decryptor.set_key(key)
-        decrypted = decryptor.decrypt(infile)
-        if zcu.zte.read_payload_type(decrypted, raise_on_error=False) is not None:
-            return (decrypted, key)
+    # the payload is decrypted while it is decompressed
+    keypair = decryptor.try_keys(infile, keypairs())
+    if keypair is not None:
+        return (decryptor, keypair)
 
     error(f"Failed to decrypt payload. Tried {len(keys)} key(s)!")
     return None
@@ -84,17 +121,16 @@ def try_decode_payload_type_3(infile, args, params):
 
     decryptor = CBCXcryptor()
 
-    start_pos = infile.tell()
-    for key, iv, name in key_ivs:
-        infile.seek(start_pos)
-
-        if len(models) > 1:
-            print(f"Trying key: {name}")
+    def keypairs():
+        for key, iv, name in key_ivs:
+            if len(models) > 1:
+                print(f"Trying key: {name}")
+            yield (key, iv)
 
-        decryptor.set_key(key, iv)
-        decrypted = decryptor.decrypt(infile)
-        if zcu.zte.read_payload_type(decrypted, raise_on_error=False) is not None:
-            return (decrypted, key)
+    # the payload is decrypted while it is decompressed
+    keypair = decryptor.try_keys(infile, keypairs())
+    if keypair is not None:
+        return (decryptor, keypair)
 
     error(f"Failed to decrypt payload. Tried {len(models)} model name(s)!")
     return None
@@ -118,16 +154,15 @@ def try_decode_payload_type_4(infile, args, params):
 
     decryptor = CBCXcryptor()
 
-    start_pos = infile.tell()
-    for key, iv, source in key_ivs:
-        infile.seek(start_pos)
+    def keypairs():
+        for key, iv, source in key_ivs:
+            print(f"Trying key: '{key}' iv: '{iv}' generated from {source}")
+            yield (key, iv)
 
-        print(f"Trying key: '{key}' iv: '{iv}' generated from {source}")
-
-        decryptor.set_key(key, iv)
-        decrypted = decryptor.decrypt(infile)
-        if zcu.zte.read_payload_type(decrypted, raise_on_error=False) is not None:
-            return (decrypted, key)
+    # the payload is decrypted while it is decompressed
+    keypair = decryptor.try_keys(infile, keypairs())
+    if keypair is not None:
+        return (decryptor, keypair)
 
     error(f"Failed to decrypt payload. Tried {len(key_ivs)} generated key(s)!")
     return None
@@ -211,18 +246,60 @@ def main():
         default="",
         help="Override IV suffix for Signature based key generation",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads to decompress ZLIB chunks with (default 1)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="Directory to cache decoded configs in, identical configs decoded "
+        "with the same options are then copied from the cache",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=zcu.cache.DEFAULT_MAX_SIZE,
+        help="Size in bytes beyond which the least recently used cache entries "
+        "are removed (default 1073741824)",
+    )
+    parser.add_argument(
+        "--keystore",
+        type=str,
+        help="File to record the key which worked for each device in, which is "
+        "then tried first (and used by encode.py) for the same device",
+    )
+    parser.add_argument(
+        "--select",
+        action="append",
+        default=[],
+        metavar="TABLE[/NAME]",
+        help="Only write the rows of this table (or this value of each of its "
+        "rows, e.g. WANC/Password) as CSV, decoding stops once all have been "
+        "read, can be repeated",
+    )
     args = parser.parse_args()
 
-    infile = args.infile
+    raw_infile = args.infile
+    if args.cache and not args.select and not raw_infile.seekable():
+        # e.g. a pipe, the cache hashes the whole config before it is decoded
+        # so it is read into memory once
+        raw_infile = io.BytesIO(raw_infile.read())
+
+    # base64 encoded configs are decoded as they are read
+    infile = zcu.base64io.open_config(raw_infile)
     outfile = args.outfile
 
-    zcu.zte.read_header(infile, little_endian=args.little_endian)
+    # leaves infile at the start of the payload
+    container = zcu.container.parse(infile, little_endian=args.little_endian)
 
-    signature = zcu.zte.read_signature(infile).decode()
+    signature = container.signature_bytes.decode()
     if signature:
         print(f"Detected signature: {signature}")
 
-    payload_type = zcu.zte.read_payload_type(infile)
+    payload_type = container.payload_type
     print(f"Detected payload type {payload_type}")
 
     params = SimpleNamespace()
@@ -250,31 +327,92 @@ def main():
     if args.iv_suffix:
         params.iv_suffix = args.iv_suffix if (args.iv_suffix != "NONE") else ""
 
-    if payload_type == 0:
-        res = try_decode_payload_type_0(infile, args, params)
-    elif payload_type == 2:
-        res = try_decode_payload_type_2(infile, args, params)
-    elif payload_type == 3:
-        res = try_decode_payload_type_3(infile, args, params)
-    elif payload_type == 4:
-        res = try_decode_payload_type_4(infile, args, params)
-    else:
-        error(f"No support for payload type {payload_type}!")
-        return 1
+    cache = None
+    # the cache only keeps whole configs
+    if args.cache and not args.select:
+        cache = zcu.cache.DecodeCache(args.cache, args.cache_size)
+        options = dict(vars(params), try_all_known_keys=args.try_all_known_keys)
+        digest = zcu.cache.digest(raw_infile, options)
+        entry = cache.copy(digest, outfile)
+        cache.save()
+        if entry is not None:
+            print(f"Decoded from cache, key: '{entry['key']}' iv: '{entry['iv']}'")
+            return 0
+
+    keystore = zcu.keystore.KeyStore(args.keystore) if args.keystore else None
+
+    res = None
+    if keystore is not None and payload_type != 0:
+        res = try_decode_key_store(infile, keystore, params)
 
     if res is None:
-        return 1
+        if payload_type == 0:
+            res = try_decode_payload_type_0(infile, args, params)
+        elif payload_type == 2:
+            res = try_decode_payload_type_2(infile, args, params)
+        elif payload_type == 3:
+            res = try_decode_payload_type_3(infile, args, params)
+        elif payload_type == 4:
+            res = try_decode_payload_type_4(infile, args, params)
+        else:
+            error(f"No support for payload type {payload_type}!")
+            return 1
 
-    decrypted, key = res
+    if res is None:
+        return 1
 
-    decompressed, _ = zcu.compression.decompress(decrypted)
-    outfile.write(decompressed.read())
+    decryptor, keypair = res
+    key, iv = keypair if keypair is not None else (None, None)
+
+    if args.select:
+        items = [
+            tuple(item.split("/", 1)) if "/" in item else item for item in args.select
+        ]
+        records = zcu.dbxml.decode_select(infile, items, decryptor)
+        print(f"Selected {write_records(outfile, records)} values")
+    elif args.workers > 1:
+        decrypted = infile
+        if decryptor is not None:
+            decrypted = decryptor.decrypt(infile)
+            zcu.zte.read_payload_type(decrypted)
+        elif not infile.seekable():
+            # the chunk headers are scanned before the chunks are read
+            decrypted = io.BytesIO(infile.read())
+        data, _ = zcu.compression.decompress(decrypted, workers=args.workers)
+        outfile.write(data.read())
+    else:
+        zcu.pipeline.decode_stream(infile, outfile, decryptor)
 
     if key is not None:
         print(f"Successfully decoded using key: '{key}'")
     else:
         print("Successfully decoded")
 
+    if keystore is not None and decryptor is not None:
+        keystore.record(
+            type(decryptor),
+            keypair,
+            payload_type,
+            serial=getattr(params, "serial", None),
+            mac=getattr(params, "mac", None),
+            signature=params.signature,
+        )
+        keystore.save()
+
+    # the cache keeps a copy of the output, which cannot be read back from stdout
+    if cache is not None and os.path.isfile(outfile.name):
+        outfile.flush()
+        with open(outfile.name, "rb") as decoded:
+            cache.put(
+                digest,
+                decoded,
+                payload_type,
+                key.decode() if isinstance(key, bytes) else key,
+                iv,
+                signature=params.signature,
+            )
+        cache.save()
+
     return 0
 
 
@@ -44,6 +44,12 @@ def main():
         default="",
         help="Generate Key/IV from serial number(DIGImobil routers), implies payload-type 4",
     )
+    parser.add_argument(
+        "--mac",
+        type=str,
+        default="",
+        help="MAC address of the device, used to find its key in --keystore",
+    )
     parser.add_argument(
         "--signature",
         type=str,
@@ -58,6 +64,12 @@ def main():
     parser.add_argument(
         "--chunk-size", type=int, default=65536, help="ZLIB chunk sizes (default 65536)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads to compress ZLIB chunks with (default 1)",
+    )
     parser.add_argument(
         "--payload-type",
         type=int,
@@ -114,6 +126,12 @@ def main():
         action="store_true",
         help="Don't try to infer AES key from signature",
     )
+    parser.add_argument(
+        "--keystore",
+        type=str,
+        help="File of the keys which worked when decoding (see decode.py), the "
+        "key for the device given by --serial/--mac/--signature is used if known",
+    )
     parser.add_argument(
         "--incorrect-compressed-size",
         action="store_true",
@@ -129,7 +147,18 @@ def main():
 
     payload_type = 0
 
-    if args.model:
+    entry = None
+    if args.keystore and not (args.key or args.iv or args.model):
+        entry = zcu.keystore.KeyStore(args.keystore).lookup(
+            args.serial, args.mac, args.signature
+        )
+
+    if entry is not None:
+        payload_type = entry["payload_type"]
+        key = entry["key"]
+        iv = entry["iv"]
+        print(f"Using key '{key}' iv '{iv}' from key store")
+    elif args.model:
         payload_type = 3
         key = args.model
         iv = None
@@ -175,10 +204,6 @@ def main():
 
     incorrect_compressed_size = args.incorrect_compressed_size
 
-    data = zcu.compression.compress(
-        infile, args.chunk_size, incorrect_compressed_size=incorrect_compressed_size
-    )
-
     if args.payload_type is not None:
         if args.payload_type != payload_type:
             print(f"Overriding Payload Type: {args.payload_type}")
@@ -191,13 +216,13 @@ def main():
         if not args.force_no_key:
             print("Warning: No key provided!")
 
+    encryptor = None
     if payload_type == 2:
         encryptor = Xcryptor(
             key,
             chunk_size=args.chunk_size,
             include_unencrypted_length=args.include_unencrypted_length,
         )
-        data = encryptor.encrypt(data)
     elif payload_type in (3, 4, 5, 6):
         encryptor = CBCXcryptor(
             chunk_size=args.chunk_size,
@@ -205,19 +230,22 @@ def main():
             payload_type=payload_type,
         )
         encryptor.set_key(aes_key=key, aes_iv=iv)
-        data = encryptor.encrypt(data)
 
     version = (
         (args.version >> 16) if args.little_endian_header else (args.version << 16)
     )
-    encoded = zcu.zte.add_header(
-        data,
-        signature.encode("utf8"),
-        version,
+    zcu.pipeline.encode_stream(
+        infile,
+        outfile,
+        args.chunk_size,
+        encryptor=encryptor,
+        signature=signature.encode("utf8"),
+        version=version,
         include_header=args.include_header,
         little_endian=args.little_endian_header,
+        incorrect_compressed_size=incorrect_compressed_size,
+        workers=args.workers,
     )
-    outfile.write(encoded.read())
     print("Done!")
 
 
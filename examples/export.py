@@ -0,0 +1,83 @@
+"""Load a directory tree of decoded config.xml files into a SQLite database"""
+
+import argparse
+import os
+import sys
+import time
+
+from zcu.fleet import find_configs
+from zcu.fleetdb import FleetDB
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Export decoded configs to SQLite for queries across devices",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "input_dir", help="Directory of decoded files, e.g. the output of batch.py"
+    )
+    parser.add_argument("database", help="SQLite database, created if missing")
+    parser.add_argument(
+        "--pattern",
+        type=str,
+        default="*.xml",
+        help="Filename pattern of decoded files (default '*.xml')",
+    )
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        default=100,
+        help="Number of devices imported per transaction (default 100)",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Remove devices whose decoded file no longer exists",
+    )
+    args = parser.parse_args()
+
+    db = FleetDB(args.database)
+    started = time.perf_counter()
+    devices = set()
+    imported = skipped = failed = records = 0
+    for relpath in find_configs(args.input_dir, args.pattern):
+        # the device is named after the path of its config, e.g. 'site1/router3'
+        device = os.path.splitext(relpath)[0]
+        devices.add(device)
+        try:
+            with open(os.path.join(args.input_dir, relpath), "rb") as infile:
+                count = db.import_config(device, infile)
+        except Exception as e:  # pylint: disable=broad-except
+            # the device is left as it was, carry on with the others
+            print(f"{relpath}: {type(e).__name__}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        if count is None:
+            skipped += 1
+            continue
+        imported += 1
+        records += count
+        if imported % args.commit_every == 0:
+            db.commit()
+
+    removed = 0
+    if args.prune:
+        for device in db.devices():
+            if device not in devices:
+                db.remove(device)
+                removed += 1
+    db.commit()
+    db.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Imported {imported} devices ({records} values), {skipped} unchanged, "
+        f"{failed} failed, {removed} removed in {elapsed:.1f}s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    main()
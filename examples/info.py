@@ -8,21 +8,13 @@ import zcu
 def print_payload_info(infile):
     """expects to be at the start of the payload magic"""
 
-    # check magic
-    header = infile.read(4)
-    if header == b"BAMC":
-        print(f"ERROR: {infile.name} is base64 encoded, please decode and try again.")
-        return 1
-    infile.seek(0)
-
-    zcu.zte.read_header(infile)
-    signature = zcu.zte.read_signature(infile)
-    payload_header = zcu.zte.read_payload(infile)
-    assert (
-        payload_header[0] == zcu.constants.PAYLOAD_MAGIC
-    ), "File does not begin with 0x01020304"
-    payload_start = infile.tell()
-    payload_type = payload_header[1]
+    # base64 encoded configs are decoded as they are read
+    infile = zcu.base64io.open_config(infile)
+    container = zcu.container.parse(infile)
+    signature = container.signature_bytes
+    payload_header = container.payload_header
+    payload_start = container.payload_offset
+    payload_type = payload_header.payload_type
     if payload_type == 0:
         payload_type_friendly = "(ZLIB)"
     elif payload_type == 1:
@@ -36,11 +28,11 @@ def print_payload_info(infile):
     else:
         payload_type_friendly = "(UNKNOWN)"
 
-    payload_length = payload_header[2]
-    penultimate_chunk = payload_header[3]
-    payload_chunk_size = payload_header[4]
-    payload_crc = payload_header[5]
-    payload_header_crc = payload_header[6]
+    payload_length = payload_header.decompressed_length
+    penultimate_chunk = payload_header.compressed_size
+    payload_chunk_size = payload_header.chunk_size
+    payload_crc = payload_header.crc
+    payload_header_crc = payload_header.header_crc
 
     if len(signature) > 0:
         print("Signature:         ", signature.decode("utf-8"))
@@ -0,0 +1,167 @@
+"""Inventory a directory tree of config.bin files"""
+
+import argparse
+import binascii
+import csv
+import json
+import os
+import struct
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from zcu import base64io, constants, container
+from zcu.fleet import find_configs
+
+# enough for the 128 byte header, the signature block and the payload header
+HEAD_SIZE = 1024
+
+FIELDS = [
+    "path",
+    "size",
+    "encoding",
+    "endianness",
+    "header_length",
+    "signed_config_size",
+    "version",
+    "size_matches",
+    "signature",
+    "payload_type",
+    "decompressed_length",
+    "compressed_size",
+    "chunk_size",
+    "crc",
+    "header_crc",
+    "error",
+]
+
+
+def read_head(path):
+    """returns (head, size, encoding), where head is the start of the config
+    and size is that of the file, base64 (BAMC) files are decoded (so their
+    size is the encoded one)"""
+    with open(path, "rb") as infile:
+        size = os.fstat(infile.fileno()).st_size
+        config = base64io.open_config(infile)
+        head = config.read(HEAD_SIZE)
+        return (head, size, "raw" if config is infile else "base64")
+
+
+def scan(path):
+    """returns a dict of FIELDS for the config at path"""
+    result = dict.fromkeys(FIELDS)
+    result["path"] = path
+    try:
+        head, size, encoding = read_head(path)
+        result["size"] = size
+        result["encoding"] = encoding
+
+        offset = 0
+        if container.ZTE_MAGIC.unpack_from(head) == constants.ZTE_MAGIC:
+            # header[2] is always 4, which tells us the endianness
+            little_endian = container.ZTE_HEADER[False].unpack_from(head, 16)[2] != 4
+            header = container.ZteHeader.unpack_from(head, 0, little_endian)
+            result["endianness"] = "little" if little_endian else "big"
+            result["header_length"] = header.header_length
+            result["signed_config_size"] = header.signed_config_size
+            result["version"] = header.version
+            if encoding == "raw":
+                # the decoded size of a base64 file is not known
+                result["size_matches"] = (
+                    header.header_length + header.signed_config_size == size
+                )
+            offset = header.header_length
+
+        signature = container.Signature.unpack_from(head, offset)
+        if signature is not None:
+            result["signature"] = signature.value.decode("utf-8", "replace")
+            offset += signature.size
+
+        payload_header = container.PayloadHeader.unpack_from(head, offset)
+        for field in (
+            "payload_type",
+            "decompressed_length",
+            "compressed_size",
+            "chunk_size",
+            "crc",
+            "header_crc",
+        ):
+            result[field] = getattr(payload_header, field)
+    except struct.error:
+        result["error"] = "file too short"
+    except (OSError, ValueError, AssertionError, binascii.Error) as e:
+        result["error"] = str(e)
+    return result
+
+
+def find_files(paths, pattern):
+    """yields the files matching pattern in paths, walking directories"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for relpath in find_configs(path, pattern):
+            yield os.path.join(path, relpath)
+
+
+def scan_all(paths, workers):
+    """scans paths on a thread pool, yields results in order"""
+    with ThreadPoolExecutor(workers) as executor:
+        # bounded read-ahead so huge trees do not queue every path at once
+        futures = deque()
+        for path in paths:
+            futures.append(executor.submit(scan, path))
+            if len(futures) >= workers * 4:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def main():
+    """the main function"""
+    parser = argparse.ArgumentParser(
+        description="Classify config.bin files from ZTE Routers by their headers",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="Configuration files or directories to scan"
+    )
+    parser.add_argument(
+        "--pattern",
+        type=str,
+        default="*.bin",
+        help="Filename pattern to match in directories (default '*.bin')",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "csv"],
+        default="jsonl",
+        help="Output format (default jsonl)",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Output file (default stdout)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=32,
+        help="Number of files to read concurrently (default 32)",
+    )
+    args = parser.parse_args()
+
+    results = scan_all(find_files(args.paths, args.pattern), args.workers)
+
+    if args.format == "csv":
+        writer = csv.DictWriter(args.output, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    else:
+        for result in results:
+            args.output.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,15 +19,10 @@ def main():
 
     infile = args.infile
 
-    header = infile.read(4)
-    if header == b"BAMC":
-        print(f"ERROR: {infile.name} is base64 encoded, please decode and try again.")
-        return 1
-    infile.seek(0)
-
-    zcu.zte.read_header(infile)
-    signature = zcu.zte.read_signature(infile)
-    print(signature.decode("utf-8"))
+    # base64 encoded configs are decoded as they are read
+    infile = zcu.base64io.open_config(infile)
+    container = zcu.container.parse(infile)
+    print(container.signature_bytes.decode("utf-8"))
 
 
 if __name__ == "__main__":
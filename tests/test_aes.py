@@ -0,0 +1,71 @@
+import unittest
+
+from zcu import aes
+
+
+class TestAES(unittest.TestCase):
+
+    # FIPS-197 appendix C
+    PLAINTEXT = bytes.fromhex("00112233445566778899aabbccddeeff")
+    AES128_KEY = bytes(range(16))
+    AES128_CIPHERTEXT = bytes.fromhex("69c4e0d86a7b0430d8cdb78070b4c55a")
+    AES256_KEY = bytes(range(32))
+    AES256_CIPHERTEXT = bytes.fromhex("8ea2b7ca516745bfeafc49904b496089")
+
+    def setUp(self):
+        self.default_backend = aes.backend
+
+    def tearDown(self):
+        aes.set_backend(self.default_backend)
+
+    def test_ecb(self):
+        for name in aes.BACKENDS:
+            with self.subTest(backend=name):
+                aes.set_backend(name)
+                for key, ciphertext in (
+                    (self.AES128_KEY, self.AES128_CIPHERTEXT),
+                    (self.AES256_KEY, self.AES256_CIPHERTEXT),
+                ):
+                    cipher = aes.new(key, aes.MODE_ECB)
+                    self.assertEqual(ciphertext, cipher.encrypt(self.PLAINTEXT))
+                    cipher = aes.new(key, aes.MODE_ECB)
+                    self.assertEqual(self.PLAINTEXT, cipher.decrypt(ciphertext))
+
+    def test_cbc_state_carried_across_calls(self):
+        iv = bytes(range(16, 32))
+        data = self.PLAINTEXT * 4
+        expected = None
+        for name in aes.BACKENDS:
+            with self.subTest(backend=name):
+                aes.set_backend(name)
+                encrypted = aes.new(self.AES256_KEY, aes.MODE_CBC, iv).encrypt(data)
+                if expected is None:
+                    expected = encrypted
+                self.assertEqual(expected, encrypted)
+                # the first block is the ECB encryption of plaintext ^ iv
+                first = bytes(a ^ b for a, b in zip(self.PLAINTEXT, iv))
+                ecb = aes.new(self.AES256_KEY, aes.MODE_ECB)
+                self.assertEqual(ecb.encrypt(first), encrypted[:16])
+
+                cipher = aes.new(self.AES256_KEY, aes.MODE_CBC, iv)
+                decrypted = cipher.decrypt(encrypted[:16])
+                decrypted += cipher.decrypt(encrypted[16:48])
+                decrypted += cipher.decrypt(encrypted[48:])
+                self.assertEqual(data, decrypted)
+
+    def test_unaligned_data(self):
+        for name in aes.BACKENDS:
+            with self.subTest(backend=name):
+                aes.set_backend(name)
+                cipher = aes.new(self.AES128_KEY, aes.MODE_ECB)
+                with self.assertRaises(ValueError):
+                    cipher.decrypt(b"\0" * 15)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            aes.set_backend("foo")
+        self.assertEqual(self.default_backend, aes.backend)
+
+
+if __name__ == "__main__":
+    unittest.main()
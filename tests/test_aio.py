@@ -0,0 +1,149 @@
+import asyncio
+import base64
+import unittest
+from io import BytesIO
+
+from zcu import aio
+from zcu.pipeline import encode_stream
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+def stream_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def pieces(data, size):
+    for i in range(0, len(data), size):
+        await asyncio.sleep(0)
+        yield data[i : i + size]
+
+
+class TestAio(unittest.IsolatedAsyncioTestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+    ZXHN_H298N_key = "Wj"
+
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    ZXHN_H168N_V35_xml = "resources/ZXHN_H168N_V3.5.xml"
+    ZXHN_H168N_V35_key = "ZXHNH168NV3.5Key02721401"
+    ZXHN_H168N_V35_iv = "ZXHNH168NV3.5Iv02721401"
+
+    ZXHN_H298Q_C7_db_type3 = "resources/ZXHN_H298Q_C7_db_type3.bin"
+    ZXHN_H298Q_C7_db_type0 = "resources/ZXHN_H298Q_C7_db_type0.bin"
+    ZXHN_H298Q_C7_db_xml = "resources/ZXHN_H298Q_C7_db.xml"
+    ZXHN_H298Q_C7_db_key = "H298Q"
+
+    @staticmethod
+    def read(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def test_zxhn_h298n_decode(self):
+        outfile = BytesIO()
+        await aio.decode(
+            stream_reader(self.read(self.ZXHN_H298N_config)),
+            outfile,
+            Xcryptor(self.ZXHN_H298N_key),
+            read_size=1000,
+        )
+        self.assertEqual(self.read(self.ZXHN_H298N_xml), outfile.getvalue())
+
+    async def test_zxhn_h298q_db_type0_decode(self):
+        # async iterables are read too, in pieces smaller than the headers
+        stream = pieces(self.read(self.ZXHN_H298Q_C7_db_type0), 7)
+        result = b"".join([piece async for piece in aio.decode_chunks(stream)])
+        self.assertEqual(self.read(self.ZXHN_H298Q_C7_db_xml), result)
+
+    async def test_zxhn_h298q_db_type3_decode_chunks(self):
+        stream = stream_reader(self.read(self.ZXHN_H298Q_C7_db_type3))
+        decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+        chunks = aio.decode_chunks(stream, decryptor, read_size=1000)
+        result = [piece async for piece in chunks]
+        self.assertGreater(len(result), 1)
+        self.assertEqual(self.read(self.ZXHN_H298Q_C7_db_xml), b"".join(result))
+
+    async def test_zxhn_h298q_db_type3_decode_records(self):
+        stream = stream_reader(self.read(self.ZXHN_H298Q_C7_db_type3))
+        decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+        records = aio.decode_records(stream, decryptor, read_size=1000)
+        result = [record async for record in records]
+        self.assertEqual(1770, len(result))
+        self.assertEqual(("EthPortConfProduct", 0), result[0][:2])
+
+    async def test_decryptor_from_container(self):
+        def decryptor(container):
+            self.assertEqual(b"ZXHN H168N V3.5", container.signature_bytes)
+            xcryptor = CBCXcryptor()
+            xcryptor.set_key(self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_iv)
+            return xcryptor
+
+        outfile = BytesIO()
+        await aio.decode(
+            stream_reader(self.read(self.ZXHN_H168N_V35_config)), outfile, decryptor
+        )
+        self.assertEqual(self.read(self.ZXHN_H168N_V35_xml), outfile.getvalue())
+
+    async def test_base64_decode(self):
+        data = base64.encodebytes(self.read(self.ZXHN_H168N_V35_config))
+        self.assertTrue(data.startswith(b"BAMC"))
+        xcryptor = CBCXcryptor()
+        xcryptor.set_key(self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_iv)
+        outfile = BytesIO()
+        await aio.decode(pieces(data, 100), outfile, xcryptor)
+        self.assertEqual(self.read(self.ZXHN_H168N_V35_xml), outfile.getvalue())
+
+    async def test_truncated_decode(self):
+        data = self.read(self.ZXHN_H298N_config)
+        with self.assertRaises(AssertionError):
+            await aio.decode(
+                stream_reader(data[:-100]), BytesIO(), Xcryptor(self.ZXHN_H298N_key)
+            )
+        with self.assertRaises(ValueError):
+            await aio.decode(stream_reader(data[:150]), BytesIO())
+
+    async def test_zxhn_h298n_encode(self):
+        xml = self.read(self.ZXHN_H298N_xml)
+        expected = BytesIO()
+        encode_stream(
+            BytesIO(xml),
+            expected,
+            65536,
+            encryptor=Xcryptor(self.ZXHN_H298N_key),
+            signature=b"ZXHN H298N",
+            version=2 << 16,
+            include_header=True,
+        )
+        outfile = BytesIO()
+        await aio.encode(
+            pieces(xml, 1000),
+            outfile,
+            65536,
+            encryptor=Xcryptor(self.ZXHN_H298N_key),
+            signature=b"ZXHN H298N",
+            version=2 << 16,
+            include_header=True,
+            read_size=1000,
+        )
+        self.assertEqual(expected.getvalue(), outfile.getvalue())
+        self.assertEqual(self.read(self.ZXHN_H298N_config), outfile.getvalue())
+
+    async def test_concurrent_decodes(self):
+        data = self.read(self.ZXHN_H298Q_C7_db_type3)
+
+        async def decode():
+            outfile = BytesIO()
+            decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            await aio.decode(stream_reader(data), outfile, decryptor, read_size=4096)
+            return outfile.getvalue()
+
+        results = await asyncio.gather(*[decode() for _ in range(20)])
+        expected = self.read(self.ZXHN_H298Q_C7_db_xml)
+        self.assertTrue(all(result == expected for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import base64
+import binascii
+from io import BytesIO, RawIOBase
+import unittest
+
+import zcu
+from zcu.base64io import Base64Decoder, Base64Reader, PeekableReader, open_config
+
+
+class Unseekable(RawIOBase):
+    """a pipe-like stream, which can only be read"""
+
+    def __init__(self, data):
+        self._data = BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class TestBase64Reader(unittest.TestCase):
+
+    F600W_config = "resources/F600W.bin"
+    F600W_xml = "resources/F600W.xml"
+
+    def setUp(self):
+        with open(self.F600W_config, "rb") as infile:
+            self.data = infile.read()
+        # line endings after the encoded data are ignored
+        self.encoded = BytesIO(base64.b64encode(self.data) + b"\n")
+
+    def test_open_config(self):
+        reader = open_config(self.encoded)
+        self.assertIsInstance(reader, Base64Reader)
+        self.assertFalse(reader.seekable())
+        self.assertEqual(self.data, reader.read())
+
+        raw = BytesIO(self.data)
+        self.assertIs(raw, open_config(raw))
+
+    def test_read(self):
+        reader = open_config(self.encoded)
+        pos = 0
+        for size in (4, 1, 60, 4099, 100000):
+            self.assertEqual(self.data[pos : pos + size], reader.peek(size))
+            self.assertEqual(self.data[pos : pos + size], reader.read(size))
+            pos = min(pos + size, len(self.data))
+            self.assertEqual(pos, reader.tell())
+        self.assertEqual(b"", reader.read(10))
+
+    def test_parse_reads_only_the_start(self):
+        reader = open_config(self.encoded)
+        parsed = zcu.container.parse(reader)
+        self.assertEqual(parsed.payload_offset, reader.tell())
+        # decoded no further than the first block of the payload would need
+        self.assertLess(self.encoded.tell(), 2 * parsed.payload_offset)
+
+    def wrapped(self):
+        # as written by e.g. `base64` or a MIME encoder
+        encoded = base64.encodebytes(self.data).replace(b"\n", b"\r\n")
+        self.assertIn(b"\r\n", encoded[:100])
+        return encoded
+
+    def test_wrapped(self):
+        reader = open_config(BytesIO(self.wrapped()))
+        self.assertEqual(self.data[:100], reader.read(100))
+        self.assertEqual(self.data[100:], reader.read())
+
+    def test_unseekable(self):
+        reader = open_config(Unseekable(self.wrapped()))
+        self.assertIsInstance(reader, Base64Reader)
+        self.assertEqual(self.data, reader.read())
+
+        raw = open_config(Unseekable(self.data))
+        self.assertIsInstance(raw, PeekableReader)
+        self.assertEqual(self.data, raw.read())
+
+    def test_peekable(self):
+        # a pipe which returns at most 5 bytes a read
+        reader = PeekableReader(Unseekable(self.data), read_size=5)
+        self.assertEqual(self.data[:100], reader.peek(100))
+        self.assertEqual(self.data[:10], reader.read(10))
+        self.assertEqual(self.data[10:38], reader.peek(28))
+        self.assertEqual(10, reader.tell())
+        self.assertEqual(self.data[10:], reader.read())
+        self.assertEqual(b"", reader.peek(10))
+
+    def test_decoder(self):
+        decoder = Base64Decoder()
+        encoded = self.wrapped()
+        pieces = [decoder.decode(encoded[i : i + 7]) for i in range(0, len(encoded), 7)]
+        self.assertEqual(self.data, b"".join(pieces) + decoder.flush())
+
+        decoder = Base64Decoder()
+        decoder.decode(b"QUJD\nRE")
+        with self.assertRaises(binascii.Error):
+            decoder.flush()
+
+    def test_decode(self):
+        reader = open_config(self.encoded)
+        parsed = zcu.container.parse(reader)
+        self.assertEqual(b"F600W", parsed.signature_bytes)
+        outfile = BytesIO()
+        zcu.pipeline.decode_stream(reader, outfile)
+        with open(self.F600W_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
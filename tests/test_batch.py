@@ -0,0 +1,143 @@
+import csv
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+from batch import copy_cached, decode_config, main, read_results
+from zcu.cache import DecodeCache
+from zcu.fleet import DEVICE_FIELDS
+
+
+class TestBatch(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    ZXHN_H168N_V35_xml = "resources/ZXHN_H168N_V3.5.xml"
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.input_dir = os.path.join(self.tmpdir.name, "in")
+        self.output_dir = os.path.join(self.tmpdir.name, "out")
+        os.makedirs(self.input_dir)
+
+    def read(self, path):
+        with open(path, "rb") as infile:
+            return infile.read()
+
+    def add(self, relpath, data):
+        path = os.path.join(self.input_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as outfile:
+            outfile.write(data)
+        return path
+
+    def job(self, relpath):
+        path = os.path.join(self.input_dir, relpath)
+        out_path = os.path.join(self.output_dir, os.path.splitext(relpath)[0] + ".xml")
+        return (relpath, path, out_path, dict.fromkeys(DEVICE_FIELDS))
+
+    def run_batch(self, *args):
+        argv = ["batch.py", self.input_dir, self.output_dir, "--workers", "1"]
+        with mock.patch("sys.argv", argv + list(args)), redirect_stdout(StringIO()):
+            main()
+        with open(os.path.join(self.output_dir, "results.csv"), newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_decode_config(self):
+        self.add("a/H298N.bin", self.read(self.ZXHN_H298N_config))
+        result = decode_config(self.job("a/H298N.bin"))
+        out_path = self.job("a/H298N.bin")[2]
+        self.assertEqual("ok", result["status"])
+        self.assertEqual("Wj", result["key"])
+        self.assertEqual("", result["error"])
+        self.assertEqual(self.read(self.ZXHN_H298N_xml), self.read(out_path))
+        self.assertEqual(["H298N.xml"], os.listdir(os.path.dirname(out_path)))
+
+    def test_decode_config_failures(self):
+        data = bytearray(self.read(self.ZXHN_H168N_V35_config))
+        # the first block of the payload no longer decrypts with any key
+        data[99:115] = bytes(16)
+        self.add("nokey.bin", data)
+        self.add("garbage.bin", b"garbage" * 20)
+
+        for relpath, status, error in (
+            ("nokey.bin", "failed", "no key found"),
+            ("garbage.bin", "error", "ValueError: "),
+        ):
+            with self.subTest(relpath=relpath):
+                _, _, out_path, _ = job = self.job(relpath)
+                # a previous output is only ever replaced by a complete one
+                os.makedirs(self.output_dir, exist_ok=True)
+                with open(out_path, "wb") as outfile:
+                    outfile.write(b"previous")
+                result = decode_config(job)
+                self.assertEqual(status, result["status"])
+                self.assertTrue(result["error"].startswith(error))
+                self.assertEqual(b"previous", self.read(out_path))
+                self.assertFalse(os.path.exists(out_path + ".tmp"))
+
+    def test_copy_cached(self):
+        cache = DecodeCache(os.path.join(self.tmpdir.name, "cache"))
+        job = self.job("H298N.bin")
+        self.assertIsNone(copy_cached(cache, job, "abc"))
+        self.assertFalse(os.path.exists(job[2]))
+
+        with open(self.ZXHN_H298N_xml, "rb") as decoded:
+            cache.put("abc", decoded, 2, key="Wj", source="model")
+        result = copy_cached(cache, job, "abc")
+        self.assertEqual("ok", result["status"])
+        self.assertEqual("yes", result["cached"])
+        self.assertEqual("Wj", result["key"])
+        self.assertEqual("", result["iv"])
+        self.assertEqual(2, result["payload_type"])
+        self.assertEqual(self.read(self.ZXHN_H298N_xml), self.read(job[2]))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_resume(self):
+        self.add("H298N.bin", self.read(self.ZXHN_H298N_config))
+        self.add("b/H168N.bin", self.read(self.ZXHN_H168N_V35_config))
+        self.add("garbage.bin", b"garbage" * 20)
+        cache_dir = os.path.join(self.tmpdir.name, "cache")
+
+        rows = self.run_batch("--cache", cache_dir)
+        self.assertEqual(
+            {"H298N.bin": "ok", "b/H168N.bin": "ok", "garbage.bin": "error"},
+            {row["file"]: row["status"] for row in rows},
+        )
+        self.assertEqual(
+            self.read(self.ZXHN_H168N_V35_xml),
+            self.read(os.path.join(self.output_dir, "b/H168N.xml")),
+        )
+
+        # only the failed file and the one whose output went missing are redone,
+        # the latter from the cache
+        os.remove(os.path.join(self.output_dir, "H298N.xml"))
+        rows = self.run_batch("--cache", cache_dir)
+        self.assertEqual(
+            [("H298N.bin", "ok", "yes"), ("garbage.bin", "error", "")],
+            sorted((row["file"], row["status"], row["cached"]) for row in rows[3:]),
+        )
+        self.assertEqual(
+            self.read(self.ZXHN_H298N_xml),
+            self.read(os.path.join(self.output_dir, "H298N.xml")),
+        )
+
+        # the last result recorded for each file wins
+        results = read_results(os.path.join(self.output_dir, "results.csv"))
+        self.assertEqual("yes", results["H298N.bin"]["cached"])
+        self.assertEqual(3, len(results))
+
+        # a run without the cache still skips the decoded files
+        rows = self.run_batch()
+        self.assertEqual(["garbage.bin"], [row["file"] for row in rows[5:]])
+
+
+if __name__ == "__main__":
+    unittest.main()
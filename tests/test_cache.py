@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from zcu.cache import DecodeCache, digest
+
+
+class TestDecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, "cache")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_digest(self):
+        infile = BytesIO(b"config")
+        infile.seek(3)
+        first = digest(infile)
+        # the whole file is hashed and its position is left unchanged
+        self.assertEqual(3, infile.tell())
+        self.assertEqual(first, digest(BytesIO(b"config")))
+        self.assertNotEqual(first, digest(BytesIO(b"config2")))
+        self.assertNotEqual(first, digest(BytesIO(b"config"), {"serial": "x"}))
+        self.assertEqual(
+            digest(BytesIO(b"config"), {"a": 1, "b": 2}),
+            digest(BytesIO(b"config"), {"b": 2, "a": 1}),
+        )
+
+    def test_miss_then_hit(self):
+        cache = DecodeCache(self.directory)
+        self.assertIsNone(cache.copy("abc", BytesIO()))
+        cache.put("abc", BytesIO(b"<xml/>"), 4, "key", "iv", "keygen")
+        outfile = BytesIO()
+        entry = cache.copy("abc", outfile)
+        self.assertEqual(b"<xml/>", outfile.getvalue())
+        self.assertEqual(4, entry["payload_type"])
+        self.assertEqual(
+            ("key", "iv", "keygen"), (entry["key"], entry["iv"], entry["source"])
+        )
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_save_and_load(self):
+        cache = DecodeCache(self.directory)
+        cache.put("abc", BytesIO(b"<xml/>"), 2, "key")
+        cache.get("missing")
+        cache.save()
+
+        cache = DecodeCache(self.directory)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(6, cache.size)
+        path, entry = cache.get("abc")
+        self.assertEqual("key", entry["key"])
+        with open(path, "rb") as f:
+            self.assertEqual(b"<xml/>", f.read())
+
+    def test_lru_eviction(self):
+        cache = DecodeCache(self.directory, max_size=25)
+        cache.put("a", BytesIO(b"0123456789"), 0)
+        cache.put("b", BytesIO(b"0123456789"), 0)
+        # a is now the most recently used
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", BytesIO(b"0123456789"), 0)
+        self.assertEqual(["a", "c"], list(cache.entries))
+        self.assertEqual(20, cache.size)
+        self.assertFalse(os.path.exists(cache.path("b")))
+        self.assertIsNone(cache.get("b"))
+
+        # the order is kept across loads
+        cache.save()
+        cache = DecodeCache(self.directory, max_size=25)
+        cache.put("d", BytesIO(b"0123456789"), 0)
+        self.assertEqual(["c", "d"], list(cache.entries))
+
+    def test_missing_file(self):
+        cache = DecodeCache(self.directory)
+        cache.put("abc", BytesIO(b"<xml/>"), 0)
+        os.remove(cache.path("abc"))
+        self.assertIsNone(cache.get("abc"))
+        self.assertEqual(0, cache.size)
+        self.assertEqual({}, cache.entries)
+
+    def test_concurrent_save(self):
+        first = DecodeCache(self.directory)
+        first.put("a", BytesIO(b"0123456789"), 0)
+        first.save()
+
+        # both loaded the same index, neither loses what the other saved
+        first = DecodeCache(self.directory)
+        second = DecodeCache(self.directory)
+        first.put("b", BytesIO(b"0123456789"), 0)
+        self.assertIsNone(first.get("x"))
+        second.put("c", BytesIO(b"0123456789"), 0)
+        self.assertIsNotNone(second.get("a"))
+        self.assertIsNotNone(second.get("c"))
+        first.save()
+        second.save()
+        self.assertFalse(os.path.exists(first.index_path + ".lock"))
+
+        cache = DecodeCache(self.directory)
+        self.assertEqual(["b", "a", "c"], list(cache.entries))
+        self.assertEqual(30, cache.size)
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(second.entries, cache.entries)
+
+        # a removed entry stays removed, one put back afterwards is kept
+        first = DecodeCache(self.directory, max_size=25)
+        second = DecodeCache(self.directory)
+        first.put("d", BytesIO(b"0123456789"), 0)
+        self.assertEqual(["c", "d"], list(first.entries))
+        second.put("b", BytesIO(b"0123456789"), 0)
+        first.save()
+        second.save()
+        cache = DecodeCache(self.directory)
+        self.assertEqual(["c", "d", "b"], list(cache.entries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from types import SimpleNamespace
+
+from zcu.candidates import candidate_id, candidates, direct_candidates, prioritise
+from zcu.fleet import DEVICE_FIELDS
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+def auto_args(**kwargs):
+    args = SimpleNamespace(
+        key=None,
+        iv=None,
+        signature=None,
+        serial_number=None,
+        mac_address=None,
+        password=None,
+        key_prefix=None,
+        key_suffix=None,
+        iv_prefix=None,
+        iv_suffix=None,
+    )
+    vars(args).update(kwargs)
+    return args
+
+
+class TestCandidates(unittest.TestCase):
+    def test_candidate_id(self):
+        self.assertEqual(
+            candidate_id(CBCXcryptor, ("key", None)),
+            candidate_id(CBCXcryptor, ("key", "key")),
+        )
+        self.assertNotEqual(
+            candidate_id(Xcryptor, ("key", None)),
+            candidate_id(CBCXcryptor, ("key", None)),
+        )
+
+    def test_candidates_are_unique(self):
+        found = list(candidates(auto_args(signature="ZXHN H168N V3.5")))
+        ids = [candidate_id(cls, keypair) for cls, keypair, _ in found]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertIn(
+            (
+                CBCXcryptor,
+                ("ZXHN H168N V3.5Key02721401", "ZXHN H168N V3.5Iv02721401"),
+                "signature_keypairs/CBCXcryptor: signature + 'Key02721401'",
+            ),
+            found,
+        )
+
+    def test_prioritise(self):
+        found = list(candidates(auto_args(signature="ZXHN H168N V3.5")))
+        ranking = [found[-1][2], found[3][2], "no_keypairs/Xcryptor: unknown"]
+        ranked = list(prioritise(found, ranking))
+        self.assertEqual([found[-1], found[3]], ranked[:2])
+        self.assertCountEqual(found, ranked)
+
+    def test_prioritise_absent_source(self):
+        args = auto_args(signature="ZXHN H168N V3.5")
+        signature_source = "signature_keypairs/CBCXcryptor: signature + 'Key02721401'"
+        # no MAC address is given, so this never occurs
+        mac_source = "mac_keypairs/Xcryptor: md5(mac[6:] + 'Wj%2$CjM')"
+        consumed = []
+
+        def tracked():
+            for candidate in candidates(args):
+                consumed.append(candidate)
+                yield candidate
+
+        first = next(prioritise(tracked(), [mac_source, signature_source]))
+        self.assertEqual(signature_source, first[2])
+        # yielded as soon as it is generated, not after all the candidates
+        self.assertEqual(first, consumed[-1])
+        self.assertLess(len(consumed), len(list(candidates(args))))
+
+    def test_direct_candidates(self):
+        device = dict.fromkeys(DEVICE_FIELDS)
+        cls, keypair, source = next(direct_candidates(2, "ZXHN H298N", device))
+        self.assertEqual((Xcryptor, ("Wj", None)), (cls, keypair))
+        models = [keypair[0] for _, keypair, _ in direct_candidates(3, "", device)]
+        self.assertIn("H298Q", models)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import struct
 import unittest
+import zlib
+from io import BytesIO
 
 import zcu
 
@@ -18,6 +20,9 @@ class TestCompressionMethods(unittest.TestCase):
     F600W_xml = "resources/F600W.xml"
     F600W_zlib = "resources/F600W.zlib"
 
+    DB_DEFAULT_AUTO_CFG_xml = "resources/db_default_auto_cfg.xml"
+    DB_DEFAULT_AUTO_CFG_bin = "resources/db_default_auto_cfg.bin"
+
     def test_zxhn_h298n_compress_helper(self):
         with open(self.ZXHN_H298N_xml, "rb") as infile:
             data, stats = zcu.compression.compress_helper(infile, 65536)
@@ -158,6 +163,97 @@ class TestCompressionMethods(unittest.TestCase):
             self.assertEqual(b"<DB>", xml)
             self.assertEqual(132239431, crc)
 
+    def test_db_default_auto_cfg_compress_workers(self):
+        for incorrect_compressed_size in (False, True):
+            with open(self.DB_DEFAULT_AUTO_CFG_xml, "rb") as infile:
+                expected = zcu.compression.compress(
+                    infile, 8192, incorrect_compressed_size=incorrect_compressed_size
+                )
+            with open(self.DB_DEFAULT_AUTO_CFG_xml, "rb") as infile:
+                data = zcu.compression.compress(
+                    infile,
+                    8192,
+                    incorrect_compressed_size=incorrect_compressed_size,
+                    workers=4,
+                )
+            self.assertEqual(expected.read(), data.read())
+
+    def test_db_default_auto_cfg_decompress_chunks(self):
+        with open(self.DB_DEFAULT_AUTO_CFG_bin, "rb") as infile:
+            infile.seek(60)
+            chunks = list(zcu.compression.decompress_chunks(infile))
+        self.assertEqual(25, len(chunks))
+        self.assertTrue(all(len(chunk) == 8192 for chunk, _ in chunks[:-1]))
+        self.assertEqual(1664981864, chunks[-1][1])
+        with open(self.DB_DEFAULT_AUTO_CFG_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), b"".join(c for c, _ in chunks))
+
+    def test_db_default_auto_cfg_scan_chunks(self):
+        with open(self.DB_DEFAULT_AUTO_CFG_bin, "rb") as infile:
+            infile.seek(60)
+            index = zcu.compression.scan_chunks(infile)
+            end_pos = infile.tell()
+            self.assertEqual(infile.seek(0, 2), end_pos)
+        self.assertEqual(25, len(index))
+        self.assertEqual((72, 1008, 8192), index[0])
+        self.assertEqual(197902, sum(length for _, _, length in index))
+
+    def test_db_default_auto_cfg_decompress_workers(self):
+        with open(self.DB_DEFAULT_AUTO_CFG_bin, "rb") as infile:
+            infile.seek(60)
+            data, crc = zcu.compression.decompress(infile, workers=4)
+        self.assertEqual(1664981864, crc)
+        with open(self.DB_DEFAULT_AUTO_CFG_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), data.read())
+
+    def test_decompress_workers_untrusted_length(self):
+        # a header claiming a ~4GB chunk is rejected, not allocated
+        chunk = zlib.compress(b"<DB></DB>")
+        payload = struct.pack(">3I", 0xFFFFFFF0, len(chunk), 0) + chunk
+        with self.assertRaises(AssertionError):
+            zcu.compression.decompress(BytesIO(payload), workers=2)
+
+    def test_f600w_decompress_stream(self):
+        with open(self.F600W_zlib, "rb") as infile:
+            infile.seek(60)
+            outfile = BytesIO()
+            crc = zcu.compression.decompress_stream(infile, outfile)
+        self.assertEqual(132239431, crc)
+        with open(self.F600W_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_f600w_inflater(self):
+        with open(self.F600W_zlib, "rb") as infile:
+            outfile = BytesIO()
+            inflater = zcu.compression.Inflater(outfile)
+            # pieces that straddle both the headers and the ZLIB chunks
+            for piece in iter(lambda: infile.read(7), b""):
+                inflater.feed(piece)
+        self.assertTrue(inflater.done)
+        self.assertEqual(132239431, inflater.close())
+        with open(self.F600W_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_f600w_inflater_truncated(self):
+        with open(self.F600W_zlib, "rb") as infile:
+            inflater = zcu.compression.Inflater(BytesIO())
+            inflater.feed(infile.read(1000))
+        self.assertFalse(inflater.done)
+        with self.assertRaises(AssertionError):
+            inflater.close()
+
+    def test_inflater_malformed_chunk(self):
+        data = b"<DB></DB>"
+        chunk = zlib.compress(data)
+        # without the ADLER-32 the data is complete but the stream is not,
+        # and trailing bytes are within the compressed length
+        for compressed in (chunk[:-4], chunk + b"junk"):
+            with self.subTest(compressed=compressed):
+                header = struct.pack(">3I", len(data), len(compressed), 0)
+                inflater = zcu.compression.Inflater(BytesIO(), read_header=False)
+                with self.assertRaises(AssertionError):
+                    inflater.feed(header + compressed)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+from contextlib import redirect_stdout
+from io import BytesIO, RawIOBase, StringIO
+import unittest
+
+from zcu import container
+
+
+class Unseekable(RawIOBase):
+    """a pipe-like stream, which can only be read"""
+
+    def __init__(self, data):
+        self._data = BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class TestContainer(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_signature = b"ZXHN H298N"
+
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    ZXHN_H168N_V35_signature = b"ZXHN H168N V3.5"
+
+    XML_config = "resources/db_default_auto_cfg.bin"
+
+    def test_zxhn_h298n_parse(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = infile.read()
+        parsed = container.parse(memoryview(data))
+        self.assertEqual(128, parsed.header_length)
+        self.assertEqual(len(data), 128 + parsed.header.signed_config_size)
+        self.assertEqual(self.ZXHN_H298N_signature, parsed.signature_bytes)
+        self.assertEqual(22, parsed.signature.size)
+        self.assertEqual(2, parsed.payload_type)
+        self.assertEqual(210, parsed.payload_offset)
+
+    def test_zxhn_h168n_v35_parse_file(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as infile:
+            parsed = container.parse(infile)
+            self.assertEqual(87, infile.tell())
+        self.assertIsNone(parsed.header)
+        self.assertEqual(0, parsed.header_length)
+        self.assertEqual(self.ZXHN_H168N_V35_signature, parsed.signature_bytes)
+        self.assertEqual(4, parsed.payload_type)
+
+    def test_xml_parse(self):
+        with open(self.XML_config, "rb") as infile:
+            data = infile.read()
+        parsed = container.parse(BytesIO(data))
+        self.assertIsNone(parsed.signature)
+        self.assertEqual(b"", parsed.signature_bytes)
+        payload_header = parsed.payload_header
+        self.assertEqual(0, payload_header.payload_type)
+        self.assertEqual(197902, payload_header.decompressed_length)
+        self.assertEqual(8192, payload_header.chunk_size)
+        self.assertEqual(1664981864, payload_header.crc)
+        self.assertEqual(60, parsed.payload_offset)
+        self.assertEqual(data[:60], payload_header.pack())
+
+        chunk_header = container.ChunkHeader.unpack_from(data, parsed.payload_offset)
+        self.assertEqual(8192, chunk_header.decompressed_length)
+        self.assertEqual(1008, chunk_header.compressed_length)
+        self.assertNotEqual(0, chunk_header.more_chunks)
+        self.assertEqual(
+            data[parsed.payload_offset : parsed.payload_offset + 12],
+            chunk_header.pack(),
+        )
+
+    def test_wrong_endianness_warns(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = bytearray(infile.read())
+        # the same header, written little-endian
+        fields = container.ZTE_HEADER[False].unpack_from(data, 16)
+        container.ZTE_HEADER[True].pack_into(data, 16, *fields)
+        stdout = StringIO()
+        with redirect_stdout(stdout), self.assertWarns(UserWarning):
+            parsed = container.parse(bytes(data))
+        self.assertEqual("", stdout.getvalue())
+        self.assertTrue(parsed.header.little_endian)
+        self.assertEqual(128, parsed.header_length)
+
+    def test_parse_unseekable(self):
+        for path, payload_offset in (
+            (self.ZXHN_H298N_config, 210),
+            (self.ZXHN_H168N_V35_config, 87),
+        ):
+            with self.subTest(path=path):
+                with open(path, "rb") as infile:
+                    data = infile.read()
+                for length in (None, len(data)):
+                    stream = Unseekable(data)
+                    parsed = container.parse(stream, length=length)
+                    self.assertEqual(payload_offset, parsed.payload_offset)
+                    # read no further than the payload
+                    self.assertEqual(data[payload_offset:], stream.read())
+
+        # a length which is given is still checked against the header
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = infile.read()
+        with self.assertRaises(AssertionError):
+            container.parse(Unseekable(data), length=len(data) - 1)
+
+    def test_parse_errors(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = infile.read()
+        with self.assertRaises(AssertionError):
+            container.parse(data[:-1])
+        with self.assertRaises(ValueError):
+            container.parse(b"\0" * 100)
+        with self.assertRaises(ValueError):
+            container.parse(b"\x01\x02")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import concurrent.futures
+import http.client
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import daemon
+from daemon import Busy, LatencyStats, RequestHandler, Server, Service
+from zcu.fleet import NoKeyFound
+
+
+def sleep_request(data, params):
+    time.sleep(float(params["seconds"]))
+    return data
+
+
+class FakeService:
+    timeout = 1
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+
+    def run(self, name, data, params):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_summary(self):
+        stats = LatencyStats()
+        for ms in range(100, 0, -1):
+            stats.record("decode", ms / 1000, "ok")
+        stats.record("decode", 5, "error")
+        stats.record("encode", 0, "rejected")
+        self.assertEqual(
+            {
+                "decode": {
+                    "ok": 100,
+                    "error": 1,
+                    "p50_ms": 50.0,
+                    "p90_ms": 90.0,
+                    "p99_ms": 99.0,
+                },
+                "encode": {
+                    "rejected": 1,
+                    "p50_ms": None,
+                    "p90_ms": None,
+                    "p99_ms": None,
+                },
+            },
+            stats.summary(),
+        )
+
+    def test_window(self):
+        stats = LatencyStats(window=2)
+        for seconds in (1, 0.002, 0.001):
+            stats.record("info", seconds, "ok")
+        summary = stats.summary()["info"]
+        # the counts are kept for every request, the latencies only for the last
+        self.assertEqual(3, summary["ok"])
+        self.assertEqual(1.0, summary["p50_ms"])
+        self.assertEqual(1.0, summary["p90_ms"])
+
+
+class TestService(unittest.TestCase):
+    def test_backpressure(self):
+        service = Service(workers=1, queue_size=1, timeout=0.2)
+        self.addCleanup(service.shutdown)
+        with mock.patch.dict(daemon.HANDLERS, {"sleep": sleep_request}):
+            # one running and one waiting, both still hold their slot after
+            # the caller has given up on them
+            for _ in range(2):
+                with self.assertRaises(concurrent.futures.TimeoutError):
+                    service.run("sleep", b"", {"seconds": "0.5"})
+            with self.assertRaises(Busy):
+                service.run("sleep", b"", {"seconds": "0"})
+            self.assertEqual(0, service.summary()["pending"])
+
+            # a slot is released once the worker is done with it, this request
+            # may still wait for the other one
+            service.timeout = 5
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    result = service.run("sleep", b"x", {"seconds": "0"})
+                    break
+                except Busy:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.05)
+            self.assertEqual(b"x", result)
+
+        summary = service.summary()["requests"]["sleep"]
+        self.assertEqual(1, summary["ok"])
+        self.assertEqual(2, summary["error"])
+        self.assertGreaterEqual(summary["rejected"], 1)
+
+
+class TestRequestHandler(unittest.TestCase):
+    def serve(self, service):
+        handler = type(
+            "Handler", (RequestHandler,), {"service": service, "max_size": 16}
+        )
+        server = Server(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def post(self, port, path, body=b"config"):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request("POST", path, body)
+        response = connection.getresponse()
+        return response.status, response.getheaders(), response.read()
+
+    def test_errors(self):
+        for error, status in (
+            (Busy(), 503),
+            (concurrent.futures.TimeoutError(), 504),
+            (NoKeyFound("no key found"), 422),
+            (ValueError("bad magic"), 400),
+            (AssertionError("bad length"), 400),
+            (KeyError("broken"), 500),
+        ):
+            with self.subTest(error=error):
+                port = self.serve(FakeService(error=error))
+                with mock.patch.object(RequestHandler, "log_error"):
+                    got, headers, body = self.post(port, "/decode")
+                self.assertEqual(status, got)
+                self.assertIn("error", json.loads(body))
+                if status == 503:
+                    self.assertIn(("Retry-After", "1"), headers)
+
+    def test_ok(self):
+        port = self.serve(FakeService(result=(b"<xml/>", {"key": "Wj"})))
+        status, headers, body = self.post(port, "/decode")
+        self.assertEqual(200, status)
+        self.assertEqual(b"<xml/>", body)
+        self.assertIn(("X-ZCU-key", "Wj"), headers)
+
+        self.assertEqual(404, self.post(port, "/unknown")[0])
+        self.assertEqual(413, self.post(port, "/decode", bytes(17))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import xml.etree.ElementTree as ET
+
+from zcu.dbxml import (
+    DBParser,
+    decode_records,
+    decode_select,
+    iter_records,
+    read_records,
+    select,
+    selection,
+)
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+def expected_records(path):
+    return [
+        (table.get("name"), int(row.get("No")), dm.get("name"), dm.get("val"))
+        for table in ET.parse(path).getroot()
+        for row in table
+        for dm in row
+    ]
+
+
+class TestDBXml(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+    ZXHN_H298N_key = "Wj"
+
+    ZXHN_H298Q_C7_db_type3 = "resources/ZXHN_H298Q_C7_db_type3.bin"
+    ZXHN_H298Q_C7_db_type0 = "resources/ZXHN_H298Q_C7_db_type0.bin"
+    ZXHN_H298Q_C7_db_xml = "resources/ZXHN_H298Q_C7_db.xml"
+    ZXHN_H298Q_C7_db_key = "H298Q"
+
+    def test_records(self):
+        xml = (
+            b'<DB>\n<Tbl name="ETH" RowCount="2">\n<Row No="0">\n'
+            b'<DM name="Enable" val="1"/>\n<DM name="IFName" val="eth&amp;0"/>\n'
+            b'</Row>\n<Row No="1">\n<DM name="Enable" val="0"/>\n</Row>\n</Tbl>\n'
+            b'<Tbl name="Empty" RowCount="0">\n</Tbl>\n</DB>\n'
+        )
+        # split anywhere, even inside a tag
+        pieces = [xml[i : i + 5] for i in range(0, len(xml), 5)]
+        self.assertEqual(
+            [
+                ("ETH", 0, "Enable", "1"),
+                ("ETH", 0, "IFName", "eth&0"),
+                ("ETH", 1, "Enable", "0"),
+            ],
+            list(iter_records(pieces)),
+        )
+
+    def test_elements_are_dropped(self):
+        parser = DBParser()
+        parser.feed(b'<DB><Tbl name="ETH" RowCount="1"><Row No="0">')
+        for _ in range(100):
+            parser.feed(b'<DM name="Enable" val="1"/>')
+        parser.feed(b"</Row><Row No='1'>")
+        db, table, row = parser._elements
+        self.assertEqual([table], list(db))
+        self.assertEqual([row], list(table))
+        self.assertEqual([], list(row))
+
+    def test_incomplete(self):
+        parser = DBParser()
+        parser.feed(b'<DB><Tbl name="ETH" RowCount="1">')
+        with self.assertRaises(ET.ParseError):
+            parser.close()
+
+    def test_read_records(self):
+        with open(self.ZXHN_H298N_xml, "rb") as infile:
+            records = list(read_records(infile, 1000))
+        self.assertEqual(expected_records(self.ZXHN_H298N_xml), records)
+
+    def test_zxhn_h298n_decode_records(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            infile.seek(210)
+            records = list(decode_records(infile, Xcryptor(self.ZXHN_H298N_key), 1000))
+        self.assertEqual(expected_records(self.ZXHN_H298N_xml), records)
+
+    def test_zxhn_h298q_db_type3_decode_records(self):
+        with open(self.ZXHN_H298Q_C7_db_type3, "rb") as infile:
+            infile.seek(60)
+            decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            records = list(decode_records(infile, decryptor))
+        self.assertEqual(expected_records(self.ZXHN_H298Q_C7_db_xml), records)
+
+    def test_zxhn_h298q_db_type0_decode_records(self):
+        with open(self.ZXHN_H298Q_C7_db_type0, "rb") as infile:
+            infile.seek(60)
+            records = list(decode_records(infile))
+        self.assertEqual(expected_records(self.ZXHN_H298Q_C7_db_xml), records)
+
+    def test_selection(self):
+        self.assertEqual(
+            {"ETH": None, "WANC": {"User", "Password"}},
+            selection(
+                ["ETH", ("WANC", "User"), ("ETH", "Enable"), ("WANC", "Password")]
+            ),
+        )
+
+    def test_select(self):
+        expected = expected_records(self.ZXHN_H298N_xml)
+        with open(self.ZXHN_H298N_xml, "rb") as infile:
+            pieces = iter(lambda: infile.read(1000), b"")
+            records = list(select(pieces, ["ETH", ("DBBase", "IFInfo")]))
+        self.assertEqual(
+            [record for record in expected if record[0] in ("ETH", "DBBase")],
+            records,
+        )
+
+    def test_select_stops_reading(self):
+        with open(self.ZXHN_H298Q_C7_db_type3, "rb") as infile:
+            infile.seek(60)
+            decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            items = [("EthPortConfProduct", "ViewName")]
+            records = list(decode_select(infile, items, decryptor, 1000))
+            self.assertLess(infile.tell(), 2000)
+        self.assertEqual(
+            [
+                ("EthPortConfProduct", row, "ViewName", f"DEV.ETH.IF{row + 1}")
+                for row in range(5)
+            ],
+            records,
+        )
+
+    def test_select_missing_table(self):
+        with open(self.ZXHN_H298Q_C7_db_type0, "rb") as infile:
+            infile.seek(60)
+            self.assertEqual([], list(decode_select(infile, ["ETH", "Nope"])))
+            # the whole payload had to be read to be sure
+            self.assertEqual(infile.seek(0, 2), infile.tell())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from zcu.fleet import DEVICE_FIELDS, NoKeyFound, decode, find_configs
+
+
+class TestFleet(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    ZXHN_H168N_V35_xml = "resources/ZXHN_H168N_V3.5.xml"
+
+    def test_find_configs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for path in ("b/config.bin", "a/config.bin", "a/notes.txt", "c.bin"):
+                path = os.path.join(directory, path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "wb").close()
+            self.assertEqual(
+                ["c.bin", "a/config.bin", "b/config.bin"],
+                list(find_configs(directory, "*.bin")),
+            )
+
+    def test_decode(self):
+        for path, xml_path, key in (
+            (self.ZXHN_H298N_config, self.ZXHN_H298N_xml, "Wj"),
+            (
+                self.ZXHN_H168N_V35_config,
+                self.ZXHN_H168N_V35_xml,
+                "ZXHNH168NV3.5Key02721401",
+            ),
+        ):
+            with self.subTest(path=path):
+                outfile = BytesIO()
+                with open(path, "rb") as infile:
+                    info = decode(infile, outfile, dict.fromkeys(DEVICE_FIELDS))
+                self.assertEqual(key, info["key"])
+                with open(xml_path, "rb") as goodFile:
+                    self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_no_key_found(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as infile:
+            data = bytearray(infile.read())
+        # the first block of the payload no longer decrypts with any key
+        data[99:115] = bytes(16)
+        with self.assertRaises(NoKeyFound):
+            decode(BytesIO(data), BytesIO(), dict.fromkeys(DEVICE_FIELDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
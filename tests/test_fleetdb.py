@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from io import BytesIO
+from xml.etree.ElementTree import ParseError
+
+from zcu.fleetdb import FleetDB
+
+
+class TestFleetDB(unittest.TestCase):
+
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+    F600W_xml = "resources/F600W.xml"
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "fleet.db")
+        self.db = FleetDB(self.path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def import_file(self, device, path):
+        with open(path, "rb") as infile:
+            return self.db.import_config(device, infile)
+
+    def values(self, device):
+        return self.db.connection.execute(
+            "SELECT COUNT(*) FROM dm WHERE device = ?", (device,)
+        ).fetchone()[0]
+
+    def test_import(self):
+        self.assertEqual(7487, self.import_file("r1", self.ZXHN_H298N_xml))
+        self.assertEqual(3758, self.import_file("r2", self.F600W_xml))
+        self.db.commit()
+        self.db.close()
+
+        self.db = FleetDB(self.path)
+        self.assertEqual(["r1", "r2"], self.db.devices())
+        rows = self.db.connection.execute(
+            'SELECT device, value FROM dm WHERE "table" = ? AND row = ? AND name = ?',
+            ("ETH", 2, "IFName"),
+        ).fetchall()
+        self.assertEqual([("r1", "eth2")], rows)
+
+    def test_import_is_not_committed(self):
+        self.import_file("r1", self.ZXHN_H298N_xml)
+        self.assertTrue(self.db.connection.in_transaction)
+        other = sqlite3.connect(self.path)
+        try:
+            count = "SELECT COUNT(*) FROM devices"
+            self.assertEqual(0, other.execute(count).fetchone()[0])
+            self.db.commit()
+            self.assertEqual(1, other.execute(count).fetchone()[0])
+        finally:
+            other.close()
+
+    def test_unchanged_is_skipped(self):
+        self.assertEqual(7487, self.import_file("r1", self.ZXHN_H298N_xml))
+        config_hash = self.db.hash("r1")
+        self.assertIsNone(self.import_file("r1", self.ZXHN_H298N_xml))
+        # a changed config replaces the values of the device
+        self.assertEqual(3758, self.import_file("r1", self.F600W_xml))
+        self.assertNotEqual(config_hash, self.db.hash("r1"))
+        self.assertEqual(3758, self.values("r1"))
+
+    def test_truncated_is_rolled_back(self):
+        self.import_file("r1", self.ZXHN_H298N_xml)
+        self.import_file("r2", self.F600W_xml)
+        config_hash = self.db.hash("r1")
+        with open(self.F600W_xml, "rb") as infile:
+            truncated = BytesIO(infile.read(5000))
+        with self.assertRaises(ParseError):
+            self.db.import_config("r1", truncated)
+        self.db.commit()
+        self.assertEqual(config_hash, self.db.hash("r1"))
+        self.assertEqual(7487, self.values("r1"))
+        self.assertEqual(3758, self.values("r2"))
+
+    def test_remove(self):
+        self.import_file("r1", self.ZXHN_H298N_xml)
+        self.db.remove("r1")
+        self.assertEqual([], self.db.devices())
+        self.assertEqual(0, self.values("r1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from zcu.hitstats import HitStats, signature_prefix
+
+
+class TestHitStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "stats.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_signature_prefix(self):
+        self.assertEqual("zxhn h298q", signature_prefix("ZXHN H298Q V7.0"))
+        self.assertEqual("zxhn h168n", signature_prefix("ZXHN H168N V3.5"))
+        self.assertEqual("f600w", signature_prefix("F600W"))
+        self.assertEqual("zxhn f450(epon onu)", signature_prefix("ZXHN F450(EPON ONU)"))
+
+    def test_empty(self):
+        stats = HitStats(self.path)
+        self.assertEqual([], stats.ranking("ZXHN H298Q V7.0", 4))
+
+    def test_ranking(self):
+        stats = HitStats(self.path)
+        stats.record("ZXHN H298Q V7.0", 4, "a")
+        stats.record("ZXHN H298Q V7.1", 4, "b")
+        stats.record("ZXHN H298Q V7.1", 4, "b")
+        stats.record("ZXHN H168N V3.5", 4, "c")
+        stats.record("ZXHN H168N V3.5", 4, "c")
+        stats.record("ZXHN H168N V3.5", 4, "c")
+        stats.record("ZXHN H298Q V7.0", 2, "d")
+        # signature prefix first, then anything else seen for the payload type
+        self.assertEqual(["b", "a", "c"], stats.ranking("ZXHN H298Q V8.0", 4))
+        self.assertEqual(["c", "b", "a"], stats.ranking("ZXHN H267A", 4))
+        self.assertEqual(["d"], stats.ranking("ZXHN H267A", 2))
+
+    def test_save_and_load(self):
+        stats = HitStats(self.path)
+        stats.record("ZXHN H298Q V7.0", 4, "a")
+        stats.save()
+        stats = HitStats(self.path)
+        self.assertEqual(["a"], stats.ranking("ZXHN H298Q V7.0", 4))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestInit(unittest.TestCase):
+    def test_lazy_modules(self):
+        # a fresh interpreter, as the tests have imported everything already
+        code = (
+            "import sys, zcu\n"
+            "assert 'zcu.aio' not in sys.modules\n"
+            "assert 'zcu.keystore' not in sys.modules\n"
+            "assert 'asyncio' not in sys.modules\n"
+            "assert zcu.keystore.KeyStore\n"
+            "assert 'zcu.keystore' in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_missing_attribute(self):
+        import zcu
+
+        with self.assertRaises(AttributeError):
+            zcu.nonexistent  # pylint: disable=pointless-statement
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from zcu.keysearch import new_xcryptor, search
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+class TestKeySearch(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_zlib = "resources/ZXHN_H298N.zlib"
+
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    ZXHN_H168N_V35_zlib = "resources/ZXHN_H168N_V3.5.zlib"
+    ZXHN_H168N_V35_keypair = ("ZXHNH168NV3.5Key02721401", "ZXHNH168NV3.5Iv02721401")
+
+    WRONG_CANDIDATES = [
+        (Xcryptor, ("foo", None)),
+        (CBCXcryptor, ("foo", "bar")),
+        (CBCXcryptor, ("ZXHNH168NV3.5Key02710010", "ZXHNH168NV3.5Iv02710010")),
+    ]
+
+    def assert_search(self, config, offset, zlib, candidates, expected, workers):
+        with open(config, "rb") as infile:
+            infile.seek(offset)
+            res = search(infile, candidates, workers=workers)
+            self.assertEqual(offset, infile.tell())
+        self.assertEqual(expected, res)
+        with open(config, "rb") as infile:
+            infile.seek(offset)
+            decrypted = new_xcryptor(res).decrypt(infile)
+        with open(zlib, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), decrypted.read())
+
+    def test_zxhn_h298n_search(self):
+        expected = (Xcryptor, ("Wj", None))
+        candidates = self.WRONG_CANDIDATES + [expected]
+        self.assert_search(
+            self.ZXHN_H298N_config, 210, self.ZXHN_H298N_zlib, candidates, expected, 1
+        )
+
+    def test_zxhn_h168n_v35_search(self):
+        expected = (CBCXcryptor, self.ZXHN_H168N_V35_keypair)
+        candidates = self.WRONG_CANDIDATES + [expected]
+        self.assert_search(
+            self.ZXHN_H168N_V35_config,
+            87,
+            self.ZXHN_H168N_V35_zlib,
+            candidates,
+            expected,
+            1,
+        )
+
+    def test_zxhn_h168n_v35_search_workers(self):
+        # first matching candidate wins, regardless of which worker found it
+        expected = (CBCXcryptor, self.ZXHN_H168N_V35_keypair, "first")
+        candidates = (
+            self.WRONG_CANDIDATES * 4
+            + [expected]
+            + [(CBCXcryptor, self.ZXHN_H168N_V35_keypair, "second")]
+        )
+        self.assert_search(
+            self.ZXHN_H168N_V35_config,
+            87,
+            self.ZXHN_H168N_V35_zlib,
+            iter(candidates),
+            expected,
+            3,
+        )
+
+    def test_search_no_match(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as infile:
+            infile.seek(87)
+            self.assertIsNone(search(infile, self.WRONG_CANDIDATES, workers=1))
+            self.assertIsNone(search(infile, self.WRONG_CANDIDATES, workers=2))
+            self.assertEqual(87, infile.tell())
+
+
+if __name__ == "__main__":
+    unittest.main()
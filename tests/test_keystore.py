@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from zcu.keystore import KeyStore, identity, normalise
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+class TestKeyStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "keys.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_normalise(self):
+        details = normalise(" ztegc0ffee12", "AA-BB-CC-DD-EE-FF", "ZXHN H298A V1.0")
+        self.assertEqual(
+            {
+                "serial": "ZTEGC0FFEE12",
+                "mac": "aabbccddeeff",
+                "signature": "zxhn h298a v1.0",
+            },
+            details,
+        )
+        self.assertEqual(
+            "serial=ZTEGC0FFEE12;mac=aabbccddeeff;signature=zxhn h298a v1.0",
+            identity(details),
+        )
+        self.assertEqual({}, normalise(None, "", None))
+
+    def test_empty(self):
+        store = KeyStore(self.path)
+        self.assertIsNone(store.lookup("ZTEGC0FFEE12"))
+        self.assertIsNone(store.lookup())
+
+    def test_record_and_lookup(self):
+        store = KeyStore(self.path)
+        store.record(
+            CBCXcryptor,
+            ("key", "iv"),
+            4,
+            "serial_keygen",
+            serial="ZTEGC0FFEE12",
+            mac="aa:bb:cc:dd:ee:ff",
+            signature="ZXHN H298A V1.0",
+        )
+        entry = store.lookup("ztegc0ffee12", "AABBCCDDEEFF", "ZXHN H298A V1.0")
+        self.assertEqual(
+            ("key", "iv", 4), (entry["key"], entry["iv"], entry["payload_type"])
+        )
+        self.assertEqual(
+            (CBCXcryptor, ("key", "iv"), "serial_keygen"), KeyStore.candidate(entry)
+        )
+        # fewer details of the same device
+        self.assertIs(entry, store.lookup("ZTEGC0FFEE12"))
+        self.assertIs(entry, store.lookup(mac="aa:bb:cc:dd:ee:ff"))
+        self.assertIs(entry, store.lookup("ZTEGC0FFEE12", signature="ZXHN H298A V1.0"))
+        # a different device
+        self.assertIsNone(store.lookup("ZTEGC0FFEE13"))
+        self.assertIsNone(store.lookup("ZTEGC0FFEE12", signature="ZXHN H298Q V7.0"))
+        # a signature is shared by many devices
+        self.assertIsNone(store.lookup(signature="ZXHN H298A V1.0"))
+
+    def test_signature_only(self):
+        store = KeyStore(self.path)
+        store.record(Xcryptor, (b"Wj", None), 2, signature="ZXHN H298N")
+        entry = store.lookup(signature="ZXHN H298N")
+        self.assertEqual(
+            (Xcryptor, ("Wj", None), "key store"), KeyStore.candidate(entry)
+        )
+
+    def test_latest_wins(self):
+        store = KeyStore(self.path)
+        store.record(CBCXcryptor, ("old", "iv"), 4, serial="A", mac="1")
+        store.record(CBCXcryptor, ("new", "iv"), 4, serial="A", mac="2")
+        self.assertEqual("new", store.lookup("A")["key"])
+        store.record(CBCXcryptor, ("newer", "iv"), 4, serial="A", mac="2")
+        self.assertEqual("newer", store.lookup("A")["key"])
+        self.assertEqual("old", store.lookup("A", "1")["key"])
+
+    def test_save_and_load(self):
+        store = KeyStore(self.path)
+        store.record(CBCXcryptor, ("key", "iv"), 3, serial="A")
+        store.record(CBCXcryptor, ("key", "iv"), 3)
+        store.save()
+        store = KeyStore(self.path)
+        self.assertEqual(1, len(store.devices))
+        self.assertEqual("key", store.lookup("A")["key"])
+
+
+if __name__ == "__main__":
+    unittest.main()
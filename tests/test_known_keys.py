@@ -3,6 +3,7 @@ from types import SimpleNamespace
 from zcu.known_keys import (
     find_key,
     get_all_keys,
+    lookup,
     run_keygens,
     run_all_keygens,
     mac_to_str,
@@ -18,6 +19,22 @@ class TestPublicMethods(unittest.TestCase):
         res = find_key("foobar")
         self.assertEqual(None, res)
 
+    def test_find_key_case_insensitive(self):
+        res = find_key("ZXHN H168N V3.1")
+        self.assertEqual("GrWM3Hz&LTvz&f^9", res)
+
+    def test_lookup(self):
+        keys, keygens = lookup("ZXHN H267A V1.0")
+        self.assertEqual(["402c38de39bed665"], keys)
+        # serial keygen first, then the hardcoded key
+        self.assertEqual(2, len(keygens))
+        self.assertEqual("serial: 'X'", keygens[0](SimpleNamespace(serial="X"))[2])
+        self.assertEqual("hardcoded key", keygens[1](None)[2])
+
+    def test_lookup_not_present(self):
+        self.assertEqual(([], []), lookup("foobar"))
+        self.assertEqual(([], []), lookup(""))
+
     def test_get_all_keys(self):
         res = get_all_keys()
         self.assertTrue(len(res) > 0)
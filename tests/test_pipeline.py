@@ -0,0 +1,136 @@
+import os
+import threading
+import unittest
+from io import BytesIO
+
+from zcu.base64io import open_config
+from zcu.compression import compress
+from zcu.container import parse
+from zcu.keysearch import new_xcryptor, search
+from zcu.pipeline import decode_chunks, decode_stream, encode_stream
+from zcu.zte import add_header
+from zcu.xcryptors import Xcryptor, CBCXcryptor
+
+
+class TestPipeline(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H298N_xml = "resources/ZXHN_H298N.xml"
+    ZXHN_H298N_key = "Wj"
+
+    ZXHN_H298Q_C7_db_type3 = "resources/ZXHN_H298Q_C7_db_type3.bin"
+    ZXHN_H298Q_C7_db_type0 = "resources/ZXHN_H298Q_C7_db_type0.bin"
+    ZXHN_H298Q_C7_db_xml = "resources/ZXHN_H298Q_C7_db.xml"
+    ZXHN_H298Q_C7_db_key = "H298Q"
+
+    def test_zxhn_h298n_decode_stream(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            infile.seek(210)
+            outfile = BytesIO()
+            decode_stream(infile, outfile, Xcryptor(self.ZXHN_H298N_key), 1000)
+        with open(self.ZXHN_H298N_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_zxhn_h298q_db_type3_decode_stream(self):
+        with open(self.ZXHN_H298Q_C7_db_type3, "rb") as infile:
+            infile.seek(60)
+            outfile = BytesIO()
+            decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            crc = decode_stream(infile, outfile, decryptor, 1000)
+        self.assertEqual(1009329478, crc)
+        with open(self.ZXHN_H298Q_C7_db_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_zxhn_h298q_db_type0_decode_stream(self):
+        with open(self.ZXHN_H298Q_C7_db_type0, "rb") as infile:
+            infile.seek(60)
+            outfile = BytesIO()
+            crc = decode_stream(infile, outfile)
+        self.assertEqual(1009329478, crc)
+        with open(self.ZXHN_H298Q_C7_db_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), outfile.getvalue())
+
+    def test_zxhn_h298q_db_type3_decode_chunks(self):
+        with open(self.ZXHN_H298Q_C7_db_type3, "rb") as infile:
+            infile.seek(60)
+            decryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            chunks = list(decode_chunks(infile, decryptor, 1000))
+        self.assertGreater(len(chunks), 1)
+        with open(self.ZXHN_H298Q_C7_db_xml, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), b"".join(chunks))
+
+    def test_decode_chunks_stops_reading(self):
+        with open(self.ZXHN_H298Q_C7_db_type0, "rb") as infile:
+            infile.seek(60)
+            chunks = decode_chunks(infile, read_size=1000)
+            next(chunks)
+            chunks.close()
+            self.assertLess(infile.tell(), 60 + 2000)
+
+    def test_zxhn_h298n_encode_stream(self):
+        with open(self.ZXHN_H298N_xml, "rb") as infile:
+            payload = Xcryptor(self.ZXHN_H298N_key).encrypt(compress(infile, 65536))
+            expected = add_header(payload, b"ZXHN H298N", 2 << 16, True)
+            infile.seek(0)
+            outfile = BytesIO()
+            encode_stream(
+                infile,
+                outfile,
+                65536,
+                encryptor=Xcryptor(self.ZXHN_H298N_key),
+                signature=b"ZXHN H298N",
+                version=2 << 16,
+                include_header=True,
+            )
+        self.assertEqual(expected.read(), outfile.getvalue())
+
+    def test_zxhn_h298q_db_type3_encode_stream(self):
+        with open(self.ZXHN_H298Q_C7_db_xml, "rb") as infile:
+            # small chunks so that the payload is not aligned to the AES blocks
+            payload = compress(infile, 1000)
+            xcryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            expected = add_header(xcryptor.encrypt(payload), b"", 0)
+            infile.seek(0)
+            outfile = BytesIO()
+            encryptor = CBCXcryptor(self.ZXHN_H298Q_C7_db_key)
+            encode_stream(infile, outfile, 1000, encryptor=encryptor)
+        self.assertEqual(expected.read(), outfile.getvalue())
+
+    def pipe(self, data):
+        """the read end of a pipe which data is written into"""
+        read_fd, write_fd = os.pipe()
+
+        def write():
+            with open(write_fd, "wb") as outfile:
+                outfile.write(data)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        self.addCleanup(thread.join)
+        infile = open(read_fd, "rb")
+        self.addCleanup(infile.close)
+        return infile
+
+    def test_decode_from_pipe(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = infile.read()
+        with open(self.ZXHN_H298N_xml, "rb") as goodFile:
+            xml = goodFile.read()
+        candidates = [
+            (CBCXcryptor, ("foo", "bar")),
+            (Xcryptor, (self.ZXHN_H298N_key, None)),
+        ]
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                infile = open_config(self.pipe(data))
+                self.assertFalse(infile.seekable())
+                self.assertEqual(210, parse(infile).payload_offset)
+                found = search(infile, candidates, workers=workers)
+                self.assertEqual(candidates[1], found)
+                outfile = BytesIO()
+                decode_stream(infile, outfile, new_xcryptor(found))
+                self.assertEqual(xml, outfile.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+
+from scan import find_files, scan, scan_all
+
+
+class TestScan(unittest.TestCase):
+
+    ZXHN_H298N_config = "resources/ZXHN_H298N.bin"
+    ZXHN_H168N_V35_config = "resources/ZXHN_H168N_V3.5.bin"
+    F600W_config = "resources/F600W.bin"
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.directory = self.tmpdir.name
+
+    def add(self, relpath, data):
+        path = os.path.join(self.directory, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as outfile:
+            outfile.write(data)
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as infile:
+            return infile.read()
+
+    def test_scan_directory(self):
+        shutil.copy(self.ZXHN_H298N_config, self.directory)
+        self.add("b/H168N.bin", self.read(self.ZXHN_H168N_V35_config))
+        encoded = base64.b64encode(self.read(self.F600W_config))
+        self.add("a/F600W.bin", encoded)
+        self.add("a/short.bin", b"\x01\x02\x03\x04")
+        self.add("a/notes.txt", b"not a config")
+
+        paths = list(find_files([self.directory], "*.bin"))
+        results = {
+            os.path.relpath(result["path"], self.directory): result
+            for result in scan_all(paths, 2)
+        }
+        self.assertEqual(
+            ["ZXHN_H298N.bin", "a/F600W.bin", "a/short.bin", "b/H168N.bin"],
+            [os.path.relpath(path, self.directory) for path in paths],
+        )
+
+        h298n = results["ZXHN_H298N.bin"]
+        self.assertEqual("raw", h298n["encoding"])
+        self.assertEqual(os.path.getsize(self.ZXHN_H298N_config), h298n["size"])
+        self.assertEqual("big", h298n["endianness"])
+        self.assertEqual(128, h298n["header_length"])
+        self.assertTrue(h298n["size_matches"])
+        self.assertEqual("ZXHN H298N", h298n["signature"])
+        self.assertEqual(2, h298n["payload_type"])
+
+        h168n = results["b/H168N.bin"]
+        self.assertIsNone(h168n["header_length"])
+        self.assertEqual("ZXHN H168N V3.5", h168n["signature"])
+        self.assertEqual(4, h168n["payload_type"])
+
+        # the encoded size, the file is not decoded to the end to find another
+        f600w = results["a/F600W.bin"]
+        self.assertEqual("base64", f600w["encoding"])
+        self.assertEqual(len(encoded), f600w["size"])
+        self.assertEqual("F600W", f600w["signature"])
+        self.assertEqual(0, f600w["payload_type"])
+        self.assertIsNone(f600w["error"])
+
+        self.assertEqual("file too short", results["a/short.bin"]["error"])
+
+    def test_scan_file(self):
+        # a file given by name is scanned whatever its name
+        path = self.add("config", self.read(self.ZXHN_H168N_V35_config))
+        self.assertEqual([path], list(find_files([path], "*.bin")))
+        self.assertEqual(4, scan(path)["payload_type"])
+
+
+if __name__ == "__main__":
+    unittest.main()
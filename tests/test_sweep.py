@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from zcu.sweep import Checkpoint, MacRange, SerialRange, Sweep
+
+
+class TestSweep(unittest.TestCase):
+    def test_mac_prefix(self):
+        macs = MacRange("AA:BB:CC")
+        self.assertEqual(2**24, len(macs))
+        self.assertEqual("aa:bb:cc:00:00:00", macs[0])
+        self.assertEqual("aa:bb:cc:ff:ff:ff", macs[len(macs) - 1])
+
+    def test_mac_range(self):
+        macs = MacRange("aa:bb:cc:dd:ee:fe-AA:BB:CC:DD:EF:01")
+        self.assertEqual(4, len(macs))
+        self.assertEqual("aa:bb:cc:dd:ef:00", macs[2])
+        with self.assertRaises(IndexError):
+            macs[4]
+
+    def test_mac_range_invalid(self):
+        with self.assertRaises(ValueError):
+            MacRange("AA:BB:C")
+        with self.assertRaises(ValueError):
+            MacRange("AA:BB:CC:DD:EE:02-AA:BB:CC:DD:EE:01")
+
+    def test_serial_range(self):
+        serials = SerialRange("ZTEGC0FF00FE-ZTEGC0FF0101")
+        self.assertEqual(4, len(serials))
+        self.assertEqual("ZTEG", serials.prefix)
+        self.assertEqual("ZTEGC0FF00FE", serials[0])
+        self.assertEqual("ZTEGC0FF0100", serials[2])
+
+    def test_serial_range_lower_case(self):
+        serials = SerialRange("zteg0009-zteg000b")
+        self.assertEqual(["zteg0009", "zteg000a", "zteg000b"], list(serials))
+
+    def test_serial_range_invalid(self):
+        with self.assertRaises(ValueError):
+            SerialRange("ZTEGC0FF0000")
+        with self.assertRaises(ValueError):
+            SerialRange("ZTEG0000-ZTEH0000")
+        with self.assertRaises(ValueError):
+            SerialRange("ZTEG0001-ZTEG0000")
+
+    def test_sweep(self):
+        sweep = Sweep(MacRange("AA:BB:CC:DD:EE"), SerialRange("S00-S02"))
+        self.assertEqual(256 * 3, len(sweep))
+        self.assertEqual(("aa:bb:cc:dd:ee:00", "S00"), sweep[0])
+        self.assertEqual(("aa:bb:cc:dd:ee:01", "S01"), sweep[4])
+        self.assertEqual([(767, "aa:bb:cc:dd:ee:ff", "S02")], list(sweep.iterate(767)))
+
+    def test_sweep_serials_only(self):
+        sweep = Sweep(serials=SerialRange("S00-S02"))
+        self.assertEqual([(1, None, "S01"), (2, None, "S02")], list(sweep.iterate(1)))
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "checkpoint.json")
+            sweep = Sweep(serials=SerialRange("S00-S0F"))
+            checkpoint = Checkpoint(path, sweep)
+            self.assertEqual(0, checkpoint.position)
+            checkpoint.save(7)
+            self.assertEqual(7, Checkpoint(path, sweep).position)
+            # a different sweep starts from the beginning
+            other = Sweep(serials=SerialRange("S00-S1F"))
+            self.assertEqual(0, Checkpoint(path, other).position)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import struct
 import unittest
 
-from zcu.xcryptors import Xcryptor, CBCXcryptor
+from zcu.xcryptors import Xcryptor, CBCXcryptor, Decrypter
 
 
 class TestXcryptor(unittest.TestCase):
@@ -88,6 +88,100 @@ class TestXcryptor(unittest.TestCase):
                 goodBytes = goodFile.read()
             self.assertEqual(res.read(), goodBytes)
 
+    def test_zxhn_h298n_decrypt_stream(self):
+        with open(self.ZXHN_H298N_config, "rb") as inFile:
+            inFile.seek(210)
+            xcryptor = Xcryptor(self.ZXHN_H298N_key)
+            # reads that are not aligned to the AES block size
+            res = b"".join(xcryptor.decrypt_stream(inFile, read_size=100))
+            with open(self.ZXHN_H298N_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res, goodBytes)
+
+    def test_zxhn_h168n_v35_decrypt_stream(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as inFile:
+            inFile.seek(87)
+            xcryptor = CBCXcryptor()
+            xcryptor.set_key(self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_iv)
+            res = b"".join(xcryptor.decrypt_stream(inFile, read_size=100))
+            with open(self.ZXHN_H168N_V35_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res, goodBytes)
+
+    def test_zxhn_h298n_decrypter(self):
+        with open(self.ZXHN_H298N_config, "rb") as inFile:
+            inFile.seek(210)
+            data = inFile.read()
+        decrypter = Decrypter(Xcryptor(self.ZXHN_H298N_key))
+        self.assertEqual(12, decrypter.wanted)
+        # pieces that split the chunk headers, trailing data is ignored
+        res = b"".join(decrypter.feed(data[i : i + 7]) for i in range(0, len(data), 7))
+        res += decrypter.feed(b"trailing data")
+        self.assertTrue(decrypter.done)
+        self.assertEqual(0, decrypter.wanted)
+        with open(self.ZXHN_H298N_zlib, "rb") as goodFile:
+            self.assertEqual(goodFile.read(), res)
+
+    def test_zxhn_h298n_check_key(self):
+        with open(self.ZXHN_H298N_config, "rb") as inFile:
+            inFile.seek(210)
+            xcryptor = Xcryptor("foo")
+            self.assertFalse(xcryptor.check_key(inFile))
+            self.assertIsNone(xcryptor.try_decrypt(inFile))
+            self.assertEqual(210, inFile.tell())
+            xcryptor.set_key(self.ZXHN_H298N_key)
+            self.assertTrue(xcryptor.check_key(inFile))
+            self.assertEqual(210, inFile.tell())
+            res = xcryptor.try_decrypt(inFile)
+            with open(self.ZXHN_H298N_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res.read(), goodBytes)
+
+    def test_zxhn_h168n_v35_check_key(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as inFile:
+            inFile.seek(87)
+            xcryptor = CBCXcryptor()
+            xcryptor.set_key(self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_key)
+            self.assertFalse(xcryptor.check_key(inFile))
+            self.assertIsNone(xcryptor.try_decrypt(inFile))
+            xcryptor.set_key(self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_iv)
+            self.assertTrue(xcryptor.check_key(inFile))
+            # checking the key must not disturb the CBC state used by decrypt
+            res = xcryptor.try_decrypt(inFile)
+            with open(self.ZXHN_H168N_V35_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res.read(), goodBytes)
+
+    def test_zxhn_h298n_try_keys(self):
+        with open(self.ZXHN_H298N_config, "rb") as inFile:
+            inFile.seek(210)
+            xcryptor = Xcryptor()
+            keypair = xcryptor.try_keys(
+                inFile, [("foo", None), (self.ZXHN_H298N_key, None), ("bar", None)]
+            )
+            self.assertEqual((self.ZXHN_H298N_key, None), keypair)
+            self.assertEqual(210, inFile.tell())
+            res = xcryptor.decrypt(inFile)
+            with open(self.ZXHN_H298N_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res.read(), goodBytes)
+
+    def test_zxhn_h168n_v35_try_keys(self):
+        with open(self.ZXHN_H168N_V35_config, "rb") as inFile:
+            inFile.seek(87)
+            xcryptor = CBCXcryptor()
+            keypairs = [
+                (self.ZXHN_H168N_V35_key, None),
+                (self.ZXHN_H168N_V35_key, self.ZXHN_H168N_V35_iv),
+            ]
+            self.assertEqual(keypairs[1], xcryptor.try_keys(inFile, keypairs))
+            self.assertIsNone(xcryptor.try_keys(inFile, keypairs[:1]))
+            xcryptor.try_keys(inFile, keypairs)
+            res = xcryptor.decrypt(inFile)
+            with open(self.ZXHN_H168N_V35_zlib, "rb") as goodFile:
+                goodBytes = goodFile.read()
+            self.assertEqual(res.read(), goodBytes)
+
     def test_zxhn_h298n_encryption(self):
         with open(self.ZXHN_H298N_zlib, "rb") as inFile:
             xcryptor = Xcryptor(self.ZXHN_H298N_key, chunk_size=65536)
@@ -48,6 +48,12 @@ class TestHeaderMethods(unittest.TestCase):
             header_length = zcu.zte.read_header(infile)
             self.assertEqual(0, header_length)
 
+    def test_zxhn_h298n_read_header_in_memory(self):
+        with open(self.ZXHN_H298N_config, "rb") as infile:
+            data = BytesIO(infile.read())
+        header_length = zcu.zte.read_header(data)
+        self.assertEqual(128, header_length)
+
     # read_signature tests
     def test_zxhn_h298n_read_signature(self):
         with open(self.ZXHN_H298N_config, "rb") as infile:
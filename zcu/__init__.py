@@ -1,4 +1,30 @@
+import importlib
+
 from . import compression  # noqa: F401
+from . import container  # noqa: F401
 from . import constants  # noqa: F401
 from . import known_keys  # noqa: F401
 from . import zte  # noqa: F401
+
+# optional subsystems, only imported when first used (e.g. zcu.keystore) as
+# some of them are slow to import (asyncio, multiprocessing, the AES backends)
+_LAZY_MODULES = {
+    "aio",
+    "base64io",
+    "cache",
+    "candidates",
+    "dbxml",
+    "fleet",
+    "fleetdb",
+    "hitstats",
+    "keysearch",
+    "keystore",
+    "pipeline",
+    "sweep",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
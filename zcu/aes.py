@@ -0,0 +1,407 @@
+"""AES-128/256 in ECB and CBC mode on a choice of backends
+
+cryptography (OpenSSL) and pycryptodomex are used when they are installed,
+otherwise a (slow) pure Python implementation is used. The backend is picked
+at import time in that order, fastest first (see examples/aes_benchmark.py),
+unless the ZCU_AES_BACKEND environment variable names another one.
+set_backend() switches at runtime.
+
+new() returns a cipher with the same semantics as a Cryptodome AES cipher:
+encrypt()/decrypt() take data aligned to the block size and, in CBC mode,
+carry the chaining state from one call to the next.
+"""
+
+import os
+import struct
+
+MODE_ECB = "ecb"
+MODE_CBC = "cbc"
+
+BLOCK_SIZE = 16
+
+
+def _check_aligned(data):
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Data must be aligned to block boundary")
+
+
+def _new_cryptodome(key, mode, iv=None):
+    if mode == MODE_ECB:
+        return _CryptodomeAES.new(key, _CryptodomeAES.MODE_ECB)
+    return _CryptodomeAES.new(key, _CryptodomeAES.MODE_CBC, iv)
+
+
+class _CryptographyCipher:
+    def __init__(self, key, mode, iv):
+        if mode == MODE_ECB:
+            self.cipher = _Cipher(_algorithms.AES(key), _modes.ECB())
+        else:
+            self.cipher = _Cipher(_algorithms.AES(key), _modes.CBC(iv))
+        self.encryptor = None
+        self.decryptor = None
+
+    def encrypt(self, data):
+        _check_aligned(data)
+        if self.encryptor is None:
+            self.encryptor = self.cipher.encryptor()
+        return self.encryptor.update(data)
+
+    def decrypt(self, data):
+        _check_aligned(data)
+        if self.decryptor is None:
+            self.decryptor = self.cipher.decryptor()
+        return self.decryptor.update(data)
+
+
+def _new_cryptography(key, mode, iv=None):
+    return _CryptographyCipher(key, mode, iv)
+
+
+def _xtime(x):
+    x <<= 1
+    return (x ^ 0x11B) if x & 0x100 else x
+
+
+def _multiply(x, y):
+    result = 0
+    while y:
+        if y & 1:
+            result ^= x
+        x = _xtime(x)
+        y >>= 1
+    return result
+
+
+def _make_tables():
+    """S-boxes and the 'T-tables' which combine SubBytes, ShiftRows and
+    (Inv)MixColumns for a whole column"""
+    sbox = [0] * 256
+    # walk the multiplicative group using 3 as the generator, p * q == 1
+    p = q = 1
+    while True:
+        p = p ^ _xtime(p)
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xFF
+        if q & 0x80:
+            q ^= 0x09
+        x = q
+        for shift in range(1, 5):
+            x ^= ((q << shift) | (q >> (8 - shift))) & 0xFF
+        sbox[p] = x ^ 0x63
+        if p == 1:
+            break
+    sbox[0] = 0x63
+
+    inv_sbox = [0] * 256
+    for i, s in enumerate(sbox):
+        inv_sbox[s] = i
+
+    def rotations(table):
+        tables = [table]
+        for _ in range(3):
+            table = [((t >> 8) | (t << 24)) & 0xFFFFFFFF for t in table]
+            tables.append(table)
+        return tables
+
+    te = rotations(
+        [(_multiply(s, 2) << 24) | (s << 16) | (s << 8) | _multiply(s, 3) for s in sbox]
+    )
+    td = rotations(
+        [
+            (_multiply(s, 14) << 24)
+            | (_multiply(s, 9) << 16)
+            | (_multiply(s, 13) << 8)
+            | _multiply(s, 11)
+            for s in inv_sbox
+        ]
+    )
+    return sbox, inv_sbox, te, td
+
+
+_SBOX, _INV_SBOX, _TE, _TD = _make_tables()
+
+
+class _PythonCipher:
+    """table based AES, see rijndael-alg-fst.c for the structure"""
+
+    def __init__(self, key, mode, iv):
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"Incorrect AES key length ({len(key)} bytes)")
+        if mode == MODE_CBC and len(iv) != BLOCK_SIZE:
+            raise ValueError("Incorrect IV length (it must be 16 bytes long)")
+        self.mode = mode
+        self.iv = iv
+        self.rounds, self.encrypt_keys, self.decrypt_keys = self._expand_key(key)
+
+    @staticmethod
+    def _expand_key(key):
+        nk = len(key) // 4
+        rounds = nk + 6
+        sbox = _SBOX
+        w = list(struct.unpack(f">{nk}I", key))
+        rcon = 1
+        for i in range(nk, 4 * (rounds + 1)):
+            t = w[i - 1]
+            if i % nk == 0:
+                t = ((t << 8) | (t >> 24)) & 0xFFFFFFFF
+                t = (
+                    (sbox[t >> 24] << 24)
+                    | (sbox[(t >> 16) & 0xFF] << 16)
+                    | (sbox[(t >> 8) & 0xFF] << 8)
+                    | sbox[t & 0xFF]
+                ) ^ (rcon << 24)
+                rcon = _xtime(rcon)
+            elif nk > 6 and i % nk == 4:
+                t = (
+                    (sbox[t >> 24] << 24)
+                    | (sbox[(t >> 16) & 0xFF] << 16)
+                    | (sbox[(t >> 8) & 0xFF] << 8)
+                    | sbox[t & 0xFF]
+                )
+            w.append(w[i - nk] ^ t)
+
+        # equivalent inverse cipher: round keys in reverse order with
+        # InvMixColumns applied to all but the first and last
+        td0, td1, td2, td3 = _TD
+        dw = []
+        for r in range(rounds, -1, -1):
+            first = 4 * r
+            last = first + 4
+            round_key = w[first:last]
+            if 0 < r < rounds:
+                round_key = [
+                    td0[sbox[t >> 24]]
+                    ^ td1[sbox[(t >> 16) & 0xFF]]
+                    ^ td2[sbox[(t >> 8) & 0xFF]]
+                    ^ td3[sbox[t & 0xFF]]
+                    for t in round_key
+                ]
+            dw.extend(round_key)
+        return (rounds, w, dw)
+
+    def _encrypt_block(self, s0, s1, s2, s3):
+        te0, te1, te2, te3 = _TE
+        sbox = _SBOX
+        rk = self.encrypt_keys
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        for i in range(4, 4 * self.rounds, 4):
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24]
+                ^ te1[(s1 >> 16) & 0xFF]
+                ^ te2[(s2 >> 8) & 0xFF]
+                ^ te3[s3 & 0xFF]
+                ^ rk[i],
+                te0[s1 >> 24]
+                ^ te1[(s2 >> 16) & 0xFF]
+                ^ te2[(s3 >> 8) & 0xFF]
+                ^ te3[s0 & 0xFF]
+                ^ rk[i + 1],
+                te0[s2 >> 24]
+                ^ te1[(s3 >> 16) & 0xFF]
+                ^ te2[(s0 >> 8) & 0xFF]
+                ^ te3[s1 & 0xFF]
+                ^ rk[i + 2],
+                te0[s3 >> 24]
+                ^ te1[(s0 >> 16) & 0xFF]
+                ^ te2[(s1 >> 8) & 0xFF]
+                ^ te3[s2 & 0xFF]
+                ^ rk[i + 3],
+            )
+        i = 4 * self.rounds
+        return (
+            (
+                (sbox[s0 >> 24] << 24)
+                | (sbox[(s1 >> 16) & 0xFF] << 16)
+                | (sbox[(s2 >> 8) & 0xFF] << 8)
+                | sbox[s3 & 0xFF]
+            )
+            ^ rk[i],
+            (
+                (sbox[s1 >> 24] << 24)
+                | (sbox[(s2 >> 16) & 0xFF] << 16)
+                | (sbox[(s3 >> 8) & 0xFF] << 8)
+                | sbox[s0 & 0xFF]
+            )
+            ^ rk[i + 1],
+            (
+                (sbox[s2 >> 24] << 24)
+                | (sbox[(s3 >> 16) & 0xFF] << 16)
+                | (sbox[(s0 >> 8) & 0xFF] << 8)
+                | sbox[s1 & 0xFF]
+            )
+            ^ rk[i + 2],
+            (
+                (sbox[s3 >> 24] << 24)
+                | (sbox[(s0 >> 16) & 0xFF] << 16)
+                | (sbox[(s1 >> 8) & 0xFF] << 8)
+                | sbox[s2 & 0xFF]
+            )
+            ^ rk[i + 3],
+        )
+
+    def _decrypt_block(self, s0, s1, s2, s3):
+        td0, td1, td2, td3 = _TD
+        inv_sbox = _INV_SBOX
+        rk = self.decrypt_keys
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        for i in range(4, 4 * self.rounds, 4):
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24]
+                ^ td1[(s3 >> 16) & 0xFF]
+                ^ td2[(s2 >> 8) & 0xFF]
+                ^ td3[s1 & 0xFF]
+                ^ rk[i],
+                td0[s1 >> 24]
+                ^ td1[(s0 >> 16) & 0xFF]
+                ^ td2[(s3 >> 8) & 0xFF]
+                ^ td3[s2 & 0xFF]
+                ^ rk[i + 1],
+                td0[s2 >> 24]
+                ^ td1[(s1 >> 16) & 0xFF]
+                ^ td2[(s0 >> 8) & 0xFF]
+                ^ td3[s3 & 0xFF]
+                ^ rk[i + 2],
+                td0[s3 >> 24]
+                ^ td1[(s2 >> 16) & 0xFF]
+                ^ td2[(s1 >> 8) & 0xFF]
+                ^ td3[s0 & 0xFF]
+                ^ rk[i + 3],
+            )
+        i = 4 * self.rounds
+        return (
+            (
+                (inv_sbox[s0 >> 24] << 24)
+                | (inv_sbox[(s3 >> 16) & 0xFF] << 16)
+                | (inv_sbox[(s2 >> 8) & 0xFF] << 8)
+                | inv_sbox[s1 & 0xFF]
+            )
+            ^ rk[i],
+            (
+                (inv_sbox[s1 >> 24] << 24)
+                | (inv_sbox[(s0 >> 16) & 0xFF] << 16)
+                | (inv_sbox[(s3 >> 8) & 0xFF] << 8)
+                | inv_sbox[s2 & 0xFF]
+            )
+            ^ rk[i + 1],
+            (
+                (inv_sbox[s2 >> 24] << 24)
+                | (inv_sbox[(s1 >> 16) & 0xFF] << 16)
+                | (inv_sbox[(s0 >> 8) & 0xFF] << 8)
+                | inv_sbox[s3 & 0xFF]
+            )
+            ^ rk[i + 2],
+            (
+                (inv_sbox[s3 >> 24] << 24)
+                | (inv_sbox[(s2 >> 16) & 0xFF] << 16)
+                | (inv_sbox[(s1 >> 8) & 0xFF] << 8)
+                | inv_sbox[s0 & 0xFF]
+            )
+            ^ rk[i + 3],
+        )
+
+    @staticmethod
+    def _words(block):
+        return (
+            int.from_bytes(block[0:4], "big"),
+            int.from_bytes(block[4:8], "big"),
+            int.from_bytes(block[8:12], "big"),
+            int.from_bytes(block[12:16], "big"),
+        )
+
+    @staticmethod
+    def _bytes(words):
+        return b"".join(word.to_bytes(4, "big") for word in words)
+
+    def encrypt(self, data):
+        _check_aligned(data)
+        result = []
+        if self.mode == MODE_CBC:
+            previous = self._words(self.iv)
+        for start in range(0, len(data), BLOCK_SIZE):
+            end = start + BLOCK_SIZE
+            words = self._words(data[start:end])
+            if self.mode == MODE_CBC:
+                words = [a ^ b for a, b in zip(words, previous)]
+                words = previous = self._encrypt_block(*words)
+            else:
+                words = self._encrypt_block(*words)
+            result.append(self._bytes(words))
+        if self.mode == MODE_CBC and data:
+            self.iv = result[-1]
+        return b"".join(result)
+
+    def decrypt(self, data):
+        _check_aligned(data)
+        result = []
+        if self.mode == MODE_CBC:
+            previous = self._words(self.iv)
+        for start in range(0, len(data), BLOCK_SIZE):
+            end = start + BLOCK_SIZE
+            block = data[start:end]
+            words = self._decrypt_block(*self._words(block))
+            if self.mode == MODE_CBC:
+                words = [a ^ b for a, b in zip(words, previous)]
+                previous = self._words(block)
+            result.append(self._bytes(words))
+        if self.mode == MODE_CBC and data:
+            self.iv = bytes(data[-BLOCK_SIZE:])
+        return b"".join(result)
+
+
+def _new_python(key, mode, iv=None):
+    return _PythonCipher(bytes(key), mode, iv)
+
+
+# name -> new() of every backend that can be used, in order of preference
+BACKENDS = {}
+
+try:
+    from cryptography.hazmat.primitives.ciphers import (
+        Cipher as _Cipher,
+        algorithms as _algorithms,
+        modes as _modes,
+    )
+except ImportError:
+    pass
+else:
+    BACKENDS["cryptography"] = _new_cryptography
+
+try:
+    from Cryptodome.Cipher import AES as _CryptodomeAES
+except ImportError:
+    pass
+else:
+    BACKENDS["cryptodome"] = _new_cryptodome
+
+BACKENDS["python"] = _new_python
+
+backend = None
+_new = None
+
+
+def set_backend(name):
+    """use the named backend for all new ciphers"""
+    global backend, _new
+    if name not in BACKENDS:
+        raise ValueError(
+            f"AES backend '{name}' is not available, choose from: "
+            + ", ".join(BACKENDS)
+        )
+    backend = name
+    _new = BACKENDS[name]
+
+
+def new(key, mode, iv=None):
+    """returns a cipher for key (16, 24 or 32 bytes) in MODE_ECB or MODE_CBC"""
+    return _new(key, mode, iv)
+
+
+set_backend(os.environ.get("ZCU_AES_BACKEND") or next(iter(BACKENDS)))
@@ -0,0 +1,249 @@
+"""asyncio counterparts of the pipeline, the zlib and AES work is run on an
+executor so the event loop is never blocked by a large payload
+
+Streams are anything with an async read(n), e.g. asyncio.StreamReader, or
+an async iterable of bytes. Writers are anything with write(), if they
+also have an async drain() (e.g. asyncio.StreamWriter) it is awaited after
+each write.
+"""
+
+import asyncio
+import functools
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from . import constants, container
+from .base64io import Base64Decoder
+from .compression import Inflater
+from .dbxml import DBParser
+from .pipeline import SPOOL_SIZE, encode_stream
+from .xcryptors import Decrypter
+
+# the 128 byte header, the signature block header and the payload header
+HEAD_SIZE = (
+    container.ZteHeader.SIZE
+    + container.SIGNATURE_HEADER.size
+    + container.PAYLOAD_HEADER.size
+)
+# signatures are short, anything longer is not a config
+MAX_HEAD_SIZE = 64 * 1024
+
+
+class _IterReader:
+    """an async read(n) over an async iterable of bytes"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+        self._buffer = b""
+
+    async def read(self, n):
+        if not self._buffer:
+            try:
+                self._buffer = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b""
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
+
+
+class _Base64Reader:
+    """decodes a base64 (BAMC) stream as it is read"""
+
+    def __init__(self, reader, raw):
+        self._reader = reader
+        self._decoder = Base64Decoder()
+        self._decoded = self._decoder.decode(raw)
+        self._eof = False
+
+    async def read(self, n):
+        while not self._decoded and not self._eof:
+            data = await self._reader.read(max(n, 3) // 3 * 4)
+            self._eof = not data
+            if self._eof:
+                self._decoded = self._decoder.flush()
+            else:
+                self._decoded = self._decoder.decode(data)
+        data, self._decoded = self._decoded[:n], self._decoded[n:]
+        return data
+
+
+def _as_reader(stream):
+    return stream if hasattr(stream, "read") else _IterReader(stream)
+
+
+async def _read(reader, size):
+    """read size bytes, or fewer at the end of the stream"""
+    pieces = []
+    while size > 0:
+        data = await reader.read(size)
+        if not data:
+            break
+        pieces.append(data)
+        size -= len(data)
+    return b"".join(pieces)
+
+
+async def _write(writer, data):
+    writer.write(data)
+    drain = getattr(writer, "drain", None)
+    if drain is not None:
+        await drain()
+
+
+async def read_container(stream, little_endian=False):
+    """read the (header), signature and payload header
+
+    returns (container, reader, data), where reader continues the stream
+    (base64 encoded configs are decoded by it) and data is the part of the
+    payload which has already been read
+    """
+    reader = _as_reader(stream)
+    head = await _read(reader, HEAD_SIZE)
+    if head.startswith(constants.BASE64_MAGIC):
+        reader = _Base64Reader(reader, head)
+        head = await _read(reader, HEAD_SIZE)
+
+    while True:
+        try:
+            # the length of a stream is not known up front
+            parsed = container.parse(head, little_endian, check_length=False)
+            offset = parsed.payload_offset
+            return (parsed, reader, head[offset:])
+        except ValueError:
+            # it may only be the signature which has not been read in full
+            more = b""
+            if len(head) < MAX_HEAD_SIZE:
+                more = await _read(reader, len(head))
+            if not more:
+                raise
+            head += more
+
+
+async def decode_chunks(
+    stream, decryptor=None, little_endian=False, executor=None, read_size=65536
+):
+    """decrypt and decompress the config read from stream, yields the
+    decompressed config in pieces as each piece of the payload is read
+
+    decryptor is an Xcryptor with the key already set, None for an
+    unencrypted (type 0) payload, or a function which is called with the
+    Container and returns either
+    """
+    parsed, reader, data = await read_container(stream, little_endian)
+    if callable(decryptor):
+        decryptor = decryptor(parsed)
+
+    output = BytesIO()
+    if decryptor is None:
+        inflater = Inflater(output, read_header=False)
+        decrypter = None
+    else:
+        inflater = Inflater(output)
+        decrypter = Decrypter(decryptor)
+
+    def process(data):
+        if decrypter is not None:
+            data = decrypter.feed(data)
+        inflater.feed(data)
+        decompressed = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return decompressed
+
+    loop = asyncio.get_running_loop()
+    while True:
+        if data:
+            decompressed = await loop.run_in_executor(executor, process, data)
+            if decompressed:
+                yield decompressed
+        if inflater.done:
+            break
+        data = await reader.read(read_size)
+        if not data:
+            break
+    inflater.close()
+
+
+async def decode(
+    stream,
+    writer,
+    decryptor=None,
+    little_endian=False,
+    executor=None,
+    read_size=65536,
+):
+    """decode the config read from stream into writer, see decode_chunks()"""
+    async for decompressed in decode_chunks(
+        stream, decryptor, little_endian, executor, read_size
+    ):
+        await _write(writer, decompressed)
+
+
+async def decode_records(
+    stream, decryptor=None, little_endian=False, executor=None, read_size=65536
+):
+    """yields the (table, row, name, value) records of the config read from
+    stream, see decode_chunks() and dbxml.DBParser"""
+    parser = DBParser()
+    async for decompressed in decode_chunks(
+        stream, decryptor, little_endian, executor, read_size
+    ):
+        for record in parser.feed(decompressed):
+            yield record
+    for record in parser.close():
+        yield record
+
+
+async def encode(
+    stream,
+    writer,
+    chunk_size,
+    encryptor=None,
+    signature=b"",
+    version=0,
+    include_header=False,
+    little_endian=False,
+    incorrect_compressed_size=False,
+    executor=None,
+    read_size=65536,
+):
+    """compress and encrypt the config read from stream into writer, the
+    arguments are those of pipeline.encode_stream()
+
+    The headers need the compressed size before anything can be written, so
+    the input is spooled as it is read and encode_stream() is run on the
+    executor, its output is then written in read_size pieces.
+    """
+    reader = _as_reader(stream)
+    with SpooledTemporaryFile(SPOOL_SIZE) as infile:
+        while True:
+            data = await reader.read(read_size)
+            if not data:
+                break
+            infile.write(data)
+        infile.seek(0)
+
+        with SpooledTemporaryFile(SPOOL_SIZE) as outfile:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                executor,
+                functools.partial(
+                    encode_stream,
+                    infile,
+                    outfile,
+                    chunk_size,
+                    encryptor=encryptor,
+                    signature=signature,
+                    version=version,
+                    include_header=include_header,
+                    little_endian=little_endian,
+                    incorrect_compressed_size=incorrect_compressed_size,
+                ),
+            )
+
+            outfile.seek(0)
+            while True:
+                data = outfile.read(read_size)
+                if not data:
+                    break
+                await _write(writer, data)
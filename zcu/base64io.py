@@ -0,0 +1,126 @@
+"""Transparent decoding of base64 encoded (BAMC) configs, and of configs
+read from streams which cannot seek"""
+
+import base64
+import io
+import sys
+
+from . import constants
+
+# ignored anywhere in the encoded data, e.g. line wrapping
+WHITESPACE = b" \t\r\n"
+
+
+class Base64Decoder:
+    """push based base64 decoder, decode() it the encoded data in pieces of
+    any size and it returns the data decoded so far"""
+
+    def __init__(self):
+        self._raw = b""
+
+    def decode(self, data):
+        raw = self._raw + bytes(data).translate(None, WHITESPACE)
+        # every 4 encoded characters decode to 3 bytes
+        end = len(raw) - len(raw) % 4
+        self._raw = raw[end:]
+        return base64.b64decode(raw[:end], validate=True)
+
+    def flush(self):
+        """decodes what is left at the end of the data, a binascii.Error is
+        raised if it is not a complete block"""
+        raw, self._raw = self._raw, b""
+        return base64.b64decode(raw, validate=True)
+
+
+class PeekableReader(io.RawIOBase):
+    """read-only view of a stream which cannot seek (e.g. a pipe), whose
+    peek() returns as many bytes as are asked for (unlike that of a
+    BufferedReader), so the start of the payload can be looked at before it
+    is read"""
+
+    def __init__(self, raw, read_size=65536):
+        super().__init__()
+        self.raw = raw
+        self.name = getattr(raw, "name", None)
+        self.read_size = read_size
+        self.pos = 0
+        self._buffer = bytearray()
+        self._eof = False
+
+    def _fill(self, size):
+        """reads until size bytes are buffered, or the end of raw"""
+        while len(self._buffer) < size and not self._eof:
+            data = self.raw.read(min(size - len(self._buffer), self.read_size))
+            self._eof = not data
+            self._buffer += self._decode(data)
+
+    def _decode(self, data):
+        """returns what is buffered for data read from raw, which is b"" at
+        the end of raw"""
+        return data
+
+    def peek(self, size=1):
+        """returns the next size bytes (fewer at the end) without reading them"""
+        self._fill(size)
+        return bytes(self._buffer[:size])
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = sys.maxsize
+        self._fill(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def readall(self):
+        return self.read()
+
+
+class Base64Reader(PeekableReader):
+    """read-only view of the decoded contents of a base64 encoded stream,
+    which is decoded as it is read
+
+    Like a PeekableReader it only reads forward, raw need not be seekable
+    (e.g. a pipe). Only what has been decoded but not yet read is kept, so
+    the size of the decoded config is not known up front.
+    """
+
+    def __init__(self, raw, read_size=65536):
+        super().__init__(raw, read_size)
+        self._decoder = Base64Decoder()
+
+    def _decode(self, data):
+        return self._decoder.decode(data) if data else self._decoder.flush()
+
+
+def open_config(infile):
+    """returns infile, or a Base64Reader over it if it is base64 encoded, the
+    position of infile is expected to be at the start of the config
+
+    A stream which cannot seek (e.g. a pipe) is wrapped in a PeekableReader,
+    which is returned instead, so that the first block of the payload can be
+    looked at when trying keys.
+    """
+    size = len(constants.BASE64_MAGIC)
+    if infile.seekable():
+        start_pos = infile.tell()
+        magic = infile.read(size)
+        infile.seek(start_pos)
+    else:
+        infile = PeekableReader(infile)
+        magic = infile.peek(size)
+    if magic == constants.BASE64_MAGIC:
+        return Base64Reader(infile)
+    return infile
@@ -0,0 +1,165 @@
+"""On-disk cache of decoded configs, keyed by the content of the config"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .storage import load_json, locked, save_json
+
+INDEX = "index.json"
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+
+def digest(infile, params=None):
+    """the SHA-256 of the whole of infile and the decode parameters, infile
+    is left unchanged so it must be seekable (a pipe can be read into a
+    BytesIO first)"""
+    start_pos = infile.tell()
+    infile.seek(0)
+    sha = hashlib.sha256()
+    for data in iter(lambda: infile.read(1024 * 1024), b""):
+        sha.update(data)
+    infile.seek(start_pos)
+    # anything which could change the result, e.g. a key to try first
+    sha.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return sha.hexdigest()
+
+
+class DecodeCache:
+    """digest -> decoded config and the key, IV and payload type used
+
+    Each entry is a file in directory, the least recently used entries are
+    removed once their total size exceeds max_size. Call save() to persist
+    the index, which also keeps the hit and miss counts. Several processes
+    can share directory, save() merges what this one changed into the index
+    saved by the others since it was loaded.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX)
+        self.load(load_json(self.index_path, {}))
+
+    def load(self, index):
+        self.hits = index.get("hits", 0)
+        self.misses = index.get("misses", 0)
+        # kept in least recently used first order
+        entries = index.get("entries", {})
+        self.entries = dict(
+            sorted(entries.items(), key=lambda item: item[1]["last_used"])
+        )
+        self.size = sum(entry["size"] for entry in self.entries.values())
+        # what changed since, for save() to merge into the saved index
+        self.loaded_hits = self.hits
+        self.loaded_misses = self.misses
+        self.used = set()
+        self.removed = {}
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.xml")
+
+    def get(self, digest):
+        """returns (path, entry) of the decoded config, or None on a miss"""
+        entry = self.entries.pop(digest, None)
+        path = self.path(digest)
+        if entry is None or not os.path.exists(path):
+            if entry is not None:
+                self.size -= entry["size"]
+                self.removed[digest] = time.time()
+            self.misses += 1
+            return None
+        entry["last_used"] = time.time()
+        self.entries[digest] = entry
+        self.used.add(digest)
+        self.hits += 1
+        return (path, entry)
+
+    def copy(self, digest, outfile):
+        """copies the decoded config into outfile, returns the entry or None
+        on a miss"""
+        found = self.get(digest)
+        if found is None:
+            return None
+        path, entry = found
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, outfile)
+        return entry
+
+    def put(
+        self,
+        digest,
+        infile,
+        payload_type,
+        key=None,
+        iv=None,
+        source=None,
+        signature=None,
+    ):
+        """stores the decoded config read from infile"""
+        path = self.path(digest)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(infile, f)
+        os.replace(tmp_path, path)
+
+        old = self.entries.pop(digest, None)
+        if old is not None:
+            self.size -= old["size"]
+        entry = {
+            "size": os.path.getsize(path),
+            "payload_type": payload_type,
+            "key": key,
+            "iv": iv,
+            "source": source,
+            "signature": signature,
+            "last_used": time.time(),
+        }
+        self.entries[digest] = entry
+        self.size += entry["size"]
+        self.used.add(digest)
+        self.removed.pop(digest, None)
+        self.evict()
+
+    def evict(self):
+        """removes the least recently used entries until within max_size"""
+        while self.size > self.max_size and self.entries:
+            digest = next(iter(self.entries))
+            entry = self.entries.pop(digest)
+            self.size -= entry["size"]
+            self.removed[digest] = time.time()
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+
+    def merge(self, index):
+        """this instance's changes applied on top of index, the most recent
+        use of an entry wins and the counts are added up"""
+        entries = index.get("entries", {})
+        for digest in self.used & set(self.entries):
+            entry = self.entries[digest]
+            other = entries.get(digest)
+            if other is None or other["last_used"] <= entry["last_used"]:
+                entries[digest] = entry
+        # unless it was put back by another process after it was removed here
+        for digest, removed in self.removed.items():
+            entry = entries.get(digest)
+            if entry is not None and entry["last_used"] <= removed:
+                del entries[digest]
+        return {
+            "entries": entries,
+            "hits": index.get("hits", 0) + self.hits - self.loaded_hits,
+            "misses": index.get("misses", 0) + self.misses - self.loaded_misses,
+        }
+
+    def save(self):
+        with locked(self.index_path):
+            self.load(self.merge(load_json(self.index_path, {})))
+            self.evict()
+            index = {"entries": self.entries, "hits": self.hits, "misses": self.misses}
+            save_json(self.index_path, index)
+            self.removed = {}
@@ -0,0 +1,380 @@
+"""Key candidates, i.e. (xcryptor_class, keypair, source), for a config
+
+candidates() generates keys from the signature and the device details
+given (serial number, MAC address, password), direct_candidates() are the
+keys decode.py tries for each payload type.
+"""
+
+import copy
+import hashlib
+from types import SimpleNamespace
+
+from .known_keys import (
+    KNOWN_KEYS,
+    KNOWN_SIGNATURES,
+    TYPE_3_KNOWN_KEY_IVS,
+    find_key,
+    get_all_models,
+    mac_to_str,
+    run_keygens,
+)
+from .xcryptors import Xcryptor, CBCXcryptor
+
+
+KNOWN_KEY_SUFFIXES = [
+    "Wj%2$CjM",  # F680
+]
+
+KNOWN_KEYPAIR_SUFFIXES = [
+    ("", ""),  # e.g. type 3
+    ("key", "IV"),
+    ("Key02660004", "Iv02660004"),
+    ("Key02710001", "Iv02710001"),
+    ("Key02710010", "Iv02710010"),
+    ("Key02721401", "Iv02721401"),
+    ("8cc72b05705d5c46f412af8cbed55aa", "667b02a85c61c786def4521b060265e"),
+]
+
+KNOWN_KEYPAIR_PREFIXES = [
+    ("", ""),
+    ("8cc72b05705d5c46", "667b02a85c61c786"),
+    ("8dc79b15726d5c46", "678b02a85c63c786"),
+]
+
+KNOWN_KEYPAIRS = [
+    ("H267AV1_CZkey", "H267AV1_CZIV"),
+    ("8cc72b05705d5c46f412af8cbed55aad", "667b02a85c61c786def4521b060265e8"),
+    ("8dc79b15726d5c46d412af8cbed65aad", "678b02a85c63c786def4523b061265e8"),
+    #  ZTE F670
+    ("L04&Product@5A238dc79b15726d5c06", "ZTE%FN$GponNJ025678b02a85c63c706"),
+    #  ZTE F6600P Payload 5
+    ("f680v9.0", "ZTE%FN$GponNJ025"),
+]
+
+KNOWN_PASSWORD_KEYPAIR_SUFFIXES = [
+    ("", ""),
+    ("Mcd5c46e", "G21b667b"),
+]
+
+KNOWN_MAC_SERIAL_IVS = [
+    "ZTE%FN$GponNJ025",
+]
+
+# (reverse, separator) layouts of the MAC address used in mac+serial keys
+MAC_LAYOUTS = [
+    (False, ""),
+    (True, ""),
+    (False, ":"),
+    (True, ":"),
+]
+
+
+def md5_to_hex(x):
+    md5 = hashlib.md5(x.encode("utf8")).hexdigest()
+    return bytes(bytearray.fromhex(md5)).hex()[:16]
+
+
+def hardcoded_keypairs(args):
+    for key in KNOWN_KEYS:
+        yield (key, None, f"known key '{key}'")
+
+
+def signature_keypairs(args):
+    if args.key and args.iv:
+        yield (args.key, args.iv, "--key/--iv")
+
+    # (signature, name used when recording which candidate worked)
+    signatures = []
+    if args.signature:
+        signatures += [
+            (args.signature, "signature"),
+            (args.signature.replace(" ", ""), "signature without spaces"),
+        ]
+    signatures += [(signature, signature) for signature in KNOWN_SIGNATURES]
+
+    for signature, name in signatures:
+        if args.key_suffix and args.iv_suffix:
+            yield (
+                f"{signature}{args.key_suffix}",
+                f"{signature}{args.iv_suffix}",
+                f"{name} + --key-suffix/--iv-suffix",
+            )
+
+        for key, iv in KNOWN_KEYPAIR_SUFFIXES:
+            yield (f"{signature}{key}", f"{signature}{iv}", f"{name} + '{key}'")
+
+    for key, iv in KNOWN_KEYPAIRS:
+        yield (key, iv, f"known keypair '{key}'")
+
+
+def serial_keypairs(args):
+    if args.serial_number is None:
+        print("To decode any 'serial' payloads, please specify Serial Number, e.g.")
+        print("  --serial 'SERIALNUMBER'")
+        return
+
+    serial = args.serial_number
+
+    keypair_prefixes = []
+    if args.key_prefix and args.iv_prefix:
+        keypair_prefixes += [
+            (args.key_prefix, args.iv_prefix, "--key-prefix/--iv-prefix"),
+        ]
+    keypair_prefixes += [(key, iv, f"'{key}'") for key, iv in KNOWN_KEYPAIR_PREFIXES]
+
+    for key, iv, name in keypair_prefixes:
+        yield (f"{key}{serial}", f"{iv}{serial}", f"{name} + serial")
+
+
+def mac_keypairs(args):
+    if args.mac_address is None:
+        print("To decode any 'mac' payloads, please specify MAC Address, e.g.")
+        print("  --mac 'AA:BB:CC:DD:EE:FF'")
+        return
+
+    mac = args.mac_address
+
+    for suffix in KNOWN_KEY_SUFFIXES:
+        # AES key: 'three lowest bytes of MAC address' + 'Wj%2$CjM'
+        yield (
+            md5_to_hex(mac_to_str(mac, separator="")[6:] + suffix),
+            None,
+            f"md5(mac[6:] + '{suffix}')",
+        )
+
+
+def mac_serial_keypairs(args):
+    if args.mac_address is None or args.serial_number is None:
+        print(
+            "To decode any 'mac+serial' payloads, please specify MAC Address and Serial Number, e.g."
+        )
+        print("  --mac 'AA:BB:CC:DD:EE:FF' --serial 'SERIALNUMBER'")
+        return
+
+    serial = args.serial_number
+    mac = args.mac_address
+
+    serials = [
+        # raw serial
+        (serial, "serial"),
+        # skip first 4 chars, e.g. ZTEGXXXXXXXX
+        (serial[4:], "serial[4:]"),
+        # take last 8 chars, e.g. ____XXXXXXXX
+        (serial[-8:], "serial[-8:]"),
+        # take first 8 chars, e.g. ZTEGXXXX___
+        (serial[:8], "serial[:8]"),
+    ]
+
+    for iv in KNOWN_MAC_SERIAL_IVS:
+        for prefix, name in serials:
+            for reverse, separator in MAC_LAYOUTS:
+                yield (
+                    prefix + mac_to_str(mac, reverse=reverse, separator=separator),
+                    iv,
+                    f"{name} + mac(reverse={reverse}, separator='{separator}')",
+                )
+        # seen in f680 router
+        yield (
+            md5_to_hex(serial + mac_to_str(mac, reverse=True, separator="")),
+            None,
+            "md5(serial + reversed mac)",
+        )
+
+        # # convert first 8 hex chars to ascii
+        # if all([x in "0123456789abcdef" for x in serial[:8].lower()]):
+        #     ascii_serial = bytearray.fromhex(serial[:8]).decode()
+        #     for reverse, separator in MAC_LAYOUTS:
+        #         yield (ascii_serial + mac_to_str(mac, reverse=reverse, separator=separator), iv)
+
+
+def mac_serial_password_keypairs(args):
+    # NOTE: "suffix" is a misnomer here:
+    # key is PASSWORD|SERIAL|SUFFIX
+    # iv is PREFIX|MAC|PASSWORD
+
+    if args.mac_address is None or args.serial_number is None or args.password is None:
+        print(
+            "To decode any 'mac+serial+password' payloads, please specify MAC Address, "
+            "Serial Number and Password parameters, e.g."
+        )
+        print(
+            "  --mac 'AA:BB:CC:DD:EE:FF' --serial 'SERIALNUMBER' --password 'password'"
+        )
+        return
+
+    mac = mac_to_str(args.mac_address, reverse=False, separator=":")
+    serial = args.serial_number
+    password = args.password
+
+    if args.key_suffix and args.iv_suffix:
+        yield (
+            f"{password}{serial}{args.key_suffix}",
+            f"{args.iv_suffix}{mac}{password}",
+            "password + serial + --key-suffix/--iv-suffix",
+        )
+
+    for key, iv in KNOWN_PASSWORD_KEYPAIR_SUFFIXES:
+        yield (
+            f"{password}{serial}{key}",
+            f"{iv}{mac}{password}",
+            f"password + serial + '{key}'",
+        )
+
+
+# keypair generators in priority order, along with the xcryptor to try them with
+HANDLERS = [
+    # key only
+    (hardcoded_keypairs, Xcryptor),
+    (mac_keypairs, Xcryptor),
+    (mac_serial_keypairs, Xcryptor),
+    # key + iv
+    (signature_keypairs, CBCXcryptor),  # requires signature
+    (serial_keypairs, CBCXcryptor),  # requires serial
+    (mac_serial_keypairs, CBCXcryptor),  # requires mac, serial
+    (mac_serial_password_keypairs, CBCXcryptor),  # requires mac, serial, password
+]
+
+
+# keypair generators which depend on the MAC address and/or serial number,
+# along with the arguments they require
+SWEEP_HANDLERS = [
+    (mac_keypairs, Xcryptor, ("mac_address",)),
+    (mac_serial_keypairs, Xcryptor, ("mac_address", "serial_number")),
+    (serial_keypairs, CBCXcryptor, ("serial_number",)),
+    (mac_serial_keypairs, CBCXcryptor, ("mac_address", "serial_number")),
+    (
+        mac_serial_password_keypairs,
+        CBCXcryptor,
+        ("mac_address", "serial_number", "password"),
+    ),
+]
+
+
+def candidate_id(xcryptor_cls, keypair):
+    """normalised (key, iv, mode) used to spot duplicate candidates"""
+    key, iv = keypair
+    if xcryptor_cls is CBCXcryptor:
+        # the key doubles as the iv when none is given
+        return (key, key if iv is None else iv, "cbc")
+    return (key, None, "ecb")
+
+
+def candidates(args, handlers=HANDLERS):
+    """lazily yields (xcryptor_class, keypair, source) in the order they should
+    be tried, skipping any (key, iv, mode) that has already been yielded"""
+    seen = set()
+    # keypair generators used by more than one handler only run once
+    generated = {}
+    for keypairs_fn, xcryptor_cls in handlers:
+        if keypairs_fn in generated:
+            keypairs = generated[keypairs_fn]
+        else:
+            keypairs = _record(keypairs_fn(args), generated.setdefault(keypairs_fn, []))
+        for key, iv, name in keypairs:
+            uid = candidate_id(xcryptor_cls, (key, iv))
+            if uid in seen:
+                continue
+            seen.add(uid)
+            source = f"{_handler_name(keypairs_fn, xcryptor_cls)}: {name}"
+            yield (xcryptor_cls, (key, iv), source)
+
+
+def _handler_name(keypairs_fn, xcryptor_cls):
+    return f"{keypairs_fn.__name__}/{xcryptor_cls.__name__}"
+
+
+def _record(keypairs, into):
+    for keypair in keypairs:
+        into.append(keypair)
+        yield keypair
+
+
+def prioritise(candidates, ranking, handlers=HANDLERS):
+    """yields candidates whose source appears in ranking first (in ranking order),
+    followed by the rest in their original order
+
+    candidates are expected from candidates(args, handlers), which runs the
+    handlers in order. A ranked source is only waited for until its handler
+    has been passed, so one which does not occur this time (e.g. a MAC
+    address keypair without a MAC address) does not hold the others back.
+    """
+    order = {
+        _handler_name(keypairs_fn, xcryptor_cls): i
+        for i, (keypairs_fn, xcryptor_cls) in enumerate(handlers)
+    }
+
+    def handler_index(source):
+        return order.get(source.split(": ", 1)[0])
+
+    # sources no handler can yield are never waited for
+    ranking = [source for source in ranking if handler_index(source) is not None]
+    rank = {source: i for i, source in enumerate(ranking)}
+    next_rank = 0
+    ranked = {}
+    rest = []
+    for candidate in candidates:
+        # the handlers before this one have yielded all they will
+        current = handler_index(candidate[2])
+        i = rank.get(candidate[2])
+        if i is None:
+            rest.append(candidate)
+        else:
+            ranked[i] = candidate
+        while next_rank < len(ranking):
+            if next_rank in ranked:
+                # best remaining candidate, no need to wait for the others
+                yield ranked.pop(next_rank)
+            elif current is None or handler_index(ranking[next_rank]) >= current:
+                break
+            next_rank += 1
+    for i in sorted(ranked):
+        yield ranked[i]
+    yield from rest
+
+
+def sweep_candidates(args, sweep, start=0):
+    """yields (xcryptor_class, keypair, source, position) for every MAC address
+    and/or serial number in the sweep, starting at position start"""
+    available = set(name for name in vars(args) if getattr(args, name) is not None)
+    if sweep.macs:
+        available.add("mac_address")
+    if sweep.serials:
+        available.add("serial_number")
+    handlers = [
+        (keypairs_fn, xcryptor_cls)
+        for keypairs_fn, xcryptor_cls, required in SWEEP_HANDLERS
+        if available.issuperset(required)
+    ]
+
+    device_args = copy.copy(args)
+    for position, mac, serial in sweep.iterate(start):
+        if mac is not None:
+            device_args.mac_address = mac
+        if serial is not None:
+            device_args.serial_number = serial
+        for xcryptor_cls, keypair, source in candidates(device_args, handlers):
+            yield (xcryptor_cls, keypair, source, position)
+
+
+def direct_candidates(payload_type, signature, device):
+    """the keys decode.py tries for each payload type"""
+    if payload_type == 2:
+        key = device["key"] or find_key(signature)
+        if key is not None:
+            yield (Xcryptor, (key, None), "decode: signature key")
+    elif payload_type == 3:
+        models = [device["model"]] if device["model"] else []
+        for model in models + get_all_models():
+            yield (CBCXcryptor, (model, model), f"decode: model '{model}'")
+        for key, iv, name in TYPE_3_KNOWN_KEY_IVS:
+            yield (CBCXcryptor, (key, iv), f"decode: {name}")
+    else:
+        params = SimpleNamespace(signature=signature)
+        if device["serial"]:
+            params.serial = device["serial"]
+        if device["mac"]:
+            params.mac = device["mac"]
+        if device["longpass"]:
+            params.longPass = device["longpass"]
+        for key, iv, source in run_keygens(params):
+            yield (CBCXcryptor, (key, iv), f"decode: {source}")
@@ -1,14 +1,15 @@
 """Compression and decompression helper functions"""
 
-import struct
 import zlib
+from collections import deque
 from io import BytesIO
 
-from . import constants
+from .container import ChunkHeader, PayloadHeader
 
 
-def decompress(infile):
-    """decompress a block, return data and crc
+def decompress_chunks(infile):
+    """decompress block by block, yields (decompressed_chunk, crc) where crc is
+    the running CRC of the compressed data read so far
     A 'block' consists of a 12 byte (3x4-byte INT) header and a ZLIB payload
     HEADER
         [XXXX] Decompressed length of block (bytes)
@@ -17,13 +18,11 @@ def decompress(infile):
     PAYLOAD
         [....] ZLIB chunk
     """
-    decompressed_data = BytesIO()
     crc = 0
     while True:
-        aes_header = struct.unpack(">3I", infile.read(12))
-        decompressed_length = aes_header[0]
-        compressed_length = aes_header[1]
-        compressed_chunk = infile.read(compressed_length)
+        chunk_header = ChunkHeader.unpack_from(infile.read(ChunkHeader.SIZE))
+        decompressed_length = chunk_header.decompressed_length
+        compressed_chunk = infile.read(chunk_header.compressed_length)
         crc = zlib.crc32(compressed_chunk, crc)
         decompressed_chunk = zlib.decompress(compressed_chunk)
         assert decompressed_length == len(
@@ -32,31 +31,218 @@ def decompress(infile):
             decompressed_length,
             len(decompressed_chunk),
         )
-        decompressed_data.write(decompressed_chunk)
-        if aes_header[2] == 0:
+        yield (decompressed_chunk, crc)
+        if chunk_header.more_chunks == 0:
+            break
+
+
+def decompress_stream(infile, outfile):
+    """decompress into outfile one block at a time, returns crc"""
+    crc = 0
+    for decompressed_chunk, crc in decompress_chunks(infile):
+        outfile.write(decompressed_chunk)
+    return crc
+
+
+class Inflater:
+    """push based decompressor, feed() it the payload in pieces of any size
+    and the decompressed blocks are written to outfile as they complete
+
+    With read_header the data is expected to start with the 60 byte payload
+    header (as a decrypted payload does), which is kept in payload_header.
+    """
+
+    def __init__(self, outfile, read_header=True):
+        self.outfile = outfile
+        self.payload_header = None
+        self.crc = 0
+        self.done = False
+        self._header_length = PayloadHeader.SIZE if read_header else ChunkHeader.SIZE
+        self._header = b""
+        self._block = None
+        self._remaining = 0
+        self._decompressor = None
+        self._decompressed_length = 0
+
+    def feed(self, data):
+        data = memoryview(data)
+        while data and not self.done:
+            if self._block is None:
+                needed = self._header_length - len(self._header)
+                self._header += data[:needed]
+                data = data[needed:]
+                if len(self._header) == self._header_length:
+                    self._read_header()
+                continue
+            size = self._remaining
+            piece, data = data[:size], data[size:]
+            self._remaining -= len(piece)
+            self.crc = zlib.crc32(piece, self.crc)
+            self._write(self._decompressor.decompress(piece))
+            if self._remaining == 0:
+                self._end_block()
+
+    def close(self):
+        """checks the last block has been seen, returns crc"""
+        assert self.done, "payload ended before the last block"
+        return self.crc
+
+    def _read_header(self):
+        header, self._header = self._header, b""
+        if self._header_length == PayloadHeader.SIZE:
+            # raises ValueError if there is no payload magic
+            self.payload_header = PayloadHeader.unpack_from(header)
+            self._header_length = ChunkHeader.SIZE
+            return
+        self._block = ChunkHeader.unpack_from(header)
+        self._remaining = self._block.compressed_length
+        self._decompressor = zlib.decompressobj()
+        self._decompressed_length = 0
+        if self._remaining == 0:
+            self._end_block()
+
+    def _write(self, decompressed):
+        self._decompressed_length += len(decompressed)
+        self.outfile.write(decompressed)
+
+    def _end_block(self):
+        self._write(self._decompressor.flush())
+        # as strict as zlib.decompress() of the whole chunk
+        assert self._decompressor.eof, "truncated ZLIB chunk"
+        assert not self._decompressor.unused_data, "trailing data after ZLIB chunk"
+        decompressed_length = self._block.decompressed_length
+        assert (
+            decompressed_length == self._decompressed_length
+        ), "header decompressed length mismatch %i vs %i" % (
+            decompressed_length,
+            self._decompressed_length,
+        )
+        if self._block.more_chunks == 0:
+            self.done = True
+        self._block = None
+
+
+def scan_chunks(infile):
+    """reads only the block headers, returns a list of
+    (offset, compressed_length, decompressed_length) for each block where
+    offset is the position of the ZLIB chunk in infile"""
+    index = []
+    while True:
+        chunk_header = ChunkHeader.unpack_from(infile.read(ChunkHeader.SIZE))
+        compressed_length = chunk_header.compressed_length
+        index.append(
+            (infile.tell(), compressed_length, chunk_header.decompressed_length)
+        )
+        infile.seek(compressed_length, 1)
+        if chunk_header.more_chunks == 0:
             break
+    return index
+
+
+def decompress_parallel(infile, workers):
+    """decompress all blocks on a thread pool, return data and crc
+
+    The block headers are scanned first so that the chunks can be inflated
+    concurrently, they are written out in order as they complete. The
+    decompressed lengths in the headers are only checked, never trusted to
+    size the output.
+    """
+    index = scan_chunks(infile)
+    end_pos = infile.tell()
+
+    def inflate(compressed_chunk, decompressed_length):
+        decompressed_chunk = zlib.decompress(compressed_chunk)
+        assert decompressed_length == len(
+            decompressed_chunk
+        ), "header decompressed length mismatch %i vs %i" % (
+            decompressed_length,
+            len(decompressed_chunk),
+        )
+        return decompressed_chunk
+
+    # only needed with workers, and slow to import
+    from concurrent.futures import ThreadPoolExecutor
+
+    decompressed_data = BytesIO()
+    crc = 0
+    with ThreadPoolExecutor(workers) as executor:
+        # only read a few chunks ahead of the one being written
+        pending = deque()
+        for offset, compressed_length, decompressed_length in index:
+            infile.seek(offset)
+            compressed_chunk = infile.read(compressed_length)
+            crc = zlib.crc32(compressed_chunk, crc)
+            pending.append(
+                executor.submit(inflate, compressed_chunk, decompressed_length)
+            )
+            if len(pending) >= 2 * workers:
+                # re-raises any length mismatch
+                decompressed_data.write(pending.popleft().result())
+        while pending:
+            decompressed_data.write(pending.popleft().result())
+
+    infile.seek(end_pos)
     decompressed_data.seek(0)
     return (decompressed_data, crc)
 
 
-def compress_helper(infile, chunk_size, incorrect_compressed_size=False):
-    """compression helper, consumes chunk_size segments of infile"""
+def decompress(infile, workers=1):
+    """decompress all blocks, return data and crc"""
+    if workers > 1:
+        return decompress_parallel(infile, workers)
+    decompressed_data = BytesIO()
+    crc = decompress_stream(infile, decompressed_data)
+    decompressed_data.seek(0)
+    return (decompressed_data, crc)
+
+
+def compress_chunks(infile, chunk_size, workers=1):
+    """yields (uncompressed_length, compressed_chunk) for each chunk_size
+    segment of infile, in order. With workers > 1 the segments are compressed
+    concurrently on a thread pool (zlib releases the GIL while compressing)"""
+    if workers <= 1:
+        while True:
+            data = infile.read(chunk_size)
+            if len(data) == 0:
+                break
+            yield (len(data), zlib.compress(data, zlib.Z_BEST_COMPRESSION))
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(workers) as executor:
+        # only read a few chunks ahead of the one being handed back
+        pending = deque()
+        while True:
+            data = infile.read(chunk_size)
+            if len(data) == 0:
+                break
+            future = executor.submit(zlib.compress, data, zlib.Z_BEST_COMPRESSION)
+            pending.append((len(data), future))
+            if len(pending) >= 2 * workers:
+                uncompressed_length, future = pending.popleft()
+                yield (uncompressed_length, future.result())
+        while pending:
+            uncompressed_length, future = pending.popleft()
+            yield (uncompressed_length, future.result())
+
+
+def write_chunks(
+    infile, outfile, chunk_size, incorrect_compressed_size=False, workers=1
+):
+    """compress chunk_size segments of infile and write them to outfile as
+    blocks, returns stats"""
     # cumulative compressed length includes 60-byte payload header
     # it is the cumulative amount of bytes compressed EXCLUDING the last block
     cumulative_compressed_length = 15 * 4
     total_uncompressed_length = 0
     crc = 0
 
-    compressed_data = BytesIO()
-    while True:
-        data = infile.read(chunk_size)
-        uncompressed_length = len(data)
-        if uncompressed_length == 0:
-            break
-
+    for uncompressed_length, compressed_chunk in compress_chunks(
+        infile, chunk_size, workers
+    ):
         total_uncompressed_length += uncompressed_length
 
-        compressed_chunk = zlib.compress(data, zlib.Z_BEST_COMPRESSION)
         crc = zlib.crc32(compressed_chunk, crc) & 0xFFFFFFFF
 
         if uncompressed_length < chunk_size:
@@ -66,29 +252,77 @@ def compress_helper(infile, chunk_size, incorrect_compressed_size=False):
             cumulative_compressed_length += len(compressed_chunk) + 3 * 4
             more_chunks = cumulative_compressed_length
 
-        chunk_header = struct.pack(
-            ">3I", uncompressed_length, len(compressed_chunk), more_chunks
+        chunk_header = ChunkHeader(
+            uncompressed_length, len(compressed_chunk), more_chunks
         )
 
-        compressed_data.write(chunk_header)
-        compressed_data.write(compressed_chunk)
-
-    compressed_data.seek(0)
+        outfile.write(chunk_header.pack())
+        outfile.write(compressed_chunk)
 
     if incorrect_compressed_size:
         # some versions incorrectly add the final chunk size twice
         cumulative_compressed_length += len(compressed_chunk) + 3 * 4
 
-    stats = {
+    return {
         "crc": crc,
         "uncompressed_size": total_uncompressed_length,
         "compressed_size": cumulative_compressed_length,
     }
 
+
+def compress_helper(infile, chunk_size, incorrect_compressed_size=False, workers=1):
+    """compression helper, consumes chunk_size segments of infile"""
+    compressed_data = BytesIO()
+    stats = write_chunks(
+        infile,
+        compressed_data,
+        chunk_size,
+        incorrect_compressed_size=incorrect_compressed_size,
+        workers=workers,
+    )
+    compressed_data.seek(0)
     return (compressed_data, stats)
 
 
-def compress(infile, chunk_size, incorrect_compressed_size=False):
+def payload_header(stats, chunk_size):
+    """the 60 byte header of a compressed (type 0) payload"""
+    header = PayloadHeader.new(
+        0,  # no encryption, only zlib compression
+        stats["uncompressed_size"],
+        stats["compressed_size"],
+        chunk_size,
+        stats["crc"],
+    )
+    header.header_crc = zlib.crc32(header.pack()[: PayloadHeader.HEADER_CRC_OFFSET])
+    return header.pack()
+
+
+def compress_stream(
+    infile, outfile, chunk_size, incorrect_compressed_size=False, workers=1
+):
+    """compress into outfile one block at a time, returns stats
+
+    The header can only be created once all blocks have been compressed, so
+    space is reserved for it and it is written by seeking back, outfile must
+    therefore be seekable.
+    """
+    header_pos = outfile.tell()
+    outfile.write(bytes(60))
+    stats = write_chunks(
+        infile,
+        outfile,
+        chunk_size,
+        incorrect_compressed_size=incorrect_compressed_size,
+        workers=workers,
+    )
+    end_pos = outfile.tell()
+    outfile.seek(header_pos)
+    outfile.write(payload_header(stats, chunk_size))
+    outfile.seek(end_pos)
+    return stats
+
+
+def compress(infile, chunk_size, incorrect_compressed_size=False, workers=1):
     """compress and add header
 
     A 'block' consists of a 60 byte (15x4-byte INT) header followed by
@@ -109,24 +343,14 @@ def compress(infile, chunk_size, incorrect_compressed_size=False):
         ZLIB
             variable byte payload
     """
-    compressed_data, stats = compress_helper(
-        infile, chunk_size, incorrect_compressed_size=incorrect_compressed_size
-    )
-
-    header = struct.pack(
-        ">6I",
-        constants.PAYLOAD_MAGIC,
-        0,  # no encryption, only zlib compression
-        stats["uncompressed_size"],
-        stats["compressed_size"],
+    payload = BytesIO()
+    compress_stream(
+        infile,
+        payload,
         chunk_size,
-        stats["crc"],
+        incorrect_compressed_size=incorrect_compressed_size,
+        workers=workers,
     )
-    payload = BytesIO()
-    payload.write(header)
-    payload.write(struct.pack(">I", zlib.crc32(header) & 0xFFFFFFFF))
-    payload.write(struct.pack(">8I", *(0, 0, 0, 0, 0, 0, 0, 0)))
-    payload.write(compressed_data.read())
     payload.seek(0)
 
     return payload
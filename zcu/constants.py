@@ -1,5 +1,9 @@
 """Magic number constants from ZTE routers"""
 
 PAYLOAD_MAGIC = 0x01020304
+# 0 = ZLIB, 1 = ZLIB+CRC, 2 = AES128ECB, 3/4/5/6 = AES256CBC
+PAYLOAD_TYPES = (0, 1, 2, 3, 4, 5, 6)
 SIGNATURE_MAGIC = 0x04030201
 ZTE_MAGIC = (0x99999999, 0x44444444, 0x55555555, 0xAAAAAAAA)
+# base64 encoded configs start with the encoded SIGNATURE_MAGIC
+BASE64_MAGIC = b"BAMC"
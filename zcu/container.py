@@ -0,0 +1,300 @@
+"""Records for the parts of a config.bin, parsed with precompiled structs
+
+A config consists of an optional 128 byte ZTE header, an optional signature
+block, the 60 byte payload header and the payload itself. The payload is a
+series of blocks, each with a 12 byte chunk header.
+"""
+
+import struct
+import warnings
+
+from . import constants
+
+ZTE_MAGIC = struct.Struct(">4I")
+ZTE_HEADER = {
+    False: struct.Struct(">28I"),
+    True: struct.Struct("<28I"),
+}
+SIGNATURE_HEADER = struct.Struct(">3I")
+PAYLOAD_HEADER = struct.Struct(">15I")
+# the payload magic and payload type, i.e. the start of the first AES block
+PAYLOAD_START = struct.Struct(">2I")
+CHUNK_HEADER = struct.Struct(">3I")
+
+
+class ZteHeader:
+    """the 128 byte header, which starts with ZTE_MAGIC"""
+
+    __slots__ = ("fields", "little_endian")
+
+    SIZE = ZTE_MAGIC.size + ZTE_HEADER[False].size
+
+    def __init__(self, fields, little_endian=False):
+        self.fields = fields
+        self.little_endian = little_endian
+
+    @classmethod
+    def unpack_from(cls, buffer, offset=0, little_endian=False):
+        """returns the header at offset, or None if there is no ZTE_MAGIC"""
+        if ZTE_MAGIC.unpack_from(buffer, offset) != constants.ZTE_MAGIC:
+            return None
+        offset += ZTE_MAGIC.size
+        fields = ZTE_HEADER[little_endian].unpack_from(buffer, offset)
+        if fields[2] == 0x4000000:
+            warnings.warn("Incorrect endianess specified!", stacklevel=2)
+            little_endian = not little_endian
+            fields = ZTE_HEADER[little_endian].unpack_from(buffer, offset)
+        assert (
+            fields[2] == 4
+        ), f"Expected header[2] to be 0x4, was actually 0x{fields[2]:X}"
+        return cls(fields, little_endian)
+
+    @property
+    def version(self):
+        return self.fields[12]
+
+    @property
+    def header_length(self):
+        return self.fields[13]
+
+    @property
+    def signed_config_size(self):
+        return self.fields[14]
+
+
+class Signature:
+    """the signature block, a 12 byte header followed by the signature"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    @property
+    def size(self):
+        return SIGNATURE_HEADER.size + len(self.value)
+
+    @staticmethod
+    def unpack_length(buffer, offset=0):
+        """returns the length of the signature at offset, or None if there is
+        no SIGNATURE_MAGIC"""
+        magic, _, length = SIGNATURE_HEADER.unpack_from(buffer, offset)
+        return length if magic == constants.SIGNATURE_MAGIC else None
+
+    @classmethod
+    def unpack_from(cls, buffer, offset=0):
+        """returns the signature at offset, or None if there is none"""
+        length = cls.unpack_length(buffer, offset)
+        if length is None:
+            return None
+        start = offset + SIGNATURE_HEADER.size
+        end = start + length
+        return cls(bytes(buffer[start:end]))
+
+
+class PayloadHeader:
+    """the 60 byte payload header, which starts with PAYLOAD_MAGIC"""
+
+    __slots__ = (
+        "payload_type",
+        "decompressed_length",
+        "compressed_size",
+        "chunk_size",
+        "crc",
+        "header_crc",
+        "fields",
+    )
+
+    SIZE = PAYLOAD_HEADER.size
+    # header_crc is the crc of the fields before it
+    HEADER_CRC_OFFSET = 24
+
+    def __init__(self, fields):
+        self.fields = fields
+        (
+            _,
+            self.payload_type,
+            self.decompressed_length,
+            self.compressed_size,
+            self.chunk_size,
+            self.crc,
+            self.header_crc,
+        ) = fields[:7]
+
+    @classmethod
+    def unpack_from(cls, buffer, offset=0):
+        fields = PAYLOAD_HEADER.unpack_from(buffer, offset)
+        if fields[0] != constants.PAYLOAD_MAGIC:
+            raise ValueError("Payload header does not start with the payload magic.")
+        return cls(fields)
+
+    @classmethod
+    def new(
+        cls,
+        payload_type,
+        decompressed_length=0,
+        compressed_size=0,
+        chunk_size=0,
+        crc=0,
+        header_crc=0,
+    ):
+        """a header for a new payload, the remaining fields are 0"""
+        fields = (
+            constants.PAYLOAD_MAGIC,
+            payload_type,
+            decompressed_length,
+            compressed_size,
+            chunk_size,
+            crc,
+            header_crc,
+        )
+        # 15 fields of 4 bytes
+        return cls(fields + (0,) * (PAYLOAD_HEADER.size // 4 - len(fields)))
+
+    def pack(self):
+        return PAYLOAD_HEADER.pack(
+            constants.PAYLOAD_MAGIC,
+            self.payload_type,
+            self.decompressed_length,
+            self.compressed_size,
+            self.chunk_size,
+            self.crc,
+            self.header_crc,
+            *self.fields[7:],
+        )
+
+
+class ChunkHeader:
+    """the 12 byte header of a ZLIB block"""
+
+    __slots__ = ("decompressed_length", "compressed_length", "more_chunks")
+
+    SIZE = CHUNK_HEADER.size
+
+    def __init__(self, decompressed_length, compressed_length, more_chunks):
+        self.decompressed_length = decompressed_length
+        self.compressed_length = compressed_length
+        self.more_chunks = more_chunks
+
+    @classmethod
+    def unpack_from(cls, buffer, offset=0):
+        return cls(*CHUNK_HEADER.unpack_from(buffer, offset))
+
+    def pack(self):
+        return CHUNK_HEADER.pack(
+            self.decompressed_length, self.compressed_length, self.more_chunks
+        )
+
+
+class Container:
+    """the (header), signature and payload header of a config"""
+
+    __slots__ = ("header", "signature", "payload_header", "payload_offset")
+
+    def __init__(self, header, signature, payload_header, payload_offset):
+        self.header = header
+        self.signature = signature
+        self.payload_header = payload_header
+        # position just after the payload header
+        self.payload_offset = payload_offset
+
+    @property
+    def header_length(self):
+        return self.header.header_length if self.header is not None else 0
+
+    @property
+    def signature_bytes(self):
+        return self.signature.value if self.signature is not None else b""
+
+    @property
+    def payload_type(self):
+        return self.payload_header.payload_type
+
+
+class _Prefix:
+    """the start of a config, read from data only as far as it is needed"""
+
+    def __init__(self, data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self.data = None
+            self.buffer = memoryview(data)
+        else:
+            self.data = data
+            self.buffer = bytearray()
+
+    def ensure(self, size):
+        """reads up to size bytes in total, fewer at the end of data"""
+        if self.data is not None and size > len(self.buffer):
+            self.buffer.extend(self.data.read(size - len(self.buffer)))
+
+    def check(self, size):
+        """reads size bytes in total, raises ValueError at the end of data"""
+        self.ensure(size)
+        if size > len(self.buffer):
+            raise ValueError("Config is too short")
+
+
+def _parse_header(prefix, little_endian, length):
+    """returns the ZTE header or None, and the offset of the signature, the
+    sizes in the header are checked against length unless it is None"""
+    prefix.check(ZTE_MAGIC.size)
+    if ZTE_MAGIC.unpack_from(prefix.buffer) != constants.ZTE_MAGIC:
+        return (None, 0)
+    prefix.check(ZteHeader.SIZE)
+    header = ZteHeader.unpack_from(prefix.buffer, 0, little_endian)
+    assert (
+        length is None or header.header_length + header.signed_config_size == length
+    ), "file size does not match header"
+    return (header, header.header_length)
+
+
+def _parse_signature(prefix, offset):
+    """returns the signature at offset or None"""
+    prefix.check(offset + SIGNATURE_HEADER.size)
+    signature_length = Signature.unpack_length(prefix.buffer, offset)
+    if signature_length is None:
+        return None
+    prefix.check(offset + SIGNATURE_HEADER.size + signature_length)
+    return Signature.unpack_from(prefix.buffer, offset)
+
+
+def parse(data, little_endian=False, length=None, check_length=True):
+    """parse the (header), signature and payload header in one pass
+
+    data can be bytes, a memoryview or a file-like object positioned at the
+    start of the config, whose total length is given by length or otherwise
+    found by seeking to the end. Only the start of a file-like data is read,
+    and it is left at the start of the payload (i.e. payload_offset).
+
+    With check_length=False the sizes in the header are not compared with
+    the total length, for data which is only the start of a config. This is
+    also the case for a stream which cannot seek (e.g. a pipe) when length
+    is not given, such a stream is read no further than the payload.
+    """
+    prefix = _Prefix(data)
+    seekable = prefix.data is not None and data.seekable()
+    if prefix.data is None:
+        length = len(prefix.buffer)
+    elif seekable:
+        start_pos = data.tell()
+        if length is None and check_length:
+            length = data.seek(0, 2) - start_pos
+            data.seek(start_pos)
+        # the largest header, so only signatures need another read
+        prefix.ensure(ZteHeader.SIZE + SIGNATURE_HEADER.size + PAYLOAD_HEADER.size)
+
+    header, offset = _parse_header(
+        prefix, little_endian, length if check_length else None
+    )
+    signature = _parse_signature(prefix, offset)
+    if signature is not None:
+        offset += signature.size
+
+    prefix.check(offset + PAYLOAD_HEADER.size)
+    payload_header = PayloadHeader.unpack_from(prefix.buffer, offset)
+    offset += PAYLOAD_HEADER.size
+
+    # a stream which cannot seek has been read exactly up to offset
+    if seekable:
+        data.seek(start_pos + offset)
+    return Container(header, signature, payload_header, offset)
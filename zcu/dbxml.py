@@ -0,0 +1,135 @@
+"""Streaming reader of decoded configs, which are of the form
+
+    <DB>
+    <Tbl name="ETH" RowCount="5">
+    <Row No="0">
+    <DM name="Enable" val="1"/>
+    ...
+
+and are read as (table, row, name, value) records, e.g.
+("ETH", 0, "Enable", "1"), without the whole config being held in memory.
+
+Each table appears once, but in no particular order, so select() can only
+stop once every table asked for has been read.
+"""
+
+from xml.etree.ElementTree import XMLPullParser
+
+from .pipeline import decode_chunks
+
+
+class DBParser:
+    """push based parser of a decoded config, feed() it the XML in pieces of
+    any size and it returns the records completed so far
+
+    Elements are dropped as soon as they end, so no more than the element
+    being parsed (and the table and row around it) is kept.
+    """
+
+    def __init__(self):
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._elements = []
+        self._table = None
+        self._row = None
+        # the names of the tables which have been read in full
+        self.tables_read = set()
+
+    def feed(self, data):
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        """checks the XML is complete, returns any remaining records"""
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        records = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if element.tag == "Tbl":
+                    self._table = element.get("name")
+                elif element.tag == "Row":
+                    self._row = int(element.get("No"))
+                self._elements.append(element)
+                continue
+            self._elements.pop()
+            if element.tag == "DM":
+                records.append(
+                    (self._table, self._row, element.get("name"), element.get("val"))
+                )
+            elif element.tag == "Tbl":
+                self.tables_read.add(self._table)
+            if self._elements:
+                self._elements[-1].remove(element)
+        return records
+
+
+def iter_records(pieces):
+    """yields the (table, row, name, value) records of the XML given as an
+    iterable of bytes, e.g. pipeline.decode_chunks()"""
+    parser = DBParser()
+    for data in pieces:
+        yield from parser.feed(data)
+    yield from parser.close()
+
+
+def read_records(infile, read_size=65536):
+    """yields the records of a decoded config file"""
+    return iter_records(iter(lambda: infile.read(read_size), b""))
+
+
+def decode_records(infile, decryptor=None, read_size=65536):
+    """yields the records of the payload at the current position of infile
+    (i.e. after the 60 byte payload header) as it is decrypted and
+    decompressed, see pipeline.decode_chunks()"""
+    return iter_records(decode_chunks(infile, decryptor, read_size))
+
+
+def selection(items):
+    """{table: set of DM names, or None for all of them} of items, which are
+    table names or (table, name) paths"""
+    wanted = {}
+    for item in items:
+        if isinstance(item, str):
+            wanted[item] = None
+        else:
+            table, name = item
+            if table not in wanted:
+                wanted[table] = set()
+            if wanted[table] is not None:
+                wanted[table].add(name)
+    return wanted
+
+
+def _selected(records, wanted):
+    for record in records:
+        names = wanted.get(record[0], ())
+        if names is None or record[2] in names:
+            yield record
+
+
+def select(pieces, items):
+    """yields the records of the XML given as an iterable of bytes which are
+    in items (see selection()), pieces stops being consumed (and is closed,
+    if it is a generator) as soon as every table in items has been read"""
+    wanted = selection(items)
+    parser = DBParser()
+    pieces = iter(pieces)
+    try:
+        for data in pieces:
+            yield from _selected(parser.feed(data), wanted)
+            if parser.tables_read.issuperset(wanted):
+                return
+        yield from _selected(parser.close(), wanted)
+    finally:
+        close = getattr(pieces, "close", None)
+        if close is not None:
+            close()
+
+
+def decode_select(infile, items, decryptor=None, read_size=65536):
+    """yields the records in items of the payload at the current position
+    of infile, nothing more is read, decrypted or decompressed once every
+    table in items has been read, see select() and decode_records()"""
+    return select(decode_chunks(infile, decryptor, read_size), items)
@@ -0,0 +1,82 @@
+"""Decoding many configs, each with the details of its device (serial
+number, MAC address, ...) where they are known"""
+
+import contextlib
+import fnmatch
+import io
+import itertools
+import os
+from types import SimpleNamespace
+
+from . import base64io, container, pipeline
+from .candidates import candidates, direct_candidates
+from .keysearch import new_xcryptor, search
+
+DEVICE_FIELDS = ["file", "serial", "mac", "longpass", "signature", "key", "iv", "model"]
+
+
+class NoKeyFound(LookupError):
+    """none of the key candidates decrypts the config"""
+
+
+def find_configs(input_dir, pattern):
+    """yields the relative paths of the files matching pattern"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if fnmatch.fnmatch(name, pattern):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, input_dir).replace(os.sep, "/")
+
+
+def decode(infile, outfile, device):
+    """decodes the config in infile into outfile, returns a dict of the
+    payload_type, signature, key, iv and source, raises NoKeyFound if no
+    key is found
+
+    device is a dict of DEVICE_FIELDS, None where not known.
+    """
+    infile = base64io.open_config(infile)
+    parsed = container.parse(infile)
+    signature = device["signature"] or parsed.signature_bytes.decode()
+    info = {
+        "payload_type": parsed.payload_type,
+        "signature": signature,
+        "key": "",
+        "iv": "",
+        "source": "",
+    }
+    if parsed.payload_type == 0:
+        pipeline.decode_stream(infile, outfile)
+        return info
+
+    args = SimpleNamespace(
+        key=device["key"],
+        iv=device["iv"],
+        signature=signature,
+        serial_number=device["serial"],
+        mac_address=device["mac"],
+        password=device["longpass"],
+        key_prefix=None,
+        key_suffix=None,
+        iv_prefix=None,
+        iv_suffix=None,
+    )
+    # the keygens print hints about missing parameters
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = search(
+            infile,
+            itertools.chain(
+                direct_candidates(parsed.payload_type, signature, device),
+                candidates(args),
+            ),
+        )
+    if found is None:
+        raise NoKeyFound("no key found")
+    _, (key, iv), source = found
+    info["key"] = key
+    info["iv"] = "" if iv is None else iv
+    info["source"] = source
+    # decrypted while it is decompressed
+    pipeline.decode_stream(infile, outfile, new_xcryptor(found))
+    return info
@@ -0,0 +1,122 @@
+"""SQLite database of the values of many decoded configs, for queries
+across a fleet of devices, e.g.
+
+    SELECT device FROM dm WHERE "table" = 'ETH' AND row = 2
+        AND name = 'Enable' AND value = '0'
+"""
+
+import itertools
+import sqlite3
+import time
+
+from .cache import digest
+from .dbxml import read_records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    device TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    imported REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dm (
+    device TEXT NOT NULL,
+    "table" TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS dm_device ON dm (device);
+CREATE INDEX IF NOT EXISTS dm_table_name_value ON dm ("table", name, value);
+"""
+# rows inserted per executemany()
+BATCH_SIZE = 10000
+
+
+class FleetDB:
+    """device -> the (table, row, name, value) records of its config
+
+    Each device keeps the hash of the config it was imported from, so
+    importing an unchanged config again is skipped. Changes are made in a
+    transaction which is only committed by commit(), so many devices can be
+    imported at once.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def hash(self, device):
+        """the hash of the config the device was imported from, or None"""
+        row = self.connection.execute(
+            "SELECT hash FROM devices WHERE device = ?", (device,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def devices(self):
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT device FROM devices ORDER BY device"
+            )
+        ]
+
+    def import_records(self, device, config_hash, records):
+        """replaces the records of the device, returns the number inserted
+
+        If records raises (e.g. the XML is truncated) the device is left as
+        it was, without affecting the other devices in the transaction.
+        """
+        # outside of a transaction the savepoint would start (and RELEASE
+        # would commit) one of its own, so it is left for commit() to end
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+        self.connection.execute("SAVEPOINT import_records")
+        try:
+            self.connection.execute("DELETE FROM dm WHERE device = ?", (device,))
+            records = iter(records)
+            count = 0
+            while True:
+                batch = [
+                    (device,) + record
+                    for record in itertools.islice(records, BATCH_SIZE)
+                ]
+                if not batch:
+                    break
+                self.connection.executemany(
+                    'INSERT INTO dm (device, "table", row, name, value) '
+                    "VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+                count += len(batch)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO devices (device, hash, imported) "
+                "VALUES (?, ?, ?)",
+                (device, config_hash, time.time()),
+            )
+        except BaseException:
+            self.connection.execute("ROLLBACK TO import_records")
+            raise
+        finally:
+            self.connection.execute("RELEASE import_records")
+        return count
+
+    def import_config(self, device, infile):
+        """imports the decoded config read from infile unless it is unchanged
+        since the last import, returns the number of records inserted or None
+        if it was skipped"""
+        config_hash = digest(infile)
+        if self.hash(device) == config_hash:
+            return None
+        return self.import_records(device, config_hash, read_records(infile))
+
+    def remove(self, device):
+        self.connection.execute("DELETE FROM dm WHERE device = ?", (device,))
+        self.connection.execute("DELETE FROM devices WHERE device = ?", (device,))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,50 @@
+"""Persistent record of which key candidates decoded which signatures"""
+
+import re
+
+from .storage import load_json, save_json
+
+# trailing hardware/firmware version, e.g. the 'V7.0' in 'ZXHN H298Q V7.0'
+VERSION_SUFFIX = re.compile(r"\s+v\d[\w.]*$")
+
+
+def signature_prefix(signature):
+    """the part of the signature that identifies a family of devices"""
+    return VERSION_SUFFIX.sub("", signature.strip().lower())
+
+
+class HitStats:
+    """(signature prefix, payload type) -> {candidate source: hit count}
+
+    Hits are also counted against the payload type alone so that devices with
+    an unseen signature still benefit from the fleet wide ordering.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = load_json(path, {})
+
+    @staticmethod
+    def _keys(signature, payload_type):
+        return (
+            f"{payload_type}:{signature_prefix(signature)}",
+            f"{payload_type}:",
+        )
+
+    def record(self, signature, payload_type, source):
+        for key in self._keys(signature, payload_type):
+            sources = self.hits.setdefault(key, {})
+            sources[source] = sources.get(source, 0) + 1
+
+    def ranking(self, signature, payload_type):
+        """returns sources, most successful for this signature prefix first"""
+        ranked = []
+        for key in self._keys(signature, payload_type):
+            sources = self.hits.get(key, {})
+            for source in sorted(sources, key=lambda x: -sources[x]):
+                if source not in ranked:
+                    ranked.append(source)
+        return ranked
+
+    def save(self):
+        save_json(self.path, self.hits)
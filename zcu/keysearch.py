@@ -0,0 +1,146 @@
+"""Key search helpers, optionally spread across a pool of worker processes"""
+
+import multiprocessing
+import signal
+import threading
+from io import BytesIO
+
+from .xcryptors import FIRST_BLOCK_SIZE
+from .zte import peek
+
+
+# per-process state, populated by _init_worker
+_head = None
+_found = None
+_xcryptors = {}
+_first_blocks = {}
+
+
+def _get_xcryptor(xcryptor_cls):
+    # re-use one xcryptor per class, set_key is called before every trial
+    if xcryptor_cls not in _xcryptors:
+        _xcryptors[xcryptor_cls] = xcryptor_cls()
+    return _xcryptors[xcryptor_cls]
+
+
+def _check_candidate(infile, candidate, first_blocks):
+    """whether the candidate decrypts the first AES block to a payload header,
+    the block is read once per xcryptor class"""
+    xcryptor_cls, keypair = candidate[:2]
+    xcryptor = _get_xcryptor(xcryptor_cls)
+    if xcryptor_cls not in first_blocks:
+        first_blocks[xcryptor_cls] = xcryptor.read_first_block(infile)
+    block = first_blocks[xcryptor_cls]
+    return block is not None and xcryptor.check_block(block, *keypair)
+
+
+def _init_worker(head, found):
+    global _head, _found
+    # leave Ctrl-C to the parent process, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _head = head
+    _found = found
+    _first_blocks.clear()
+
+
+def _try_candidate(indexed_candidate):
+    index, candidate = indexed_candidate
+    # another worker already found an earlier candidate, no need to try this one
+    if index > _found.value:
+        return (index, False)
+    if not _check_candidate(BytesIO(_head), candidate, _first_blocks):
+        return (index, False)
+    with _found.get_lock():
+        if index < _found.value:
+            _found.value = index
+    return (index, True)
+
+
+def search(infile, candidates, workers=1, chunksize=1, progress=None):
+    """search for the first candidate that decrypts the payload
+
+    infile is expected to be positioned at the start of the encrypted payload
+    (i.e. after the 60 byte payload header), and is left unchanged. Only the
+    first block is read, a stream which cannot seek needs peek() for it (see
+    zte.peek()).
+
+    candidates is an iterable of (xcryptor_class, keypair, ...) tuples which are
+    tried in order. When workers > 1 the trials are spread over a process pool,
+    the result is always the first matching candidate in iteration order.
+    Only the first AES block is decrypted by a trial, the payload can then be
+    decoded with the xcryptor of the candidate (see new_xcryptor()), e.g. by
+    pipeline.decode_stream().
+
+    progress, if given, is called with each candidate once it has been tried,
+    in iteration order.
+
+    returns the first matching candidate or None
+    """
+    if workers <= 1:
+        return _search_sequential(infile, candidates, progress)
+    return _search_pool(infile, candidates, workers, chunksize, progress)
+
+
+def new_xcryptor(candidate):
+    """returns an xcryptor of the candidate's class with its keypair set"""
+    xcryptor_cls, keypair = candidate[:2]
+    xcryptor = xcryptor_cls()
+    xcryptor.set_key(*keypair)
+    return xcryptor
+
+
+def _search_sequential(infile, candidates, progress):
+    first_blocks = {}
+    for candidate in candidates:
+        found = _check_candidate(infile, candidate, first_blocks)
+        if progress is not None:
+            progress(candidate)
+        if found:
+            return candidate
+    return None
+
+
+def _search_pool(infile, candidates, workers, chunksize, progress):
+    """returns the first candidate which one of the workers found to decrypt
+    the payload, or None"""
+    # a trial only needs the first block, so that is all the workers are given
+    head = peek(infile, FIRST_BLOCK_SIZE)
+
+    # index of the earliest successful candidate seen by any worker
+    found = multiprocessing.Value("q", 2**63 - 1)
+
+    # candidates handed out to the pool whose result has not been seen yet,
+    # bounded so that huge candidate streams (e.g. sweeps) use constant memory
+    pending = {}
+    in_flight = threading.Semaphore(workers * chunksize * 4)
+    stop = threading.Event()
+
+    def indexed_candidates():
+        for index, candidate in enumerate(candidates):
+            in_flight.acquire()
+            if stop.is_set():
+                return
+            pending[index] = candidate
+            yield (index, candidate)
+
+    with multiprocessing.Pool(
+        workers, initializer=_init_worker, initargs=(head, found)
+    ) as pool:
+        try:
+            # results come back in submission order, so the first hit is the
+            # same candidate a sequential search would have found
+            for index, success in pool.imap(
+                _try_candidate, indexed_candidates(), chunksize
+            ):
+                candidate = pending.pop(index)
+                in_flight.release()
+                if progress is not None:
+                    progress(candidate)
+                if success:
+                    return candidate
+        finally:
+            # unblock the pool's task feeder so the pool can be terminated
+            stop.set()
+            in_flight.release()
+        # leaving the context terminates any workers still busy
+    return None
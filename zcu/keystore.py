@@ -0,0 +1,102 @@
+"""Persistent record of the key and IV which last worked for each device"""
+
+import re
+import time
+
+from .storage import load_json, save_json
+from .xcryptors import Xcryptor, CBCXcryptor
+
+MODES = {
+    "ecb": Xcryptor,
+    "cbc": CBCXcryptor,
+}
+
+MAC_SEPARATORS = re.compile(r"[:\-.\s]")
+
+
+def normalise(serial=None, mac=None, signature=None):
+    """returns {field: value} of the details given, in a canonical form"""
+    details = {}
+    if serial:
+        details["serial"] = serial.strip().upper()
+    if mac:
+        details["mac"] = MAC_SEPARATORS.sub("", mac).lower()
+    if signature:
+        details["signature"] = signature.strip().lower()
+    return details
+
+
+def identity(details):
+    """the key of a device in the store, e.g. 'serial=ZTEG...;mac=aabb...'"""
+    return ";".join(f"{field}={value}" for field, value in details.items())
+
+
+class KeyStore:
+    """device (serial, MAC, signature) -> the key and IV which last worked
+
+    A lookup with a serial or MAC also finds devices recorded with more
+    details, e.g. a key found with the serial, MAC and signature is found
+    again with only the serial. A signature alone only finds devices which
+    were recorded with the signature alone, as many devices share one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = load_json(path, {})
+
+    def lookup(self, serial=None, mac=None, signature=None):
+        """returns the entry for the device, or None if it is not known"""
+        details = normalise(serial, mac, signature)
+        if not details:
+            return None
+        entry = self.devices.get(identity(details))
+        if entry is not None or not ("serial" in details or "mac" in details):
+            return entry
+        matches = [
+            entry
+            for entry in self.devices.values()
+            if all(entry.get(field) == value for field, value in details.items())
+        ]
+        if not matches:
+            return None
+        return max(matches, key=lambda x: x["updated"])
+
+    @staticmethod
+    def candidate(entry):
+        """the (xcryptor_class, keypair, source) of an entry, the source is
+        that of the candidate which originally found the key"""
+        source = entry["source"] or "key store"
+        return (MODES[entry["mode"]], (entry["key"], entry["iv"]), source)
+
+    def record(
+        self,
+        xcryptor_cls,
+        keypair,
+        payload_type,
+        source=None,
+        serial=None,
+        mac=None,
+        signature=None,
+    ):
+        """stores the key and IV which worked for the device, replacing any
+        recorded before"""
+        details = normalise(serial, mac, signature)
+        if not details:
+            return
+        key, iv = keypair
+        mode = "cbc" if issubclass(xcryptor_cls, CBCXcryptor) else "ecb"
+        entry = dict(details)
+        entry.update(
+            {
+                "key": key.decode() if isinstance(key, bytes) else key,
+                "iv": iv.decode() if isinstance(iv, bytes) else iv,
+                "mode": mode,
+                "payload_type": payload_type,
+                "source": source,
+                "updated": time.time(),
+            }
+        )
+        self.devices[identity(details)] = entry
+
+    def save(self):
+        save_json(self.path, self.devices)
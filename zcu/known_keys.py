@@ -33,12 +33,8 @@ KNOWN_SIGNATURES = [
 
 
 def find_key(signature):
-    signature = signature.lower()
-    for key, sigs in KNOWN_KEYS.items():
-        for sig in sigs:
-            if signature.startswith(sig):
-                return key
-    return None
+    keys = lookup(signature)[0]
+    return keys[0] if keys else None
 
 
 def get_all_keys():
@@ -150,18 +146,59 @@ KNOWN_KEYGENS = {
 }
 
 
+# prefix trie over the lower-cased signature starts of KNOWN_KEYS and
+# KNOWN_KEYGENS, built on first use by _signature_index()
+_SIGNATURE_INDEX = None
+
+
+def _signature_index():
+    global _SIGNATURE_INDEX
+    if _SIGNATURE_INDEX is None:
+        # each node is {char: node, None: [(priority, is_keygen, key or keygen)]}
+        root = {}
+        entries = []
+        # KNOWN_KEYS signatures are expected to be lower-case already
+        for priority, (key, sigs) in enumerate(KNOWN_KEYS.items()):
+            entries += [(sig, (priority, False, key)) for sig in sigs]
+        for priority, (gen, sigs) in enumerate(KNOWN_KEYGENS.items()):
+            entries += [(sig.lower(), (priority, True, gen)) for sig in sigs]
+        for sig, entry in entries:
+            node = root
+            for char in sig:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(entry)
+        _SIGNATURE_INDEX = root
+    return _SIGNATURE_INDEX
+
+
+def lookup(signature):
+    """returns (keys, keygens) whose signature starts match signature,
+    both in the order they appear in KNOWN_KEYS and KNOWN_KEYGENS"""
+    matches = []
+    node = _signature_index()
+    for char in signature.lower():
+        matches += node.get(None, [])
+        node = node.get(char)
+        if node is None:
+            break
+    else:
+        matches += node.get(None, [])
+
+    keys = []
+    keygens = []
+    for _, is_keygen, item in sorted(matches, key=lambda x: x[0]):
+        found = keygens if is_keygen else keys
+        if item not in found:
+            found.append(item)
+    return (keys, keygens)
+
+
 def run_keygens(params):
     outArr = []
-    for gen, sigs in KNOWN_KEYGENS.items():
-        matching = False
-        for sig in sigs:
-            if params.signature.lower().startswith(sig.lower()):
-                matching = True
-                break
-        if matching:
-            genResult = gen(params)
-            if len(genResult):
-                outArr.append(genResult)
+    for gen in lookup(params.signature)[1]:
+        genResult = gen(params)
+        if len(genResult):
+            outArr.append(genResult)
     return outArr
 
 
@@ -176,15 +213,16 @@ def run_all_keygens(params):
 
 
 def run_any_keygen(params, wanted):
-    keygened = run_keygens(params)
-    if keygened != []:
-        return keygened[0]
+    for gen in lookup(params.signature)[1]:
+        genResult = gen(params)
+        if len(genResult):
+            return genResult
 
     # no match for signature found in keygens, find a generic keygen of wanted type and use that
-    allgens = run_all_keygens(params)
-    for gen in allgens:
-        if gen[2].startswith(wanted):
-            return gen
+    for gen in KNOWN_KEYGENS.keys():
+        genResult = gen(params)
+        if len(genResult) and genResult[2].startswith(wanted):
+            return genResult
 
     # should never get here as long as wanted is an existing type
     return None
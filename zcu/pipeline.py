@@ -0,0 +1,109 @@
+"""Fused decrypt and decompress (and compress and encrypt), the payload is
+never held in memory in full"""
+
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from .compression import Inflater, compress_stream
+from .zte import write_header
+
+# compressed payloads larger than this are spooled to a temporary file
+SPOOL_SIZE = 16 * 1024 * 1024
+
+
+def decode_stream(infile, outfile, decryptor=None, read_size=65536):
+    """decrypt and decompress the payload at the current position of infile
+    (i.e. after the 60 byte payload header) into outfile, returns crc
+
+    decryptor is an Xcryptor with the key already set, or None for an
+    unencrypted (type 0) payload
+    """
+    if decryptor is None:
+        inflater = Inflater(outfile, read_header=False)
+        pieces = iter(lambda: infile.read(read_size), b"")
+    else:
+        inflater = Inflater(outfile)
+        pieces = decryptor.decrypt_stream(infile, read_size)
+    for piece in pieces:
+        inflater.feed(piece)
+        if inflater.done:
+            break
+    return inflater.close()
+
+
+def decode_chunks(infile, decryptor=None, read_size=65536):
+    """like decode_stream(), but yields the decompressed config in pieces as
+    each read_size piece of the payload is read
+
+    Nothing more is read from infile once the generator is closed, so a
+    consumer can stop early without decoding the rest of the payload.
+    """
+    output = BytesIO()
+    if decryptor is None:
+        inflater = Inflater(output, read_header=False)
+        pieces = iter(lambda: infile.read(read_size), b"")
+    else:
+        inflater = Inflater(output)
+        pieces = decryptor.decrypt_stream(infile, read_size)
+    for piece in pieces:
+        inflater.feed(piece)
+        decompressed = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        if decompressed:
+            yield decompressed
+        if inflater.done:
+            break
+    inflater.close()
+
+
+def encode_stream(
+    infile,
+    outfile,
+    chunk_size,
+    encryptor=None,
+    signature=b"",
+    version=0,
+    include_header=False,
+    little_endian=False,
+    incorrect_compressed_size=False,
+    workers=1,
+):
+    """compress (and encrypt unless encryptor is None) infile into outfile,
+    the output is identical to compress(), encrypt() and add_header()
+
+    The compressed payload is spooled first as its size and CRC are needed
+    for the headers, it is then encrypted while it is written to outfile.
+    """
+    with SpooledTemporaryFile(SPOOL_SIZE) as payload:
+        compress_stream(
+            infile,
+            payload,
+            chunk_size,
+            incorrect_compressed_size=incorrect_compressed_size,
+            workers=workers,
+        )
+        payload_length = payload.tell()
+        payload.seek(0)
+
+        if encryptor is None:
+            write_header(
+                outfile,
+                payload_length,
+                signature,
+                version,
+                include_header,
+                little_endian,
+            )
+            for data in iter(lambda: payload.read(65536), b""):
+                outfile.write(data)
+        else:
+            write_header(
+                outfile,
+                encryptor.encrypted_length(payload_length),
+                signature,
+                version,
+                include_header,
+                little_endian,
+            )
+            encryptor.encrypt_stream(payload, outfile, payload_length)
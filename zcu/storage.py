@@ -0,0 +1,49 @@
+"""Helpers for the small JSON files used to persist state between runs"""
+
+import contextlib
+import json
+import os
+import time
+
+LOCK_TIMEOUT = 10
+
+
+def load_json(path, default=None):
+    """returns the contents of the JSON file at path, or default if missing"""
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    """write data to a temporary file first so an interrupted save keeps the
+    previous contents of path intact"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    """holds path.lock while the block runs so processes sharing path can
+    load, change and save it in turn, a lock older than timeout is taken to
+    be left behind by a process which died and is broken"""
+    lock_path = f"{path}.lock"
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > timeout:
+                    os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
@@ -0,0 +1,169 @@
+"""MAC address and serial number ranges for brute-force key sweeps"""
+
+import time
+
+from .known_keys import mac_to_str
+from .storage import load_json, save_json
+
+HEX_DIGITS = "0123456789abcdef"
+
+
+class MacRange:
+    """every MAC address between two MACs (inclusive), or all MACs that start
+    with a given prefix, e.g. an OUI such as 'AA:BB:CC'"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        if spec.count("-") == 1:
+            start, end = spec.split("-")
+            self.first = self._parse(start)
+            self.last = self._parse(end)
+        else:
+            prefix = spec.strip().replace(":", "").replace("-", "")
+            if len(prefix) % 2 or len(prefix) > 12 or not prefix:
+                raise ValueError(f"Invalid MAC prefix: '{spec}'")
+            shift = 4 * (12 - len(prefix))
+            self.first = int(prefix, 16) << shift
+            self.last = self.first + (1 << shift) - 1
+        if self.last < self.first:
+            raise ValueError(f"Invalid MAC range: '{spec}'")
+
+    @staticmethod
+    def _parse(mac):
+        return int.from_bytes(bytes.fromhex(mac_to_str(mac, separator="")), "big")
+
+    def __len__(self):
+        return self.last - self.first + 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("MAC range index out of range")
+        return mac_to_str((self.first + index).to_bytes(6, "big"))
+
+
+class SerialRange:
+    """every serial number between two serials (inclusive) which only differ
+    in a trailing hexadecimal part, e.g. 'ZTEGC0FF0000-ZTEGC0FFFFFF'"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        start, sep, end = spec.partition("-")
+        if not sep or len(start) != len(end):
+            raise ValueError(f"Invalid serial range: '{spec}'")
+
+        # the varying part is the run of hex digits at the end of both serials
+        width = 0
+        for a, b in zip(reversed(start), reversed(end)):
+            if a.lower() not in HEX_DIGITS or b.lower() not in HEX_DIGITS:
+                break
+            width += 1
+        prefix_length = len(start) - width
+        if start[:prefix_length] != end[:prefix_length] or width == 0:
+            raise ValueError(f"Invalid serial range: '{spec}'")
+
+        self.prefix = start[:prefix_length]
+        self.width = width
+        self.upper = any(
+            c.isupper() for c in start[prefix_length:] + end[prefix_length:]
+        )
+        self.first = int(start[prefix_length:], 16)
+        self.last = int(end[prefix_length:], 16)
+        if self.last < self.first:
+            raise ValueError(f"Invalid serial range: '{spec}'")
+
+    def __len__(self):
+        return self.last - self.first + 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("serial range index out of range")
+        suffix = f"{self.first + index:0{self.width}{'X' if self.upper else 'x'}}"
+        return f"{self.prefix}{suffix}"
+
+
+class Sweep:
+    """every (mac, serial) combination of an optional MacRange and an optional
+    SerialRange, addressed by a single position so a sweep can be resumed"""
+
+    def __init__(self, macs=None, serials=None):
+        self.macs = macs
+        self.serials = serials
+
+    def __len__(self):
+        return len(self.macs or [None]) * len(self.serials or [None])
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError("sweep position out of range")
+        serial_count = len(self.serials or [None])
+        mac_index, serial_index = divmod(position, serial_count)
+        mac = self.macs[mac_index] if self.macs else None
+        serial = self.serials[serial_index] if self.serials else None
+        return (mac, serial)
+
+    def describe(self):
+        return {
+            "mac_range": self.macs.spec if self.macs else None,
+            "serial_range": self.serials.spec if self.serials else None,
+        }
+
+    def iterate(self, start=0):
+        """yields (position, mac, serial) from position start onwards"""
+        for position in range(start, len(self)):
+            yield (position,) + self[position]
+
+
+class Checkpoint:
+    """position of a sweep persisted to disk, only resumed for the same sweep"""
+
+    def __init__(self, path, sweep):
+        self.path = path
+        self.sweep = sweep.describe()
+        self.position = 0
+        data = load_json(path) if path else None
+        if data is not None and data.get("sweep") == self.sweep:
+            self.position = data["position"]
+
+    def save(self, position):
+        self.position = position
+        if self.path:
+            save_json(self.path, {"sweep": self.sweep, "position": position})
+
+
+class Progress:
+    """tracks sweep progress, periodically reports throughput and checkpoints
+
+    update() is expected to be called after each candidate has been tried,
+    with the sweep position it was derived from
+    """
+
+    def __init__(self, checkpoint, sweep, interval=10.0, out=print):
+        self.checkpoint = checkpoint
+        self.sweep = sweep
+        self.interval = interval
+        self.out = out
+        self.trials = 0
+        self.position = checkpoint.position
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    def update(self, position):
+        self.trials += 1
+        self.position = position
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            # the candidates for this position may not all be done yet, so
+            # resuming starts from the beginning of this position again
+            self.checkpoint.save(position)
+            rate = self.trials / (now - self.started)
+            mac, serial = self.sweep[position]
+            device = ", ".join(
+                f"{name}: {value}"
+                for name, value in (("mac", mac), ("serial", serial))
+                if value is not None
+            )
+            self.out(
+                f"Tried {self.trials} candidates ({rate:.0f}/s), "
+                f"at position {position}/{len(self.sweep)} ({device})"
+            )
@@ -1,10 +1,13 @@
-import struct
 from io import BytesIO
 from hashlib import sha256
 
-from Cryptodome.Cipher import AES
+from zcu import aes
+from zcu.container import CHUNK_HEADER, PAYLOAD_START, PayloadHeader
+from zcu.constants import PAYLOAD_MAGIC, PAYLOAD_TYPES
+from zcu.zte import peek
 
-from zcu.constants import PAYLOAD_MAGIC
+# the chunk header and first AES block of a payload
+FIRST_BLOCK_SIZE = CHUNK_HEADER.size + 16
 
 
 class Xcryptor:
@@ -25,11 +28,32 @@ class Xcryptor:
             self.aes_cipher = None
             return
 
+        self.aes_key = self.derive_key(aes_key)[0]
+        self.aes_cipher = self.new_cipher()
+
+    @staticmethod
+    def derive_key(aes_key, aes_iv=None):
+        """returns the (key, iv) bytes used by the cipher"""
         if not isinstance(aes_key, bytes):
             aes_key = aes_key.encode()
+        return (aes_key.ljust(16, b"\0")[:16], None)
+
+    def new_cipher(self):
+        """returns a fresh cipher for the current key"""
+        return aes.new(self.aes_key, aes.MODE_ECB)
+
+    @staticmethod
+    def new_trial_cipher(key, iv):
+        """returns a cipher for a derived (key, iv) without setting it"""
+        return aes.new(key, aes.MODE_ECB)
+
+    def unpack_chunk_header(self, header):
+        """returns (chunk_size, dec_size, more_chunks) of a chunk header"""
+        return CHUNK_HEADER.unpack(header)
 
-        aes_key = aes_key.ljust(16, b"\0")[:16]
-        self.aes_cipher = AES.new(aes_key, AES.MODE_ECB)
+    def read_chunk_header(self, infile):
+        """returns (chunk_size, dec_size, more_chunks) of the next chunk"""
+        return self.unpack_chunk_header(infile.read(CHUNK_HEADER.size))
 
     def read_chunks(self, infile):
         """decrypt a block
@@ -44,7 +68,7 @@ class Xcryptor:
         encrypted_data = BytesIO()
         total_dec_size = 0
         while True:
-            chunk_size, dec_size, more_chunks = struct.unpack(">3I", infile.read(12))
+            chunk_size, dec_size, more_chunks = self.read_chunk_header(infile)
             encrypted_data.write(infile.read(chunk_size))
             total_dec_size += dec_size
             if more_chunks == 0:  # "continue" flag not set
@@ -61,6 +85,73 @@ class Xcryptor:
         res.seek(0)
         return res
 
+    def decrypt_stream(self, infile, read_size=65536):
+        """decrypt the chunks as they are read, yields the plaintext in pieces
+        (see Decrypter)"""
+        decrypter = Decrypter(self)
+        while not decrypter.done:
+            # never read past the end of the payload
+            data = infile.read(min(read_size, decrypter.wanted))
+            if not data:
+                break
+            plaintext = decrypter.feed(data)
+            if plaintext:
+                yield plaintext
+
+    def read_first_block(self, infile):
+        """returns the first AES block of the payload, or None if there is no
+        complete block, infile is left unchanged (see zte.peek())"""
+        return self.first_block(peek(infile, FIRST_BLOCK_SIZE))
+
+    def first_block(self, head):
+        """read_first_block for the first FIRST_BLOCK_SIZE bytes of the payload"""
+        if len(head) < FIRST_BLOCK_SIZE:
+            return None
+        size = CHUNK_HEADER.size
+        chunk_size, _, _ = self.unpack_chunk_header(head[:size])
+        if chunk_size < 16:
+            return None
+        return head[size:]
+
+    @staticmethod
+    def is_payload_header(plaintext):
+        """whether plaintext starts with the payload magic and a known type"""
+        magic, payload_type = PAYLOAD_START.unpack_from(plaintext)
+        return magic == PAYLOAD_MAGIC and payload_type in PAYLOAD_TYPES
+
+    def check_key(self, infile):
+        """decrypt only the first block of the payload and check it starts with
+        the payload magic and a known payload type, infile is left unchanged"""
+        block = self.read_first_block(infile)
+        if block is None:
+            return False
+        return self.is_payload_header(self.new_cipher().decrypt(block))
+
+    def check_block(self, block, aes_key, aes_iv=None):
+        """check_key for a first block from read_first_block, without setting
+        the key"""
+        cipher = self.new_trial_cipher(*self.derive_key(aes_key, aes_iv))
+        return self.is_payload_header(cipher.decrypt(block))
+
+    def try_keys(self, infile, keypairs):
+        """tries (key, iv) pairs against the payload, which is only read once,
+        returns the first keypair whose first block decrypts to a valid payload
+        header and sets its key, or None. infile is left unchanged"""
+        block = self.read_first_block(infile)
+        if block is None:
+            return None
+        for keypair in keypairs:
+            if self.check_block(block, *keypair):
+                self.set_key(*keypair)
+                return keypair
+        return None
+
+    def try_decrypt(self, infile):
+        """trial mode, only decrypts the whole payload if check_key succeeds"""
+        if not self.check_key(infile):
+            return None
+        return self.decrypt(infile)
+
     def create_header(self):
         unencrypted_length_to_use = 0
         if self.include_unencrypted_length:
@@ -68,16 +159,12 @@ class Xcryptor:
             if self.force_same_data_length:
                 unencrypted_length_to_use = self.encrypted_data_length
 
-        header = struct.pack(
-            ">6I",
-            PAYLOAD_MAGIC,
+        return PayloadHeader.new(
             2,  # aes128 in ECB mode
             unencrypted_length_to_use,
-            self.encrypted_data_length + 60 + 12,
+            self.encrypted_data_length + PayloadHeader.SIZE + CHUNK_HEADER.size,
             self.chunk_size,
-            0,
         )
-        return header
 
     def encrypt(self, infile):
         """encrypt and add header
@@ -112,30 +199,56 @@ class Xcryptor:
         encrypted_data_length = len(encrypted_data)
         self.encrypted_data_length = encrypted_data_length
 
-        header = self.create_header()
-
         result = BytesIO()
-        result.write(header)
-        # 36 bytes of padding
-        result.write(struct.pack(">9I", *(9 * [0])))
-        # mini header for aes payload
-        aes_header = struct.pack(
-            ">3I",
-            *(
-                (
-                    encrypted_data_length
-                    if self.force_same_data_length
-                    else unencrypted_data_length
-                ),
-                encrypted_data_length,
-                0,
-            )
-        )
-        result.write(aes_header)
+        result.write(self.create_headers())
         result.write(encrypted_data)
         result.seek(0)
         return result
 
+    def create_headers(self):
+        """the 60 byte header and the 12 byte header of the single AES chunk"""
+        header = self.create_header().pack()
+        # mini header for aes payload
+        aes_header = CHUNK_HEADER.pack(
+            (
+                self.encrypted_data_length
+                if self.force_same_data_length
+                else self.unencrypted_data_length
+            ),
+            self.encrypted_data_length,
+            0,
+        )
+        return header + aes_header
+
+    @staticmethod
+    def encrypted_length(length):
+        """size of the payload encrypt() creates from length bytes of data"""
+        return 60 + 12 + length + (-length % 16)
+
+    def encrypt_stream(self, infile, outfile, length, read_size=65536):
+        """encrypt length bytes of infile into outfile as they are read,
+        the output is identical to that of encrypt()"""
+        self.unencrypted_data_length = length
+        self.encrypted_data_length = length + (-length % 16)
+        outfile.write(self.create_headers())
+
+        # a fresh cipher, the CBC state is carried across reads by the cipher
+        cipher = self.new_cipher()
+        carry = b""  # plaintext not yet aligned to the AES block size
+        remaining = length
+        while remaining > 0:
+            data = infile.read(min(read_size, remaining))
+            if not data:
+                raise ValueError("Unexpected end of data to encrypt")
+            remaining -= len(data)
+            data = carry + data
+            aligned = len(data) - len(data) % 16
+            carry = data[aligned:]
+            outfile.write(cipher.encrypt(data[:aligned]))
+        if carry:
+            # pad to 16 byte alignment
+            outfile.write(cipher.encrypt(carry.ljust(16, b"\0")))
+
 
 class CBCXcryptor(Xcryptor):
     # type 3/4/5/6 encryption, AES256CBC with the key/IV set from SHA256 hashes
@@ -164,21 +277,29 @@ class CBCXcryptor(Xcryptor):
         else:
             self.aes_iv_str = aes_iv
 
-        key = sha256(self.aes_key_str.encode()).digest()
-        iv = sha256(self.aes_iv_str.encode()).digest()
-        self.aes_cipher = AES.new(key, AES.MODE_CBC, iv[:16])
+        self.aes_key, self.aes_iv = self.derive_key(self.aes_key_str, self.aes_iv_str)
+        self.aes_cipher = self.new_cipher()
 
-    def read_chunks(self, infile):
-        encrypted_data = BytesIO()
-        total_dec_size = 0
-        while True:
-            dec_size, chunk_size, more_data = struct.unpack(">3I", infile.read(12))
-            encrypted_data.write(infile.read(chunk_size))
-            total_dec_size += dec_size
-            if more_data == 0:
-                break
-        encrypted_data.seek(total_dec_size)
-        return encrypted_data
+    @staticmethod
+    def derive_key(aes_key, aes_iv=None):
+        if aes_iv is None:
+            aes_iv = aes_key
+        if not isinstance(aes_key, bytes):
+            aes_key = aes_key.encode()
+        if not isinstance(aes_iv, bytes):
+            aes_iv = aes_iv.encode()
+        return (sha256(aes_key).digest(), sha256(aes_iv).digest()[:16])
+
+    def new_cipher(self):
+        return aes.new(self.aes_key, aes.MODE_CBC, self.aes_iv)
+
+    @staticmethod
+    def new_trial_cipher(key, iv):
+        return aes.new(key, aes.MODE_CBC, iv)
+
+    def unpack_chunk_header(self, header):
+        dec_size, chunk_size, more_data = CHUNK_HEADER.unpack(header)
+        return (chunk_size, dec_size, more_data)
 
     def create_header(self):
         if self.payload_type is not None:
@@ -187,13 +308,83 @@ class CBCXcryptor(Xcryptor):
             payload_type = 3
         else:
             payload_type = 4
-        header = struct.pack(
-            ">6I",
-            PAYLOAD_MAGIC,
+        return PayloadHeader.new(
             payload_type,
             self.encrypted_data_length if self.include_unencrypted_length else 0,
-            0,
-            0,
-            0,
         )
-        return header
+
+
+class Decrypter:
+    """push based decryption of a payload, feed() it the chunks in pieces of
+    any size and it returns the plaintext decrypted so far
+
+    Like Xcryptor.decrypt() the output is truncated to the total decrypted
+    length, but only plaintext beyond the decrypted lengths seen so far is
+    held back, so the whole payload is never in memory at once.
+    """
+
+    def __init__(self, xcryptor):
+        self.xcryptor = xcryptor
+        # a fresh cipher, the CBC state is carried across pieces by the cipher
+        self.cipher = xcryptor.new_cipher()
+        self.done = False
+        self._header = b""
+        self._remaining = None  # of the current chunk, None while in a header
+        self._more_chunks = True
+        self._dec_limit = 0
+        self._emitted = 0
+        self._carry = b""  # ciphertext not yet aligned to the AES block size
+        self._pending = b""  # plaintext not yet known to be within _dec_limit
+
+    @property
+    def wanted(self):
+        """bytes left before the next chunk header (or the end)"""
+        if self.done:
+            return 0
+        if self._remaining is None:
+            return CHUNK_HEADER.size - len(self._header)
+        return self._remaining
+
+    def feed(self, data):
+        output = []
+        data = memoryview(data)
+        while data and not self.done:
+            if self._remaining is None:
+                needed = CHUNK_HEADER.size - len(self._header)
+                self._header += data[:needed]
+                data = data[needed:]
+                if len(self._header) == CHUNK_HEADER.size:
+                    self._read_header()
+                continue
+            size = self._remaining
+            piece, data = data[:size], data[size:]
+            self._remaining -= len(piece)
+            piece = self._carry + piece
+            aligned = len(piece) - len(piece) % 16
+            self._carry = piece[aligned:]
+            self._pending += self.cipher.decrypt(piece[:aligned])
+            count = min(len(self._pending), self._dec_limit - self._emitted)
+            if count > 0:
+                output.append(self._pending[:count])
+                self._pending = self._pending[count:]
+                self._emitted += count
+            if self._remaining == 0:
+                self._end_chunk()
+        return b"".join(output)
+
+    def _read_header(self):
+        header, self._header = self._header, b""
+        chunk_size, dec_size, self._more_chunks = self.xcryptor.unpack_chunk_header(
+            header
+        )
+        self._dec_limit += dec_size
+        self._remaining = chunk_size
+        if chunk_size == 0:
+            self._end_chunk()
+
+    def _end_chunk(self):
+        self._remaining = None
+        if self._more_chunks == 0:  # "continue" flag not set
+            self.done = True
+            if self._carry:
+                raise ValueError("Data must be aligned to block boundary")
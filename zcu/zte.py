@@ -1,22 +1,22 @@
 """Various helper functions to read/write zte configuration"""
 
 from io import BytesIO
-from os import stat
-import struct
+import warnings
 
 from . import constants
+from . import container
 
 
 def read_header(infile, little_endian=False):
     """expects to be at position 0 of the file, returns size of header"""
-    fmt = ">4I"
-    header_magic = struct.unpack(fmt, infile.read(struct.calcsize(fmt)))
+    codec = container.ZTE_MAGIC
+    header_magic = codec.unpack(infile.read(codec.size))
     if header_magic == constants.ZTE_MAGIC:
         # 128 byte header
-        fmt = f'{"<" if little_endian else ">"}28I'
-        header = struct.unpack(fmt, infile.read(struct.calcsize(fmt)))
+        codec = container.ZTE_HEADER[little_endian]
+        header = codec.unpack(infile.read(codec.size))
         if header[2] == 0x4000000:
-            print("WARNING: Incorrect endianess specified!")
+            warnings.warn("Incorrect endianess specified!", stacklevel=2)
             infile.seek(0)
             return read_header(infile, not little_endian)
 
@@ -25,7 +25,7 @@ def read_header(infile, little_endian=False):
         ), f"Expected header[2] to be 0x4, was actually 0x{header[2]:X}"
         header_length = header[13]
         signed_config_size = header[14]
-        file_size = stat(infile.name).st_size
+        file_size = stream_length(infile)
         assert (
             header_length + signed_config_size == file_size
         ), "file size does not match header"
@@ -35,10 +35,33 @@ def read_header(infile, little_endian=False):
     return infile.tell()
 
 
+def stream_length(infile):
+    """total length of a seekable file-like object, position is unchanged"""
+    pos = infile.tell()
+    length = infile.seek(0, 2)
+    infile.seek(pos)
+    return length
+
+
+def peek(infile, size):
+    """returns the next size bytes of infile (fewer at its end), its position
+    is left unchanged
+
+    A stream which cannot seek needs a peek() which returns size bytes, such
+    as base64io.PeekableReader (see base64io.open_config()).
+    """
+    if infile.seekable():
+        start_pos = infile.tell()
+        data = infile.read(size)
+        infile.seek(start_pos)
+        return data
+    return infile.peek(size)[:size]
+
+
 def read_signature(infile):
     """expects to be at the start of the signature magic, returns signature"""
-    fmt = ">3I"
-    signature_header = struct.unpack(fmt, infile.read(struct.calcsize(fmt)))
+    codec = container.SIGNATURE_HEADER
+    signature_header = codec.unpack(infile.read(codec.size))
     signature = b""
     if signature_header[0] == constants.SIGNATURE_MAGIC:
         # _ = signature_header[1] # 0 ?
@@ -52,8 +75,8 @@ def read_signature(infile):
 
 def read_payload(infile, raise_on_error=True):
     """expects to be at the start of the payload magic"""
-    fmt = ">15I"
-    payload_header = struct.unpack(fmt, infile.read(struct.calcsize(fmt)))
+    codec = container.PAYLOAD_HEADER
+    payload_header = codec.unpack(infile.read(codec.size))
     if payload_header[0] != constants.PAYLOAD_MAGIC:
         if raise_on_error:
             raise ValueError("Payload header does not start with the payload magic.")
@@ -72,15 +95,41 @@ def read_payload_type(infile, raise_on_error=True):
 def add_header(payload, signature, version, include_header=False, little_endian=False):
     """creates a 'full' payload of (header), signature and payload"""
     full_payload = BytesIO()
-    signature_length = len(signature)
 
     payload_data = payload.read()
 
+    write_header(
+        full_payload,
+        len(payload_data),
+        signature,
+        version,
+        include_header=include_header,
+        little_endian=little_endian,
+    )
+
+    full_payload.write(payload_data)
+    full_payload.seek(0)
+
+    return full_payload
+
+
+def write_header(
+    outfile,
+    payload_length,
+    signature,
+    version,
+    include_header=False,
+    little_endian=False,
+):
+    """writes the (header) and signature for a payload of payload_length bytes,
+    the payload itself is expected to be written to outfile afterwards"""
+    signature_length = len(signature)
+
     if include_header:
-        full_payload_length = len(payload_data)
+        full_payload_length = payload_length
         if signature_length > 0:
             full_payload_length += 12 + signature_length
-        full_payload.write(struct.pack(">4I", *constants.ZTE_MAGIC))
+        outfile.write(container.ZTE_MAGIC.pack(*constants.ZTE_MAGIC))
         header = [
             0,
             0,
@@ -111,8 +160,7 @@ def add_header(payload, signature, version, include_header=False, little_endian=
             0,
             0,
         ]
-        fmt = f'{"<" if little_endian else ">"}28I'
-        full_payload.write(struct.pack(fmt, *header))
+        outfile.write(container.ZTE_HEADER[little_endian].pack(*header))
 
     if signature_length > 0:
         signature_header = [
@@ -120,10 +168,5 @@ def add_header(payload, signature, version, include_header=False, little_endian=
             0,
             signature_length,
         ]
-        full_payload.write(struct.pack(">3I", *signature_header))
-        full_payload.write(signature)
-
-    full_payload.write(payload_data)
-    full_payload.seek(0)
-
-    return full_payload
+        outfile.write(container.SIGNATURE_HEADER.pack(*signature_header))
+        outfile.write(signature)